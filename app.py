@@ -1,85 +1,344 @@
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Blueprint, Flask, Response, jsonify, request
 from utils.llm_calls import *
 from utils.context_data import *
 from utils.extractInfo import extract_json_from_text
+from utils.validation import validate_layout
+from utils.schema import normalize_layout
+from utils.graph_metrics import get_metrics
+from utils.similarity import SimilarityIndex
+from utils.layout_stats import get_stats, compute_stats, write_csv
+from utils.thumbnails import get_thumbnail, FORMATS, DEFAULT_SIZE
+from utils.gallery_manifest import GalleryManifest
+from utils.gltf_export import get_glb, iter_chunks
+from utils.design_search import search as design_search, QUALITY_THRESHOLD
+from utils.placement import SiteTooSmall, solve_layout
+from utils.layout_store import LayoutStore, StoreFollower
+from utils.static_assets import StaticAssets
+from utils.metrics import instrument, span
+from utils.admission import AdmissionController, admit, admit_job, request_class
+from utils.jobs import JobRunner, check as check_cancelled, register as register_jobs
+from utils import logs, recorder
+from utils.logs import get_logger, fields, payload
+import io
+import os
 import json
-app = Flask(__name__)
+import logging
+
+MAX_CONTENT_LENGTH = 8 * 1024 * 1024
+
+bp = Blueprint('app', __name__)
+log = get_logger('chat')
+
+# Per-user rate limits and fair queueing in front of the LLM (see utils/admission.py)
+admission = AdmissionController()
+
+# Static files: hashed, precompressed copies built from js/, styles/,
+# gallery/ and galleryv2/ (see utils/static_assets.py)
+static_assets = StaticAssets()
+
+def static_response(path):
+    found = static_assets.lookup(path, request.headers.get('Accept-Encoding', ''))
+    if found is None:
+        return "Not found", 404
+    body, headers = found
+    if request.if_none_match.contains(headers['ETag'].strip('"')):
+        headers.pop('Content-Encoding', None)
+        return '', 304, headers
+    return body, 200, headers
 
 # Serve HTML
-@app.route('/')
+@bp.route('/')
 def index():
-    return send_from_directory('.', 'index.html')
+    return static_response('index.html')
 
-# Serve JS files
-@app.route('/<path:filename>')
+# Serve JS/CSS and gallery pages
+@bp.route('/<path:filename>')
 def serve_static(filename):
-    if filename.endswith(('.js', '.css')):
-        return send_from_directory('.', filename)
-    return "Not found", 404
+    return static_response(filename)
 
-layouts = {}
-# Chat endpoint with context
-@app.route('/chat', methods=['POST'])
-def chat():
-    data     = request.json or {}
+# Layouts are shared by all workers; the similarity index and gallery
+# manifest are per process and follow the store
+layouts = LayoutStore()
+similarity_index = SimilarityIndex()
+similarity_index.autosave()
+GH_JSON_DIR = os.path.join('grasshopperFiles', 'jsons')
+gallery_manifest = GalleryManifest(GH_JSON_DIR)
+follower = StoreFollower(layouts, similarity_index.add, gallery_manifest.put)
+
+def sync_layouts():
+    """Pick up layouts written by other workers."""
+    follower.sync()
+
+def layout_written():
+    # the index is persisted by its autosave thread, not per write
+    sync_layouts()
+
+def find_layout(layout_id):
+    """Look up a stored layout, falling back to grasshopperFiles/jsons/<id>.json."""
+    layout = layouts.get(layout_id)
+    if layout is not None:
+        return layout
+    path = os.path.join(GH_JSON_DIR, os.path.basename(layout_id) + '.json')
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    return None
+
+def user_key(req):
+    """Admission key: the user_id in the request body (or in its params, for /jobs)."""
+    data = req.get_json(force=True, silent=True)
+    if not isinstance(data, dict):
+        return 'default_user'
+    if isinstance(data.get('params'), dict):
+        data = data['params']
+    return data.get('user_id', 'default_user')
+
+def generate_layout(data, job=None):
+    """
+    One /chat generation: prompt with context, LLM (or candidate search),
+    layout extraction, validation and storage.
+
+    job: optional utils.jobs.Job for progress reports and cancellation
+    """
     message  = data.get('message', '')
     user_id  = data.get('user_id', 'default_user')
+    reject_invalid = bool(data.get('reject_invalid', False))
+    candidates = int(data.get('candidates', 1) or 1)
 
-    try:
-       
-        context = get_recent_context(user_id, limit=2)
+    context = get_recent_context(user_id, limit=2)
+    with span('prompt'):
         if context:
             convo = "\n".join([f"User: {u}\nAssistant: {a}" for u, a in context])
             full_prompt = f"Previous conversation:\n{convo}\n\nUser: {message}"
         else:
             full_prompt = message
-        print(full_prompt  )
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("prompt", extra=fields(user_id=user_id, prompt=payload(full_prompt)))
+    search = None
+    if candidates > 1:
+        # generate-and-rank: N parallel candidates, best one wins
+        with span('search'):
+            try:
+                best = design_search(
+                    lambda t, cancel: query_llm(full_prompt, temperature=t, cancel=cancel),
+                    n=candidates,
+                    threshold=float(data.get('threshold', QUALITY_THRESHOLD)),
+                    on_candidate=job and (lambda found, top: job.progress(
+                        stage='search', candidates=found, best_score=top and top['score'])),
+                    cancelled=job and (lambda: job.cancelled),
+                )
+            except StreamCancelled:
+                check_cancelled(job)
+                raise
+        response = best['response']
+        search = {'score': best['score'], 'checks': best['checks'], 'candidates': best['candidates']}
+    else:
+        if job:
+            job.progress(stage='generate')
         response = query_llm(full_prompt)
-        save_conversation(user_id, message, response)
-        print(response)
-        layout_data = None
-        if '{' in response and '}' in response:
+    check_cancelled(job)
+    save_conversation(user_id, message, response)
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("response", extra=fields(user_id=user_id, response=payload(response)))
+    if job:
+        job.progress(stage='validate', response=response)
+    layout_data = None
+    validation = None
+    if '{' in response and '}' in response:
+        with span('extract'):
             json_str = extract_json_from_text(response)
-            
-            if json_str:
-                try:
-                    json_data = json.loads(json_str)
-                    # Check if it's a layout (has nodes/edges)
-                    if 'nodes' in json_data and 'edges' in json_data:
+        
+        if json_str:
+            try:
+                json_data = json.loads(json_str)
+                # Check if it's a layout (has nodes/edges)
+                if 'nodes' in json_data and 'edges' in json_data:
+                    with span('validate'):
+                        _, schema_errors = normalize_layout(json_data)
+                        validation = validate_layout(json_data)
+                        validation['schema_errors'] = schema_errors
+                        validation['valid'] = validation['valid'] and not schema_errors
+                    if reject_invalid and not validation['valid']:
+                        log.info("layout rejected", extra=fields(user_id=user_id, reason="failed validation"))
+                    else:
                         # Generate ID and store layout
-                        layout_id = f"layout_{len(layouts)}_{user_id}"
-                        json_data['id'] = layout_id
-                        layouts[layout_id] = json_data
-                        layout_data = json_data
-                        print(f"Layout stored: {layout_id}")
-                except Exception as e:
-                    print(f"JSON parse error: {e}")
-                 
-        return jsonify({
-            "response": response,
-            "layout": layout_data  # Include layout if found
-        })
-
-    
+                        with span('store'):
+                            layout_id = layouts.add(user_id, json_data)
+                            layout_data = json_data
+                            layout_written()
+                        log.info("layout stored", extra=fields(layout_id=layout_id))
+            except Exception as e:
+                log.warning("JSON parse error", extra=fields(error=str(e), response=payload(response)))
+
+    return {
+        "response": response,
+        "layout": layout_data,  # Include layout if found
+        "validation": validation,
+        "search": search
+    }
+
+# Chat endpoint with context
+@bp.route('/chat', methods=['POST'])
+@admit(admission, user_key, request_class)
+def chat():
+    data = request.get_json(force=True, silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'expected a JSON object'}), 400
+    try:
+        return jsonify(generate_layout(data))
     except Exception as e:
-        print(f"Error in chat endpoint: {e}")
+        log.exception("error in chat endpoint")
         return jsonify({'response': 'Sorry, an error occurred.'}), 500
-    
-# Add these simple endpoints for layout management
-@app.route('/layouts/<layout_id>', methods=['GET'])
+
+# Long generations (e.g. many candidates) as background jobs: /jobs
+# each job waits for a backend slot when it runs, not only when it is submitted
+in_slot = admit_job(admission, lambda params: params.get('user_id', 'default_user'))
+jobs = JobRunner({'chat': in_slot(generate_layout)})
+register_jobs(bp, jobs, admit(admission, user_key, slot=False))
+
+@bp.route('/layouts/<layout_id>', methods=['GET'])
 def get_layout(layout_id):
-    if layout_id in layouts:
-        return jsonify(layouts[layout_id])
+    layout = find_layout(layout_id)
+    if layout is not None:
+        return jsonify(layout)
     return jsonify({'error': 'Layout not found'}), 404
 
-@app.route('/layouts/<layout_id>', methods=['PUT'])
-def update_layout(layout_id):
-    if layout_id in layouts:
-        data = request.json
-        layouts[layout_id].update(data)
-        return jsonify({'success': True, 'layout': layouts[layout_id]})
+@bp.route('/layouts/<layout_id>.glb', methods=['GET'])
+def layout_glb(layout_id):
+    layout = find_layout(layout_id)
+    if layout is None:
+        return jsonify({'error': 'Layout not found'}), 404
+    data, digest = get_glb(layout)
+    # layouts change in place: caches keep the file but revalidate it
+    validators = {'Cache-Control': 'no-cache', 'ETag': f'"{digest}"'}
+    if request.if_none_match.contains(digest):
+        return '', 304, validators
+    return Response(iter_chunks(data), headers={
+        'Content-Type': 'model/gltf-binary',
+        'Content-Length': str(len(data)),
+        'Content-Disposition': f'attachment; filename="{layout_id}.glb"',
+        **validators,
+    })
+
+@bp.route('/layouts/<layout_id>/metrics', methods=['GET'])
+def layout_metrics(layout_id):
+    layout = layouts.get(layout_id)
+    if layout is not None:
+        return jsonify(get_metrics(layout, request.args.get('entry')))
+    return jsonify({'error': 'Layout not found'}), 404
+
+@bp.route('/layouts/<layout_id>/similar', methods=['GET'])
+def similar_layouts(layout_id):
+    k = request.args.get('k', 10, type=int)
+    try:
+        results = similarity_index.query(layout_id=layout_id, layout=layouts.get(layout_id), k=k)
+    except KeyError:
+        return jsonify({'error': 'Layout not found'}), 404
+    return jsonify({'id': layout_id, 'similar': results})
+
+@bp.route('/layouts/<layout_id>/stats', methods=['GET'])
+def layout_stats(layout_id):
+    layout = layouts.get(layout_id)
+    if layout is not None:
+        return jsonify(get_stats(layout, layout_id))
     return jsonify({'error': 'Layout not found'}), 404
 
+@bp.route('/stats', methods=['GET'])
+def corpus_stats():
+    stored = layouts.items()
+    rows = compute_stats([l for _, l in stored], [k for k, _ in stored])
+    if request.args.get('format') == 'csv':
+        out = io.StringIO()
+        write_csv(rows, out)
+        return out.getvalue(), 200, {'Content-Type': 'text/csv'}
+    return jsonify(rows)
+
+@bp.route('/thumbnails/<layout_id>.<fmt>', methods=['GET'])
+def layout_thumbnail(layout_id, fmt):
+    layout = find_layout(layout_id)
+    if layout is None:
+        return jsonify({'error': 'Layout not found'}), 404
+    width = request.args.get('w', DEFAULT_SIZE[0], type=int)
+    height = request.args.get('h', DEFAULT_SIZE[1], type=int)
+    theme = request.args.get('theme', 'light')
+    try:
+        data, key = get_thumbnail(layout, width, height, theme, fmt)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 501
+    etag = key.rsplit('.', 1)[0]
+    # ?v=<content hash> URLs never change content; plain URLs revalidate daily
+    max_age = 'max-age=31536000, immutable' if request.args.get('v') else 'max-age=86400'
+    validators = {'Cache-Control': f'public, {max_age}', 'ETag': f'"{etag}"'}
+    if request.if_none_match.contains(etag):
+        return '', 304, validators
+    return data, 200, {'Content-Type': FORMATS[fmt], **validators}
+
+@bp.route('/gallery/manifest', methods=['GET'])
+def manifest():
+    body, gzipped, etag = gallery_manifest.get()
+    headers = {
+        'Content-Type': 'application/json',
+        'Cache-Control': 'no-cache',
+        'ETag': f'"{etag}"',
+        'Vary': 'Accept-Encoding',
+    }
+    if request.if_none_match.contains(etag):
+        return '', 304, headers
+    if 'gzip' in request.accept_encodings:
+        headers['Content-Encoding'] = 'gzip'
+        return gzipped, 200, headers
+    return body, 200, headers
+
+@bp.route('/layouts/<layout_id>/place', methods=['POST'])
+def place_layout(layout_id):
+    seed = (request.get_json(force=True, silent=True) or {}).get('seed', 0)
+    try:
+        placed = layouts.update(layout_id, lambda layout: solve_layout(layout, seed=seed))
+    except SiteTooSmall as e:
+        return jsonify({'error': 'layout does not fit the site', 'detail': str(e)}), 400
+    if placed is None:
+        return jsonify({'error': 'Layout not found'}), 404
+    layout_written()
+    return jsonify({'success': True, 'layout': placed, 'validation': validate_layout(placed)})
+
+@bp.route('/layouts/<layout_id>', methods=['PUT'])
+def update_layout(layout_id):
+    changes = request.get_json(force=True, silent=True)
+    if not isinstance(changes, dict):
+        return jsonify({'error': 'expected a JSON object'}), 400
+    strict = bool(request.args.get('strict'))
+    schema_errors = None
+
+    def apply(layout):
+        # runs inside the store transaction: concurrent PUTs don't lose updates
+        nonlocal schema_errors
+        layout.update(changes)
+        _, schema_errors = normalize_layout(layout)
+        return None if schema_errors and strict else layout
+
+    layout = layouts.update(layout_id, apply)
+    if schema_errors is None:
+        return jsonify({'error': 'Layout not found'}), 404
+    if layout is None:
+        return jsonify({'error': 'invalid layout', 'schema_errors': schema_errors}), 400
+    layout_written()
+    return jsonify({'success': True, 'layout': layout, 'schema_errors': schema_errors})
+
+def create_app(config=None):
+    """Build the Flask app (used by `python app.py` and serve.py)."""
+    app = Flask(__name__)
+    app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+    app.config.update(config or {})
+    app.register_blueprint(bp)
+    app.before_request(sync_layouts)
+    instrument(app, server_timing=app.config.get('SERVER_TIMING', False))
+    logs.setup_logging()
+    logs.instrument(app)
+    recorder.instrument(app)
+    return app
+
 if __name__ == '__main__':
-    print("Server running at http://localhost:5000")
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    print("Server running at http://localhost:5000 (development; use serve.py in production)")
+    create_app().run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,145 @@
+"""
+fake_gh.py - Stand-in for the Grasshopper listener
+
+Accepts the JSON pushes that chat_gui.py sends to port 8081 and records
+when each one arrived, how large it was and what it carried (full layout,
+layout diff or plain reply). GET /stats summarizes the arrivals; --log
+appends every arrival to a JSONL file.
+
+    python -m bench.fake_gh --delay-ms 20 --log gh_arrivals.jsonl
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench.load import percentiles
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8081  # chatGUI.config.DEFAULT_GH_URL
+
+
+def payload_kind(payload):
+    """What a push carried: layout, layout_diff, ai_response or unknown."""
+    for kind in ("layout_diff", "layout", "ai_response"):
+        if isinstance(payload, dict) and kind in payload:
+            return kind
+    return "unknown"
+
+
+class ArrivalLog:
+    """Thread-safe record of pushes received."""
+
+    def __init__(self, log_path=None):
+        self.lock = threading.Lock()
+        self.arrivals = []
+        self.log_path = log_path
+
+    def record(self, payload, size, status):
+        entry = {
+            "t": time.time(),
+            "bytes": size,
+            "kind": payload_kind(payload),
+            "project": payload.get("project_name") if isinstance(payload, dict) else None,
+            "hash": payload.get("hash") if isinstance(payload, dict) else None,
+            "status": status,
+        }
+        with self.lock:
+            self.arrivals.append(entry)
+            if self.log_path:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+        return entry
+
+    def summary(self):
+        """Counts, bytes and inter-arrival percentiles (ms)."""
+        with self.lock:
+            arrivals = list(self.arrivals)
+        kinds = {}
+        for a in arrivals:
+            kinds[a["kind"]] = kinds.get(a["kind"], 0) + 1
+        times = [a["t"] for a in arrivals]
+        gaps = [(b - a) * 1000 for a, b in zip(times, times[1:])]
+        return {
+            "count": len(arrivals),
+            "accepted": sum(a["status"] == 200 for a in arrivals),
+            "kinds": kinds,
+            "bytes": sum(a["bytes"] for a in arrivals),
+            "first": times[0] if times else None,
+            "last": times[-1] if times else None,
+            "inter_arrival_ms": percentiles(gaps),
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeGH/1.0"
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            self._json(200, self.server.arrivals.summary())
+        else:
+            self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length)
+        try:
+            payload = json.loads(raw or b"{}")
+        except ValueError:
+            payload = None
+        status = 200 if payload is not None else 400
+        if status == 200 and random.random() < self.server.fail_rate:
+            status = 503
+        self.server.arrivals.record(payload, len(raw), status)
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        self._json(status, {"ok": status == 200})
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, delay_ms=0.0, fail_rate=0.0, log_path=None):
+    """Build (not start) a fake GH listener."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.arrivals = ArrivalLog(log_path)
+    server.delay = delay_ms / 1000.0
+    server.fail_rate = fail_rate
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Grasshopper listener")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="processing time per push")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of pushes answered with 503")
+    parser.add_argument("--log", help="append arrivals to this JSONL file")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, args.delay_ms, args.fail_rate, args.log)
+    print(f"Fake GH listener at http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.arrivals.summary(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
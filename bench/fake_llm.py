@@ -0,0 +1,237 @@
+"""
+fake_llm.py - OpenAI-compatible stand-in for the completion server
+
+Serves /v1/models and /v1/chat/completions (plain and streaming) on the
+LM Studio address that the "local" api_mode points at, so app.py,
+gh_app.py and chat_app.py run unchanged against it. Replies are either
+canned layouts from grasshopperFiles/jsons or short chat answers; the time
+to first token follows a configurable distribution and the text is emitted
+at a fixed token rate.
+
+    python -m bench.fake_llm --latency lognormal:400,0.5 --tokens-per-sec 60
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 1234  # LM Studio default, used by CLIENTS["local"]
+DEFAULT_LATENCY = "fixed:200"
+DEFAULT_TOKENS_PER_SEC = 50.0
+DEFAULT_LAYOUT_RATIO = 0.5
+LAYOUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "grasshopperFiles", "jsons")
+
+CHAT_REPLIES = [
+    "A courtyard plan works well on a narrow lot: it brings light into the middle of the house.",
+    "Keep the bedrooms on the quiet side of the site and group the wet rooms around one service core.",
+    "An open kitchen next to the living room makes the ground floor feel larger.",
+]
+
+_TOKEN = re.compile(r"\S+\s*|\s+")
+
+
+def latency_sampler(spec, rng=random):
+    """
+    Parse a latency spec into a callable returning seconds.
+
+    Specs (milliseconds): "fixed:200", "uniform:100,400",
+    "lognormal:400,0.5" (median, sigma), "exp:300" (mean).
+    """
+    kind, _, args = spec.partition(":")
+    try:
+        params = [float(a) / 1000.0 for a in args.split(",") if a]
+    except ValueError:
+        raise ValueError(f"bad latency spec: {spec!r}")
+    if kind == "fixed" and len(params) == 1:
+        return lambda: params[0]
+    if kind == "uniform" and len(params) == 2:
+        return lambda: rng.uniform(params[0], params[1])
+    if kind == "lognormal" and len(params) == 2:
+        # sigma is unitless, undo the ms scaling
+        median, sigma = params[0], params[1] * 1000.0
+        return lambda: median * rng.lognormvariate(0.0, sigma)
+    if kind == "exp" and len(params) == 1:
+        return lambda: rng.expovariate(1.0 / params[0]) if params[0] > 0 else 0.0
+    raise ValueError(f"bad latency spec: {spec!r}")
+
+
+def load_layouts(directory=LAYOUT_DIR):
+    """Canned layout replies (compact JSON text)."""
+    out = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        try:
+            with open(path, encoding="utf-8") as f:
+                out.append(json.dumps(json.load(f)))
+        except (OSError, ValueError):
+            continue
+    return out
+
+
+def tokenize(text):
+    """Split text into roughly token-sized pieces (whitespace kept)."""
+    return _TOKEN.findall(text)
+
+
+class FakeLLM:
+    """Reply generator shared by all handler threads."""
+
+    def __init__(self, latency=DEFAULT_LATENCY, tokens_per_sec=DEFAULT_TOKENS_PER_SEC,
+                 layout_ratio=DEFAULT_LAYOUT_RATIO, error_rate=0.0, seed=None):
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.first_token = latency_sampler(latency, self.rng)
+        self.tokens_per_sec = tokens_per_sec
+        self.layout_ratio = layout_ratio
+        self.error_rate = error_rate
+        self.layouts = load_layouts()
+        self.stats = {"requests": 0, "streamed": 0, "errors": 0, "tokens": 0}
+
+    def reply(self):
+        """(text, first-token delay, seconds per token, fail?) for one request."""
+        with self.lock:
+            self.stats["requests"] += 1
+            fail = self.rng.random() < self.error_rate
+            if self.layouts and self.rng.random() < self.layout_ratio:
+                text = self.rng.choice(self.layouts)
+            else:
+                text = self.rng.choice(CHAT_REPLIES)
+            delay = max(0.0, self.first_token())
+            if fail:
+                self.stats["errors"] += 1
+        per_token = 1.0 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+        return text, delay, per_token, fail
+
+    def count(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeLLM/1.0"
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        llm = self.server.llm
+        if self.path.rstrip("/") == "/v1/models":
+            self._json(200, {"object": "list", "data": [{"id": "fake-model", "object": "model"}]})
+        elif self.path.rstrip("/") == "/stats":
+            with llm.lock:
+                self._json(200, dict(llm.stats))
+        else:
+            self._json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._json(400, {"error": {"message": "invalid JSON"}})
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            return self._json(404, {"error": {"message": "not found"}})
+
+        llm = self.server.llm
+        text, delay, per_token, fail = llm.reply()
+        time.sleep(delay)
+        if fail:
+            return self._json(500, {"error": {"message": "injected failure", "type": "server_error"}})
+
+        model = body.get("model") or "fake-model"
+        tokens = tokenize(text)
+        llm.count("tokens", len(tokens))
+        completion_id = "chatcmpl-" + uuid.uuid4().hex[:12]
+        created = int(time.time())
+        usage = {"prompt_tokens": sum(len(tokenize(str(m.get("content", ""))))
+                                      for m in body.get("messages") or []),
+                 "completion_tokens": len(tokens)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if not body.get("stream"):
+            time.sleep(per_token * len(tokens))
+            return self._json(200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": text}}],
+                "usage": usage,
+            })
+
+        llm.count("streamed")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(delta, finish=None):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                     "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+            self.wfile.write(b"data: " + json.dumps(chunk).encode("utf-8") + b"\n\n")
+            self.wfile.flush()
+
+        try:
+            event({"role": "assistant", "content": ""})
+            for token in tokens:
+                time.sleep(per_token)
+                event({"content": token})
+            event({}, finish="stop")
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client cancelled the stream
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, **options):
+    """Build (not start) a fake LLM server; options go to FakeLLM."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.llm = FakeLLM(**options)
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OpenAI-compatible fake completion server")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", default=DEFAULT_LATENCY,
+                        help="time to first token, e.g. fixed:200, uniform:100,400, lognormal:400,0.5, exp:300 (ms)")
+    parser.add_argument("--tokens-per-sec", type=float, default=DEFAULT_TOKENS_PER_SEC,
+                        help="generation rate (0 = instant)")
+    parser.add_argument("--layout-ratio", type=float, default=DEFAULT_LAYOUT_RATIO,
+                        help="fraction of replies that are canned layouts")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failing with 500")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, latency=args.latency, tokens_per_sec=args.tokens_per_sec,
+                         layout_ratio=args.layout_ratio, error_rate=args.error_rate, seed=args.seed)
+    print(f"Fake LLM at http://{args.host}:{args.port}/v1 ({len(server.llm.layouts)} canned layouts)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+load.py - Open-loop load generator for the chat endpoints
+
+Targets:
+  chat      POST {url}/chat       (app.py)
+  llm_call  POST {url}/llm_call   (gh_app.py)
+  infer     chat_app.llm_infer in-process, followed by the GUI's push to
+            Grasshopper (the path a ChatGUI send takes)
+
+Requests are issued on a fixed schedule at the target rate whether or not
+earlier ones have finished, and latency is measured from each request's
+scheduled start, so a backed-up server shows up as latency instead of a
+silently lower send rate. With --fakes the fake LLM (port 1234) and fake GH
+listener (port 8081) are started in-process first.
+
+    python -m bench.fake_llm &            # or use --fakes
+    python app.py &
+    python -m bench.load chat --rps 5 --duration 30
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+DEFAULT_URLS = {"chat": "http://127.0.0.1:5000", "llm_call": "http://127.0.0.1:5000"}
+DEFAULT_PROMPTS = [
+    "Give me a layout for a two bedroom house with an open kitchen",
+    "What is a good orientation for a living room?",
+    "Make the master bedroom larger and add a study",
+    "Design a single storey studio with a workshop",
+]
+PERCENTILES = (50, 95, 99)
+
+
+def percentiles(values, points=PERCENTILES):
+    """Nearest-rank percentiles plus mean/max of a list of numbers."""
+    if not values:
+        return {f"p{p}": None for p in points} | {"mean": None, "max": None}
+    ordered = sorted(values)
+    out = {}
+    for p in points:
+        rank = max(1, -(-p * len(ordered) // 100))  # ceil(p/100 * n)
+        out[f"p{p}"] = round(ordered[rank - 1], 3)
+    out["mean"] = round(sum(ordered) / len(ordered), 3)
+    out["max"] = round(ordered[-1], 3)
+    return out
+
+
+# ============================================================================
+# TARGETS
+# ============================================================================
+
+class HttpTarget:
+    """POST JSON to one endpoint, one keep-alive session per worker thread."""
+
+    def __init__(self, url, body, timeout):
+        self.url = url
+        self.body = body
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def __call__(self, prompt, user):
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        resp = session.post(self.url, json=self.body(prompt, user), timeout=self.timeout)
+        if resp.status_code >= 400:
+            return f"http_{resp.status_code}"
+        return None
+
+
+def chat_target(base, mode, model, timeout):
+    return HttpTarget(base.rstrip("/") + "/chat",
+                      lambda prompt, user: {"message": prompt, "user_id": user}, timeout)
+
+
+def llm_call_target(base, mode, model, timeout):
+    return HttpTarget(base.rstrip("/") + "/llm_call",
+                      lambda prompt, user: {"input_text": prompt, "api_mode": mode,
+                                            "model_id": model, "project_name": user}, timeout)
+
+
+class InferTarget:
+    """chat_app.llm_infer plus the GUI's push to Grasshopper."""
+
+    def __init__(self, mode, model, gh_url):
+        # imported lazily: pulls in tkinter and the server config
+        import chat_app
+        from chatGUI.chat_gui import build_gh_payload
+        from chatGUI.gh_push import GrasshopperPushQueue
+        from utils.layout_diff import LayoutTracker
+        from server.config import DEFAULT_COMPLETION
+
+        self.llm_infer = chat_app.llm_infer
+        self.build_payload = build_gh_payload
+        self.mode = mode
+        self.model = model or DEFAULT_COMPLETION.get(mode)
+        self.gh_url = gh_url
+        self.tracker = LayoutTracker()
+        self.queue = GrasshopperPushQueue(spool_path=None) if gh_url else None
+
+    def __call__(self, prompt, user):
+        response = self.llm_infer(prompt, user, self.model, self.mode)
+        if self.queue is not None:
+            payload, full = self.build_payload(self.tracker, prompt, response, user, self.model, self.mode)
+            self.queue.submit(self.gh_url, payload, key=user, full=full)
+        return None
+
+    def close(self, drain_timeout=5.0):
+        if self.queue is None:
+            return
+        deadline = time.monotonic() + drain_timeout
+        while self.queue.metrics()["queue_depth"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.queue.close()
+
+
+# ============================================================================
+# RUNNER
+# ============================================================================
+
+def run_load(target, rps, duration, concurrency, prompts=DEFAULT_PROMPTS, users=4):
+    """
+    Drive `target(prompt, user)` at `rps` for `duration` seconds.
+
+    The target returns None on success or an error label; exceptions are
+    counted by type.
+
+    Returns:
+        report dict with counts, throughput, error breakdown and latency
+        percentiles in milliseconds
+    """
+    total = max(1, int(rps * duration))
+    interval = 1.0 / rps
+    latencies, errors = [], {}
+    lock = threading.Lock()
+
+    def one(i, scheduled):
+        try:
+            error = target(prompts[i % len(prompts)], f"load_user_{i % users}")
+        except Exception as e:
+            error = type(e).__name__
+        elapsed = (time.perf_counter() - scheduled) * 1000
+        with lock:
+            if error is None:
+                latencies.append(elapsed)
+            else:
+                errors[error] = errors.get(error, 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i in range(total):
+            scheduled = start + i * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(one, i, scheduled)
+    wall = time.perf_counter() - start
+
+    failed = sum(errors.values())
+    return {
+        "requests": total,
+        "ok": len(latencies),
+        "errors": failed,
+        "error_rate": round(failed / total, 4),
+        "error_types": errors,
+        "target_rps": rps,
+        "throughput_rps": round(len(latencies) / wall, 3) if wall else None,
+        "wall_seconds": round(wall, 3),
+        "latency_ms": percentiles(latencies),
+    }
+
+
+def start_fakes(llm_options, gh_port):
+    """Start the fake LLM and fake GH listener on background threads."""
+    from bench import fake_gh, fake_llm
+
+    servers = [fake_llm.make_server(**llm_options), fake_gh.make_server(port=gh_port)]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return servers
+
+
+def format_report(name, report):
+    lat = report["latency_ms"]
+    lines = [
+        f"{name}: {report['requests']} requests at {report['target_rps']} rps in {report['wall_seconds']} s",
+        f"  ok {report['ok']}  errors {report['errors']} ({report['error_rate']:.1%})  "
+        f"throughput {report['throughput_rps']} rps",
+        "  latency ms  " + "  ".join(f"{k} {v}" for k, v in lat.items()),
+    ]
+    if report["error_types"]:
+        lines.append("  error types " + ", ".join(f"{k}={v}" for k, v in report["error_types"].items()))
+    if "gh" in report:
+        lines.append(f"  GH arrivals {report['gh']['count']} {report['gh']['kinds']}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load generator for /chat, /llm_call and llm_infer")
+    parser.add_argument("target", choices=["chat", "llm_call", "infer"])
+    parser.add_argument("--url", help="server base URL (chat/llm_call)")
+    parser.add_argument("--rps", type=float, default=2.0, help="target request rate")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load")
+    parser.add_argument("--concurrency", type=int, default=32, help="max requests in flight")
+    parser.add_argument("--users", type=int, default=4, help="distinct user ids / projects")
+    parser.add_argument("--prompts", help="file with one prompt per line")
+    parser.add_argument("--mode", default="local", help="api_mode sent to the app")
+    parser.add_argument("--model", help="model id (default for the mode)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--gh-url", default="http://127.0.0.1:8081", help="GH listener for infer ('' disables)")
+    parser.add_argument("--fakes", action="store_true", help="start fake LLM and GH listener in-process")
+    parser.add_argument("--latency", default="fixed:200", help="fake LLM time to first token (with --fakes)")
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0, help="fake LLM token rate (with --fakes)")
+    parser.add_argument("--layout-ratio", type=float, default=0.5, help="fake LLM layout replies (with --fakes)")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+    if args.rps <= 0:
+        parser.error("--rps must be positive")
+
+    prompts = DEFAULT_PROMPTS
+    if args.prompts:
+        with open(args.prompts, encoding="utf-8") as f:
+            prompts = [line.strip() for line in f if line.strip()] or DEFAULT_PROMPTS
+
+    servers = []
+    if args.fakes:
+        servers = start_fakes({"latency": args.latency, "tokens_per_sec": args.tokens_per_sec,
+                               "layout_ratio": args.layout_ratio}, gh_port=8081)
+
+    if args.target == "infer":
+        target = InferTarget(args.mode, args.model, args.gh_url or None)
+    else:
+        factory = chat_target if args.target == "chat" else llm_call_target
+        target = factory(args.url or DEFAULT_URLS[args.target], args.mode, args.model, args.timeout)
+
+    try:
+        report = run_load(target, args.rps, args.duration, args.concurrency, prompts, args.users)
+    finally:
+        if hasattr(target, "close"):
+            target.close()
+    if servers:
+        report["gh"] = servers[1].arrivals.summary()
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+
+    print(format_report(args.target, report))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,386 @@
+"""
+micro.py - Micro-benchmarks for parsing, persistence and encoding hot paths
+
+Cases (fixed, seeded synthetic inputs unless noted):
+  extract_json.*     utils.extractInfo.extract_json_from_text
+  process_response.* utils.parsing_json.process_response
+  strip_markdown     post-processing applied to query()/query_llm() replies
+  db.save.N          utils.context_data.save_conversation on a table of N rows
+                     (truncated back to N rows before each repeat)
+  db.context.N       utils.context_data.get_recent_context on a table of N rows
+  encode_image       gh_app.encode_image_to_data_uri over grasshopperFiles/house_plans
+  layout_parse       json.loads + utils.schema.normalize_layout over grasshopperFiles/jsons
+
+Each case is timed with timeit (auto-ranged loop count, several repeats,
+GC off) and reported as microseconds per call. Results are saved as a JSON
+baseline; compare mode re-runs the suite (or reads a second file) and
+flags cases whose median and best time both got slower than the threshold.
+Baselines are only comparable on the same machine and Python.
+
+    python -m bench.micro run --save bench/baselines/micro.json
+    python -m bench.micro compare bench/baselines/micro.json --threshold 0.15
+    python -m bench.micro run --filter 'db\\.' --repeat 3
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAYOUT_DIR = os.path.join(REPO_DIR, "grasshopperFiles", "jsons")
+HOUSE_PLAN_DIR = os.path.join(REPO_DIR, "grasshopperFiles", "house_plans")
+DEFAULT_BASELINE = os.path.join(REPO_DIR, "bench", "baselines", "micro.json")
+
+SEED = 1234
+DB_SIZES = (100, 10_000, 100_000)
+DB_USERS = 50  # rows are spread over this many user ids
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.10  # 10% slower is a regression
+
+ROOM_TYPES = ["LivingRoom", "Kitchen", "MasterRoom", "SecondRoom", "Bathroom", "DiningRoom",
+              "Study", "Entrance", "Storage", "Balcony", "Laundry", "ChildRoom"]
+LOCATIONS = ["north", "south", "east", "west", "center", "northeast", "southwest"]
+PROSE = ("The plan keeps the living spaces on the south side for daylight and groups "
+         "the wet rooms around a single service core to shorten the plumbing runs. ")
+
+
+# ============================================================================
+# SYNTHETIC INPUTS
+# ============================================================================
+
+def synthetic_layout(rooms, rng):
+    """query_llm-style layout: symbolic location/size, source/target edges."""
+    nodes = []
+    for i in range(rooms):
+        kind = ROOM_TYPES[i % len(ROOM_TYPES)]
+        nodes.append({"id": f"{kind.lower()}_{i}", "label": f"{kind} {i}", "type": kind,
+                      "location": rng.choice(LOCATIONS), "size": rng.choice("SML"),
+                      "floor": 1 + i // 12})
+    edges = [{"source": nodes[i]["id"], "target": nodes[rng.randrange(i)]["id"], "type": "door"}
+             for i in range(1, rooms)]
+    return {"nodes": nodes, "edges": edges}
+
+
+def synthetic_replies():
+    """Fixed replies: plain text, fenced small layout, layout buried in prose."""
+    rng = random.Random(SEED)
+    small = json.dumps(synthetic_layout(8, rng), indent=2)
+    large = json.dumps(synthetic_layout(120, rng), indent=2)
+    return {
+        "plain": PROSE * 8,
+        "small": f"Here is the layout:\n```json\n{small}\n```\n",
+        "large": PROSE * 20 + large + "\n" + PROSE * 20,
+        "bare": large,
+    }
+
+
+# ============================================================================
+# CASES
+# ============================================================================
+
+CASES = {}  # name -> setup(workdir) returning the callable to time, or (callable, reset)
+
+
+def case(name):
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+def _reply_cases():
+    replies = synthetic_replies()
+
+    for label in ("small", "large"):
+        @case(f"extract_json.{label}")
+        def _extract(workdir, text=replies[label]):
+            from utils.extractInfo import extract_json_from_text
+            return lambda: extract_json_from_text(text)
+
+    for label in ("bare", "small", "plain"):
+        @case(f"process_response.{label}")
+        def _process(workdir, text=replies[label]):
+            from utils.parsing_json import process_response
+            return lambda: process_response(text)
+
+    @case("strip_markdown")
+    def _strip(workdir, text=replies["small"]):
+        from utils.llm_calls import _strip_markdown
+        return lambda: _strip_markdown(text)
+
+
+_reply_cases()
+
+
+@contextlib.contextmanager
+def _cwd(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def _database(workdir, rows):
+    """context_data pointed at a fresh database of `rows` synthetic exchanges."""
+    with _cwd(workdir):  # importing context_data creates conversations.db in the cwd
+        from utils import context_data
+    path = os.path.join(workdir, f"conversations_{rows}.db")
+    if not os.path.exists(path):
+        context_data.DB_PATH = path
+        context_data.init_db()
+        rng = random.Random(SEED)
+        stamp = datetime.datetime(2025, 1, 1)
+        with contextlib.closing(context_data.sqlite3.connect(path)) as conn:
+            conn.executemany(
+                "INSERT INTO conversations (user_id, message, response, timestamp) VALUES (?, ?, ?, ?)",
+                ((f"user_{rng.randrange(DB_USERS)}", PROSE[:80], PROSE * 3,
+                  stamp + datetime.timedelta(seconds=i)) for i in range(rows)))
+            conn.commit()
+    context_data.DB_PATH = path
+    return context_data
+
+
+def _db_cases():
+    for rows in DB_SIZES:
+        @case(f"db.save.{rows}")
+        def _save(workdir, rows=rows):
+            context_data = _database(workdir, rows)
+
+            def truncate():  # drop the rows earlier loops appended, so every repeat starts at N
+                with contextlib.closing(context_data.sqlite3.connect(context_data.DB_PATH)) as conn:
+                    conn.execute("DELETE FROM conversations WHERE id > ?", (rows,))
+                    conn.commit()
+            return lambda: context_data.save_conversation("user_0", PROSE[:80], PROSE * 3), truncate
+
+        @case(f"db.context.{rows}")
+        def _context(workdir, rows=rows):
+            context_data = _database(workdir, rows)
+            return lambda: context_data.get_recent_context("user_0", limit=2)
+
+
+_db_cases()
+
+
+@case("encode_image")
+def _encode_image(workdir):
+    from gh_app import encode_image_to_data_uri
+    paths = sorted(os.path.join(HOUSE_PLAN_DIR, name) for name in os.listdir(HOUSE_PLAN_DIR)
+                   if name.lower().endswith(".png"))
+
+    def encode_all():
+        for path in paths:
+            encode_image_to_data_uri(path)
+    return encode_all
+
+
+@case("layout_parse")
+def _layout_parse(workdir):
+    from utils.schema import normalize_layout
+    texts = []
+    for name in sorted(os.listdir(LAYOUT_DIR)):
+        if name.endswith(".json"):
+            with open(os.path.join(LAYOUT_DIR, name), encoding="utf-8") as f:
+                texts.append(f.read())
+
+    def parse_all():
+        for text in texts:
+            normalize_layout(json.loads(text))
+    return parse_all
+
+
+# ============================================================================
+# RUNNER
+# ============================================================================
+
+def measure(fn, repeat=DEFAULT_REPEAT, reset=None):
+    """
+    Microseconds per call: median, best and worst of `repeat` timed loops.
+
+    reset: optional callable run (untimed) before each loop, for cases whose
+    calls change the state they are timed against
+    """
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()  # loop count for >= 0.2 s per repeat
+    runs = []
+    for _ in range(repeat):
+        if reset:
+            reset()
+        runs.append(timer.timeit(number) / number * 1e6)
+    runs.sort()
+    return {"median_us": round(runs[len(runs) // 2], 3), "min_us": round(runs[0], 3),
+            "max_us": round(runs[-1], 3), "number": number, "repeat": repeat}
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_suite(pattern=None, repeat=DEFAULT_REPEAT, names=None, progress=None):
+    """
+    Run the matching cases.
+
+    Returns:
+        {"meta": {...}, "results": {name: timings}, "skipped": {name: reason}}
+    """
+    selected = [name for name in CASES
+                if (pattern is None or re.search(pattern, name)) and (names is None or name in names)]
+    results, skipped = {}, {}
+    workdir = tempfile.mkdtemp(prefix="bench_micro_")
+    try:
+        for name in selected:
+            try:
+                fn = CASES[name](workdir)
+            except (ImportError, OSError) as e:
+                skipped[name] = f"{type(e).__name__}: {e}"
+                continue
+            fn, reset = fn if isinstance(fn, tuple) else (fn, None)
+            results[name] = measure(fn, repeat, reset)
+            if progress:
+                progress(name, results[name])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    meta = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.node(),
+    }
+    return {"meta": meta, "results": results, "skipped": skipped}
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Per-case change of `current` against `baseline`.
+
+    A case regresses when both its median and its best time are more than
+    `threshold` slower (the best time filters out one-off noise).
+
+    Returns:
+        list of {"name", "baseline_us", "current_us", "change", "status"}
+    """
+    rows = []
+    old, new = baseline["results"], current["results"]
+    for name in list(old) + [n for n in new if n not in old]:
+        if name not in new:
+            rows.append({"name": name, "baseline_us": old[name]["median_us"], "current_us": None,
+                         "change": None, "status": "missing"})
+            continue
+        if name not in old:
+            rows.append({"name": name, "baseline_us": None, "current_us": new[name]["median_us"],
+                         "change": None, "status": "new"})
+            continue
+        change = new[name]["median_us"] / old[name]["median_us"] - 1
+        best_change = new[name]["min_us"] / old[name]["min_us"] - 1
+        if change > threshold and best_change > threshold:
+            status = "REGRESSION"
+        elif change < -threshold and best_change < -threshold:
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append({"name": name, "baseline_us": old[name]["median_us"],
+                     "current_us": new[name]["median_us"], "change": round(change, 4), "status": status})
+    return rows
+
+
+def format_results(report):
+    lines = [f"{'case':<28} {'median us':>12} {'min us':>12} {'loops':>8}"]
+    for name, r in report["results"].items():
+        lines.append(f"{name:<28} {r['median_us']:>12.3f} {r['min_us']:>12.3f} {r['number']:>8}")
+    for name, reason in report.get("skipped", {}).items():
+        lines.append(f"{name:<28} skipped ({reason})")
+    return "\n".join(lines)
+
+
+def format_comparison(rows, threshold):
+    def us(value):
+        return f"{value:.3f}" if value is not None else "-"
+
+    lines = [f"{'case':<28} {'baseline us':>12} {'current us':>12} {'change':>8}  status "
+             f"(threshold {threshold:.0%})"]
+    for row in rows:
+        change = f"{row['change']:+.1%}" if row["change"] is not None else "-"
+        lines.append(f"{row['name']:<28} {us(row['baseline_us']):>12} {us(row['current_us']):>12} "
+                     f"{change:>8}  {row['status']}")
+    return "\n".join(lines)
+
+
+def _load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save(report, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmarks with JSON baselines")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="run the suite and print (optionally save) the results")
+    run.add_argument("--save", nargs="?", const=DEFAULT_BASELINE, help="write results as a baseline")
+
+    cmp = sub.add_parser("compare", help="compare against a baseline; exit 1 on regressions")
+    cmp.add_argument("baseline", nargs="?", default=DEFAULT_BASELINE)
+    cmp.add_argument("current", nargs="?", help="results file to compare (default: run the suite now)")
+    cmp.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown, e.g. 0.1")
+    cmp.add_argument("--save", help="also write the new results to this file")
+
+    for p in (run, cmp):
+        p.add_argument("--filter", help="regex selecting case names")
+        p.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed loops per case")
+    sub.add_parser("list", help="list case names")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        print("\n".join(CASES))
+        return 0
+
+    def progress(name, timings):
+        print(f"  {name}: {timings['median_us']:.3f} us", file=sys.stderr)
+
+    if args.command == "run":
+        report = run_suite(args.filter, args.repeat, progress=progress)
+        print(format_results(report))
+        if args.save:
+            _save(report, args.save)
+            print(f"baseline written to {args.save}")
+        return 0
+
+    baseline = _load(args.baseline)
+    if args.current:
+        current = _load(args.current)
+    else:
+        current = run_suite(args.filter, args.repeat, names=set(baseline["results"]), progress=progress)
+        if args.save:
+            _save(current, args.save)
+    rows = compare(baseline, current, args.threshold)
+    print(format_comparison(rows, args.threshold))
+    regressions = [row["name"] for row in rows if row["status"] == "REGRESSION"]
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,286 @@
+"""
+replay.py - Re-issue recorded traffic against a server and compare
+
+Reads traces written by utils.recorder (a directory of trace-*.jsonl
+files, rotated ones included, or single files), orders the requests by
+their recorded start time and sends them to the target:
+
+  --speed 1      at the recorded pace (default)
+  --speed 4      four times faster
+  --speed max    as fast as --concurrency allows
+
+Requests go out on schedule whether or not earlier ones have finished, as
+in bench.load. Each one asks for Server-Timing, so the replayed server time
+is compared with the recorded server time (client latency is reported as
+well). The report covers latency percentiles per endpoint, the p50/p95
+deltas, status mismatches and response-body mismatches (by hash; replies
+from a real LLM are expected to differ, so run the target and the
+recording against the fake LLM with a fixed --seed to compare bodies).
+
+Requests that refer to server state from the recording (job polls and
+cancels) and payloads that were too large to record are skipped.
+
+    python -m bench.replay traces --target http://127.0.0.1:5000 --speed 4
+    python -m bench.replay traces/trace-4242.jsonl --speed max --fakes --json replay.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bench.load import percentiles, start_fakes
+from utils.recorder import body_hash
+
+DEFAULT_TARGET = "http://127.0.0.1:5000"
+SKIP_ENDPOINTS = {"get_job", "cancel_job"}  # ids from the recording don't exist on the target
+_TOTAL = re.compile(r"(?:^|,)\s*total;dur=([\d.]+)")
+
+
+# ============================================================================
+# TRACES
+# ============================================================================
+
+def trace_files(paths):
+    """Expand directories to their trace files (rotated ones included)."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(glob.glob(os.path.join(path, "trace-*.jsonl*")))
+        else:
+            files.append(path)
+    return files
+
+
+def load_trace(paths, endpoint=None):
+    """
+    Replayable records from trace files, oldest first.
+
+    Returns:
+        (records, skipped) where skipped counts records by reason
+    """
+    records, skipped = [], {}
+
+    def skip(reason):
+        skipped[reason] = skipped.get(reason, 0) + 1
+
+    for path in trace_files(paths):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    skip("unreadable")
+                    continue
+                if endpoint and not re.search(endpoint, record.get("endpoint") or ""):
+                    continue
+                if (record.get("endpoint") or "").rpartition(".")[2] in SKIP_ENDPOINTS:
+                    skip("stateful")
+                elif "payload_truncated" in record:
+                    skip("payload_too_large")
+                else:
+                    records.append(record)
+    records.sort(key=lambda r: r["ts"])
+    return records, skipped
+
+
+# ============================================================================
+# REPLAY
+# ============================================================================
+
+def server_ms(response):
+    """Total server time from a Server-Timing header (None if absent)."""
+    match = _TOTAL.search(response.headers.get("Server-Timing", ""))
+    return float(match.group(1)) if match else None
+
+
+class Replayer:
+    """Sends recorded requests, one keep-alive session per worker thread."""
+
+    def __init__(self, target, timeout):
+        self.target = target.rstrip("/")
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def __call__(self, record):
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        url = self.target + record["path"] + (f"?{record['query']}" if record.get("query") else "")
+        headers = dict(record.get("headers") or {}, **{"X-Server-Timing": "1"})
+        if record.get("request_id"):
+            headers["X-Request-ID"] = f"replay-{record['request_id']}"
+        kwargs = {"json": record["payload"]} if "payload" in record else {"data": record.get("body")}
+        start = time.perf_counter()
+        resp = session.request(record["method"], url, headers=headers, timeout=self.timeout, **kwargs)
+        client = (time.perf_counter() - start) * 1000
+        recorded = record.get("response") or {}
+        return {
+            "status": resp.status_code,
+            "server_ms": server_ms(resp),
+            "client_ms": round(client, 3),
+            "body_match": body_hash(resp.content) == recorded["sha1"] if "sha1" in recorded else None,
+        }
+
+
+def replay(records, send, speed=1.0, concurrency=32):
+    """
+    Issue `records` through `send(record)`.
+
+    speed: time compression of the recorded schedule; None sends at once
+    (bounded by `concurrency`)
+
+    Returns:
+        list of (record, outcome) with outcome["error"] set on failures
+    """
+    results = [None] * len(records)
+
+    def one(i):
+        record = records[i]
+        try:
+            outcome = send(record)
+        except Exception as e:
+            outcome = {"error": type(e).__name__}
+        results[i] = (record, outcome)
+
+    start = time.perf_counter()
+    t0 = records[0]["ts"] if records else 0.0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i, record in enumerate(records):
+            if speed is not None:
+                delay = start + (record["ts"] - t0) / speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            pool.submit(one, i)
+    return results
+
+
+# ============================================================================
+# REPORT
+# ============================================================================
+
+def _delta(old, new):
+    if old is None or new is None:
+        return None
+    return {"ms": round(new - old, 3), "pct": round((new / old - 1) * 100, 1) if old else None}
+
+
+def summarize(results):
+    """Per-endpoint and overall latency deltas and mismatch counts."""
+    groups = {}
+    for record, outcome in results:
+        groups.setdefault(record.get("endpoint") or record["path"], []).append((record, outcome))
+    groups["all"] = results
+
+    report = {}
+    for name, items in groups.items():
+        done = [(r, o) for r, o in items if "error" not in o]
+        recorded = percentiles([r["ms"] for r, _ in done])
+        replayed = percentiles([o["server_ms"] if o["server_ms"] is not None else o["client_ms"]
+                                for _, o in done])
+        errors = {}
+        for _, o in items:
+            if "error" in o:
+                errors[o["error"]] = errors.get(o["error"], 0) + 1
+        mismatched = [(r, o) for r, o in done if o["status"] != r["status"]]
+        report[name] = {
+            "requests": len(items),
+            "errors": errors,
+            "recorded_ms": recorded,
+            "replay_ms": replayed,
+            "client_ms": percentiles([o["client_ms"] for _, o in done]),
+            "delta_p50": _delta(recorded["p50"], replayed["p50"]),
+            "delta_p95": _delta(recorded["p95"], replayed["p95"]),
+            "status_mismatches": len(mismatched),
+            "body_mismatches": sum(o["body_match"] is False for _, o in done),
+            "body_compared": sum(o["body_match"] is not None for _, o in done),
+            "mismatch_examples": [f"{r['method']} {r['path']}: recorded {r['status']}, replayed {o['status']}"
+                                  for r, o in mismatched[:3]],
+        }
+    return report
+
+
+def format_report(report, skipped):
+    def delta(d):
+        return f"{d['ms']:+.1f} ms ({d['pct']:+.1f}%)" if d and d["pct"] is not None else "-"
+
+    lines = []
+    for name, r in report.items():
+        lines.append(f"{name}: {r['requests']} requests, errors {sum(r['errors'].values())}")
+        lines.append(f"  recorded ms  p50 {r['recorded_ms']['p50']}  p95 {r['recorded_ms']['p95']}")
+        lines.append(f"  replay ms    p50 {r['replay_ms']['p50']}  p95 {r['replay_ms']['p95']}  "
+                     f"(client p50 {r['client_ms']['p50']})")
+        lines.append(f"  delta        p50 {delta(r['delta_p50'])}  p95 {delta(r['delta_p95'])}")
+        lines.append(f"  mismatches   status {r['status_mismatches']}  "
+                     f"body {r['body_mismatches']}/{r['body_compared']}")
+        for example in r["mismatch_examples"]:
+            lines.append(f"    {example}")
+        if r["errors"]:
+            lines.append("  error types " + ", ".join(f"{k}={v}" for k, v in r["errors"].items()))
+    if skipped:
+        lines.append("skipped " + ", ".join(f"{k}={v}" for k, v in skipped.items()))
+    return "\n".join(lines)
+
+
+def parse_speed(value):
+    if value == "max":
+        return None
+    speed = float(value)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive or 'max'")
+    return speed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded traffic and compare latency and responses")
+    parser.add_argument("traces", nargs="+", help="trace files or directories (utils.recorder output)")
+    parser.add_argument("--target", default=DEFAULT_TARGET, help="server base URL")
+    parser.add_argument("--speed", type=parse_speed, default=1.0, help="recorded pace multiplier, or 'max'")
+    parser.add_argument("--concurrency", type=int, default=32, help="max requests in flight")
+    parser.add_argument("--endpoint", help="regex selecting endpoints to replay")
+    parser.add_argument("--limit", type=int, help="replay only the first N records")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--fakes", action="store_true", help="start fake LLM and GH listener in-process")
+    parser.add_argument("--latency", default="fixed:200", help="fake LLM time to first token (with --fakes)")
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0, help="fake LLM token rate (with --fakes)")
+    parser.add_argument("--layout-ratio", type=float, default=0.5, help="fake LLM layout replies (with --fakes)")
+    parser.add_argument("--seed", type=int, help="fake LLM seed (with --fakes)")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    records, skipped = load_trace(args.traces, args.endpoint)
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        print("no replayable records", file=sys.stderr)
+        return 1
+
+    servers = []
+    if args.fakes:
+        servers = start_fakes({"latency": args.latency, "tokens_per_sec": args.tokens_per_sec,
+                               "layout_ratio": args.layout_ratio, "seed": args.seed}, gh_port=8081)
+    try:
+        results = replay(records, Replayer(args.target, args.timeout), args.speed, args.concurrency)
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+
+    report = summarize(results)
+    print(format_report(report, skipped))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"report": report, "skipped": skipped}, f, indent=2)
+    total = report["all"]
+    return 1 if total["status_mismatches"] or total["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,481 @@
+"""
+chat_display.py - Bounded, stream-friendly chat transcripts for the Chat Assistant
+
+Each project has its own transcript; the Text widget shows one at a time
+and switching projects redraws only the newest MAX_VISIBLE_MESSAGES of the
+cached transcript. Stored history is paged in lazily through a loader
+callback: the newest page when a project is first shown, older pages when
+the user scrolls to the top (or clicks the banner there).
+
+Older messages are trimmed from the widget but stay in memory and are
+restored a page at a time. Streamed chunks may arrive from any thread:
+they are buffered and drawn in one batch per frame (STREAM_FRAME_MS), so a
+fast token stream costs at most one widget update per frame. Large JSON
+replies are shown as a one-line summary that expands on click.
+"""
+
+import json
+import threading
+import tkinter as tk
+from collections import OrderedDict
+from itertools import count
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from chatGUI.config import (
+    MAX_VISIBLE_MESSAGES, RELOAD_PAGE_SIZE, STREAM_FRAME_MS, COLLAPSE_JSON_CHARS,
+    PROJECT_CACHE_SIZE, DARK_THEME
+)
+from utils.extractInfo import extract_json_from_text
+
+
+def summarize_json(text: str) -> Optional[str]:
+    """
+    One-line summary of a reply that is mostly JSON.
+
+    Args:
+        text: Reply text
+
+    Returns:
+        Summary such as "Layout JSON · 12 rooms, 15 edges · 8.3 KB",
+        or None if the text holds no JSON object
+    """
+    json_str = extract_json_from_text(text)
+    if not json_str:
+        return None
+    try:
+        data = json.loads(json_str)
+    except ValueError:
+        return None
+    size = f"{len(text.encode('utf-8')) / 1024:.1f} KB"
+    if isinstance(data, dict) and "nodes" in data and "edges" in data:
+        return f"Layout JSON · {len(data['nodes'])} rooms, {len(data['edges'])} edges · {size}"
+    if isinstance(data, dict):
+        keys = ", ".join(list(data)[:4]) + (", …" if len(data) > 4 else "")
+        return f"JSON · {{{keys}}} · {size}"
+    return f"JSON · {size}"
+
+
+class Transcript:
+    """Messages of one project plus the paging state of its stored history."""
+
+    def __init__(self):
+        self.messages: List[Dict[str, Any]] = []
+        self.first_visible = 0  # messages[first_visible:] are in the widget when shown
+        self.history_cursor: Optional[int] = None  # before_id for the next older page
+        self.has_more = True  # stored history not fully loaded yet
+        self.loading = False
+
+
+class ChatDisplay:
+    """Message-level view over a Tk Text widget."""
+
+    def __init__(
+        self,
+        root: tk.Misc,
+        text: tk.Text,
+        history_loader: Optional[Callable[[str, Optional[int]], None]] = None,
+        max_visible: int = MAX_VISIBLE_MESSAGES,
+        page_size: int = RELOAD_PAGE_SIZE,
+        frame_ms: int = STREAM_FRAME_MS,
+        collapse_chars: int = COLLAPSE_JSON_CHARS,
+        cache_size: int = PROJECT_CACHE_SIZE
+    ):
+        """
+        Initialize the display.
+
+        Args:
+            root: Widget used to schedule after() callbacks
+            text: Text widget to draw into (style tags already configured)
+            history_loader: Called as loader(project, before_id) to fetch a
+                            page of stored history in the background; it
+                            answers with add_history() on the Tk thread
+            max_visible: Messages kept in the widget while following the end
+            page_size: Older messages restored per banner click
+            frame_ms: Minimum interval between streamed redraws
+            collapse_chars: Replies longer than this that contain JSON collapse
+            cache_size: Project transcripts kept in memory
+        """
+        self.root = root
+        self.text = text
+        self.history_loader = history_loader
+        self.max_visible = max_visible
+        self.page_size = page_size
+        self.frame_ms = frame_ms
+        self.collapse_chars = collapse_chars
+        self.cache_size = cache_size
+
+        # project -> Transcript, least recently shown first
+        self.transcripts: "OrderedDict[str, Transcript]" = OrderedDict()
+        self.project: Optional[str] = None
+        self.current = Transcript()
+        self.ids = count()
+        self.paging = False
+
+        # Shared with worker threads
+        self.lock = threading.Lock()
+        self.ops: List[tuple] = []
+        self.streams: Dict[int, Dict[str, Any]] = {}
+        self.flush_pending = False
+
+        self.text.tag_config("more", foreground=DARK_THEME["muted"], justify="center")
+        self.text.tag_bind("more", "<Button-1>", lambda e: self.load_older())
+        self.text.tag_config("toggle", foreground=DARK_THEME["select"], underline=True)
+        self.text.tag_bind("toggle", "<Button-1>", self._on_toggle)
+        for tag in ("more", "toggle"):
+            self.text.tag_bind(tag, "<Enter>", lambda e: self.text.config(cursor="hand2"))
+            self.text.tag_bind(tag, "<Leave>", lambda e: self.text.config(cursor="xterm"))
+
+        # Scrolling to the top pages in older messages
+        self.scroll_command = str(self.text.cget("yscrollcommand"))
+        self.text.configure(yscrollcommand=self._on_scroll)
+
+    # ========================================================================
+    # PUBLIC API
+    # ========================================================================
+
+    def show(self, project: str) -> None:
+        """Switch the widget to a project's transcript (Tk thread)."""
+        if project == self.project:
+            return
+        self._flush()
+        for msg in self.current.messages[self.current.first_visible:]:
+            self._forget(msg)
+        self.text.delete("1.0", "end")
+
+        with self.lock:
+            transcript = self._transcript(project)
+            self.transcripts.move_to_end(project)
+            self.project, self.current = project, transcript
+        self._evict()
+
+        transcript.first_visible = max(0, len(transcript.messages) - self.max_visible)
+        for msg in transcript.messages[transcript.first_visible:]:
+            self._render(msg, "end")
+        self._update_banner()
+        self.text.see("end")
+        if not transcript.messages:
+            self._request_history(transcript)
+
+    def add(self, text: str, tag: str = "system", header: str = "", project: Optional[str] = None) -> int:
+        """Append a complete message (Tk thread). Returns its id."""
+        self._flush()  # keep widget order equal to message order
+        msg = self._new_message(header, tag, text, streaming=False)
+        with self.lock:
+            transcript = self._transcript(project)
+            transcript.messages.append(msg)
+        if transcript is self.current:
+            follow = self._at_bottom()
+            self._render(msg, "end")
+            self._finish_update(follow)
+        return msg["id"]
+
+    def begin_stream(self, header: str, tag: str = "assistant", project: Optional[str] = None) -> int:
+        """Start a streamed message (any thread). Returns its id."""
+        msg = self._new_message(header, tag, "", streaming=True)
+        with self.lock:
+            transcript = self._transcript(project)
+            transcript.messages.append(msg)
+            self.streams[msg["id"]] = msg
+            self.ops.append(("begin", msg, transcript))
+        self._schedule_flush()
+        return msg["id"]
+
+    def stream(self, msg_id: int, chunk: str) -> None:
+        """Append a chunk to a streamed message (any thread)."""
+        with self.lock:
+            self.ops.append(("chunk", msg_id, chunk))
+        self._schedule_flush()
+
+    def end_stream(self, msg_id: int, final_text: Optional[str] = None) -> None:
+        """
+        Finish a streamed message (any thread).
+
+        Args:
+            msg_id: Id from begin_stream
+            final_text: Replaces the streamed text (e.g. the cleaned-up reply)
+        """
+        with self.lock:
+            self.ops.append(("end", msg_id, final_text))
+        self._schedule_flush()
+
+    def add_history(
+        self,
+        project: str,
+        entries: List[Tuple[str, str, str]],
+        cursor: Optional[int],
+        has_more: bool
+    ) -> None:
+        """
+        Put a page of stored history above a project's messages (Tk thread).
+
+        Args:
+            project: Project the page belongs to
+            entries: (header, body, tag) tuples, oldest first
+            cursor: before_id for the next older page
+            has_more: Whether older pages exist
+        """
+        page = [self._new_message(header, tag, body, streaming=False) for header, body, tag in entries]
+        with self.lock:
+            transcript = self._transcript(project)
+            transcript.messages[0:0] = page
+        transcript.loading = False
+        transcript.history_cursor = cursor
+        transcript.has_more = has_more
+
+        if transcript is not self.current or transcript.first_visible > 0:
+            # older than messages already hidden behind the banner
+            transcript.first_visible += len(page)
+            if transcript is self.current:
+                self._update_banner()
+            return
+        self._render_above(page)
+
+    def load_older(self) -> None:
+        """Restore the previous page of trimmed messages, or fetch older stored history."""
+        self.paging = False
+        transcript = self.current
+        if transcript.first_visible == 0:
+            self._request_history(transcript)
+            return
+        start = max(0, transcript.first_visible - self.page_size)
+        page = transcript.messages[start:transcript.first_visible]
+        transcript.first_visible = start
+        self._render_above(page)
+
+    # ========================================================================
+    # TRANSCRIPTS AND HISTORY
+    # ========================================================================
+
+    def _transcript(self, project: Optional[str]) -> Transcript:
+        """Transcript of a project (the shown one if None); caller holds the lock."""
+        if project is None:
+            return self.current
+        transcript = self.transcripts.get(project)
+        if transcript is None:
+            transcript = self.transcripts[project] = Transcript()
+        return transcript
+
+    def _evict(self) -> None:
+        """Forget least recently shown transcripts beyond the cache size (not while streaming)."""
+        with self.lock:
+            for project in list(self.transcripts):
+                if len(self.transcripts) <= self.cache_size:
+                    break
+                transcript = self.transcripts[project]
+                if transcript is not self.current and not any(
+                        m["streaming"] for m in transcript.messages[-8:]):
+                    del self.transcripts[project]
+
+    def _request_history(self, transcript: Transcript) -> None:
+        if self.history_loader is None or transcript.loading or not transcript.has_more:
+            return
+        transcript.loading = True
+        self._update_banner()
+        self.history_loader(self.project, transcript.history_cursor)
+
+    def _on_scroll(self, first: str, last: str) -> None:
+        if self.scroll_command:
+            self.root.tk.call(self.scroll_command, first, last)
+        transcript = self.current
+        if (float(first) <= 0.0 and float(last) < 1.0 and not self.paging and not transcript.loading
+                and (transcript.first_visible > 0 or transcript.has_more)):
+            # top of a scrollable view: page in more once the scroll settles
+            self.paging = True
+            self.root.after_idle(self.load_older)
+
+    # ========================================================================
+    # RENDERING
+    # ========================================================================
+
+    def _new_message(self, header: str, tag: str, body: str, streaming: bool) -> Dict[str, Any]:
+        msg = {
+            "id": next(self.ids), "header": header, "tag": tag, "body": body,
+            "streaming": streaming, "collapsed": False, "summary": None
+        }
+        if not streaming:
+            self._collapse(msg)
+        return msg
+
+    def _collapse(self, msg: Dict[str, Any]) -> None:
+        if len(msg["body"]) > self.collapse_chars:
+            msg["summary"] = summarize_json(msg["body"])
+            msg["collapsed"] = msg["summary"] is not None
+
+    def _first_index(self) -> str:
+        """Index where the first visible message starts (after the banner)."""
+        ranges = self.text.tag_ranges("more")
+        return str(ranges[-1]) if ranges else "1.0"
+
+    def _render_above(self, page: List[Dict[str, Any]]) -> None:
+        """Insert messages above the visible ones without moving the view."""
+        follow = self._at_bottom()
+        self.text.mark_set("view", "@0,0")
+        self.text.mark_set("older", self._first_index())  # moves past each insert
+        for msg in page:
+            self._render(msg, "older")
+        self.text.mark_unset("older")
+        self._update_banner()
+        if follow:
+            self.text.see("end")
+        else:
+            self.text.yview("view")
+        self.text.mark_unset("view")
+
+    def _body_segments(self, msg: Dict[str, Any]) -> List[Any]:
+        """insert() arguments for the body: plain text, or a toggle line."""
+        base = (msg["tag"], f"m{msg['id']}", f"b{msg['id']}")
+        if msg["summary"] is None:
+            return [msg["body"], base]
+        toggle = base + ("toggle", f"t{msg['id']}")
+        if msg["collapsed"]:
+            return [f"▸ {msg['summary']} (click to expand)", toggle]
+        return [f"▾ {msg['summary']} (click to collapse)\n", toggle, msg["body"], base]
+
+    def _render(self, msg: Dict[str, Any], index: str) -> None:
+        """
+        Insert a whole message at `index`.
+
+        The body is tagged b<id> and followed by the mark e<id>; streamed
+        chunks are inserted at that mark, which moves past them.
+        """
+        mid = msg["id"]
+        self.text.mark_set("render", index)
+        if msg["header"]:
+            self.text.insert("render", msg["header"], (msg["tag"], f"m{mid}"))
+        if msg["streaming"]:
+            self.text.insert("render", msg["body"], (msg["tag"], f"m{mid}", f"b{mid}"))
+        else:
+            self.text.insert("render", *self._body_segments(msg))
+        self.text.insert("render", "\n\n", (f"m{mid}",))
+        self.text.mark_set(f"e{mid}", "render-2c")
+        self.text.mark_unset("render")
+
+    def _replace_body(self, msg: Dict[str, Any]) -> None:
+        mid = msg["id"]
+        ranges = self.text.tag_ranges(f"b{mid}")
+        if ranges:
+            self.text.delete(ranges[0], f"e{mid}")
+        self.text.insert(f"e{mid}", *self._body_segments(msg))
+
+    def _on_toggle(self, event) -> str:
+        for name in self.text.tag_names(f"@{event.x},{event.y}"):
+            if name.startswith("t") and name[1:].isdigit():
+                msg = self._find(int(name[1:]))
+                if msg is not None:
+                    msg["collapsed"] = not msg["collapsed"]
+                    self._replace_body(msg)
+                break
+        return "break"
+
+    def _find(self, msg_id: int) -> Optional[Dict[str, Any]]:
+        for msg in reversed(self.current.messages):
+            if msg["id"] == msg_id:
+                return msg
+        return None
+
+    def _visible(self, msg: Dict[str, Any]) -> bool:
+        return bool(self.text.tag_ranges(f"m{msg['id']}"))
+
+    def _finalize(self, msg: Dict[str, Any], final_text: Optional[str]) -> None:
+        """Apply the final text of a streamed message and collapse large JSON."""
+        msg["streaming"] = False
+        if final_text is not None:
+            msg["body"] = final_text
+        self._collapse(msg)
+        if self._visible(msg) and (final_text is not None or msg["summary"] is not None):
+            self._replace_body(msg)
+
+    # ========================================================================
+    # BATCHED UPDATES
+    # ========================================================================
+
+    def _schedule_flush(self) -> None:
+        with self.lock:
+            if self.flush_pending:
+                return
+            self.flush_pending = True
+        self.root.after(self.frame_ms, self._flush)
+
+    def _flush(self) -> None:
+        """Apply queued stream operations (Tk thread, at most once per frame)."""
+        with self.lock:
+            ops, self.ops = self.ops, []
+            self.flush_pending = False
+        if not ops:
+            return
+        follow = self._at_bottom()
+
+        # Coalesce chunks: one insert per message per frame
+        pending: Dict[int, List[str]] = {}
+        for op in ops:
+            if op[0] == "chunk":
+                pending.setdefault(op[1], []).append(op[2])
+
+        for op in ops:
+            kind = op[0]
+            if kind == "begin":
+                if op[2] is self.current:
+                    self._render(op[1], "end")
+            elif kind == "chunk":
+                chunks = pending.pop(op[1], None)
+                msg = self.streams.get(op[1])
+                if chunks and msg is not None:
+                    piece = "".join(chunks)
+                    msg["body"] += piece
+                    if self._visible(msg):
+                        mid = msg["id"]
+                        self.text.insert(f"e{mid}", piece, (msg["tag"], f"m{mid}", f"b{mid}"))
+            elif kind == "end":
+                with self.lock:
+                    msg = self.streams.pop(op[1], None)
+                if msg is not None:
+                    self._finalize(msg, op[2])
+
+        self._finish_update(follow)
+
+    def _at_bottom(self) -> bool:
+        return self.text.yview()[1] >= 0.999
+
+    def _finish_update(self, follow: bool) -> None:
+        """Trim scrollback and keep following the end if the view was there."""
+        limit = self.max_visible if follow else self.max_visible * 2
+        self._trim(limit)
+        if follow:
+            self.text.see("end")
+
+    def _trim(self, limit: int) -> None:
+        """Drop the oldest visible messages beyond `limit` from the widget."""
+        transcript = self.current
+        excess = len(transcript.messages) - transcript.first_visible - limit
+        if excess <= 0:
+            return
+        for msg in transcript.messages[transcript.first_visible:transcript.first_visible + excess]:
+            if msg["streaming"]:
+                break
+            ranges = self.text.tag_ranges(f"m{msg['id']}")
+            if ranges:
+                self.text.delete(ranges[0], ranges[-1])
+            self._forget(msg)
+            transcript.first_visible += 1
+        self._update_banner()
+
+    def _forget(self, msg: Dict[str, Any]) -> None:
+        """Drop a message's tags and mark from the widget (Tk slows down with many tags)."""
+        mid = msg["id"]
+        self.text.tag_delete(f"m{mid}", f"b{mid}", f"t{mid}")
+        self.text.mark_unset(f"e{mid}")
+
+    def _update_banner(self) -> None:
+        ranges = self.text.tag_ranges("more")
+        if ranges:
+            self.text.delete(ranges[0], ranges[-1])
+        transcript = self.current
+        if transcript.first_visible > 0:
+            label = f"▲ {transcript.first_visible} earlier messages (click to load)"
+        elif transcript.loading:
+            label = "▲ Loading history…"
+        elif transcript.has_more and transcript.messages and self.history_loader is not None:
+            label = "▲ Earlier history (click to load)"
+        else:
+            return
+        self.text.insert("1.0", label + "\n\n", ("more",))
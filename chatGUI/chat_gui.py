@@ -5,24 +5,98 @@ chat_gui.py - GUI components for the Chat Assistant
 import tkinter as tk
 from tkinter import ttk, scrolledtext
 import threading
-import requests
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Callable
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from chatGUI.config import (
     APP_TITLE, WINDOW_SIZE, DARK_THEME, CHAT_FONT, INPUT_FONT,
     TEXT_MARGINS, TIME_FORMAT, DEFAULT_PROJECT_NAME, DEFAULT_RUN_MODE,
-    DEFAULT_GH_URL, DEFAULT_AUTO_PUSH, GH_TIMEOUT_SECONDS
+    DEFAULT_GH_URL, DEFAULT_AUTO_PUSH, GUI_WORKERS, STATUS_TICK_MS,
+    PROJECT_SWITCH_MS, HISTORY_TIME_FORMAT
 )
+from chatGUI.chat_display import ChatDisplay
+from chatGUI.gh_push import GrasshopperPushQueue
+from utils.context_data import get_history_page
+from utils.extractInfo import extract_layout_from_text
+from utils.layout_diff import LayoutTracker
+from utils.llm_calls import CancelToken, StreamCancelled
+from utils.logs import fields, get_logger
 
 # Import these from your existing modules
 from server.config import COMPLETION_MODELS, DEFAULT_COMPLETION
 
+log = get_logger("gui")
+
+
+def build_gh_payload(
+    tracker: LayoutTracker,
+    user_input: str,
+    ai_response: str,
+    project: str,
+    model: str,
+    mode: str
+) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """
+    Build the Grasshopper payload for one exchange.
+    
+    Every payload carries the reply as "ai_response". A reply containing a
+    layout also carries it as a structural diff against the project's
+    previous layout ("layout_diff"), or in full ("layout") for the first one
+    or when no diff reproduces it. A layout identical to the previous one
+    is not sent again, only its "hash".
+    
+    Args:
+        tracker: Latest layout per project (updated in place)
+        user_input: User message
+        ai_response: Model reply
+        project: Project name
+        model: Model identifier
+        mode: API mode
+        
+    Returns:
+        (payload, full) where full is the payload with the whole layout
+        instead of the diff (None unless it is a diff)
+    """
+    payload = {
+        "user_input": user_input,
+        "ai_response": ai_response,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "project_name": project,
+        "model": model,
+        "api_mode": mode
+    }
+    
+    layout = extract_layout_from_text(ai_response)
+    if layout is None:
+        return payload, None
+    update = tracker.update(project, layout)
+    if update["kind"] == "full":
+        payload.update(layout=update["layout"], hash=update["hash"])
+        return payload, None
+    if update["diff"]["base_hash"] == update["diff"]["hash"]:
+        payload.update(hash=update["diff"]["hash"])
+        return payload, None
+    full = dict(payload, layout=layout, hash=update["diff"]["hash"])
+    payload.update(
+        layout_diff=update["diff"],
+        base_hash=update["diff"]["base_hash"],
+        hash=update["diff"]["hash"]
+    )
+    return payload, full
+
 
 class ChatGUI:
     """Main chat application GUI using Tkinter."""
     
-    def __init__(self, root: tk.Tk, message_processor: Callable):
+    def __init__(
+        self,
+        root: tk.Tk,
+        message_processor: Callable,
+        layout_tracker: Optional[LayoutTracker] = None
+    ):
         """
         Initialize the chat GUI.
         
@@ -30,9 +104,25 @@ class ChatGUI:
             root: The Tkinter root window
             message_processor: Callback function to process messages
                               Should accept (message, project, mode, model, system_prompt)
+                              plus optional on_chunk (streamed text) and cancel
+                              (CancelToken) keyword arguments
+            layout_tracker: Latest layout per project, used to send GH diffs
         """
         self.root = root
         self.message_processor = message_processor
+        self.layout_tracker = layout_tracker or LayoutTracker()
+        self.gh_queue = GrasshopperPushQueue()
+        
+        # Requests: one running per project, later ones queued behind it
+        self.executor = ThreadPoolExecutor(max_workers=GUI_WORKERS, thread_name_prefix="chat")
+        self.requests_lock = threading.Lock()
+        self.active: Dict[str, Dict[str, Any]] = {}
+        self.queued: Dict[str, deque] = {}
+        self.ticking = False
+        
+        # Stored history is read off the Tk thread, one page at a time
+        self.history_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history")
+        self.switch_job: Optional[str] = None
         
         self.setup_window()
         self.setup_variables()
@@ -40,6 +130,7 @@ class ChatGUI:
         self.apply_dark_theme()
         self.setup_text_bindings()
         self.setup_context_menu()
+        self.switch_project()
         
         # Welcome message
         self.write_message(
@@ -55,6 +146,7 @@ class ChatGUI:
         """Configure the main window."""
         self.root.title(APP_TITLE)
         self.root.geometry(WINDOW_SIZE)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
     
     def setup_variables(self) -> None:
         """Initialize tkinter variables."""
@@ -82,9 +174,11 @@ class ChatGUI:
         
         # Project field
         ttk.Label(bar, text="Project").grid(row=0, column=0, sticky="w")
-        ttk.Entry(
-            bar, textvariable=self.project, width=18
-        ).grid(row=1, column=0, sticky="we", padx=(0, 8))
+        self.project_entry = ttk.Entry(bar, textvariable=self.project, width=18)
+        self.project_entry.grid(row=1, column=0, sticky="we", padx=(0, 8))
+        self.project_entry.bind("<Return>", lambda e: self.switch_project())
+        self.project_entry.bind("<FocusOut>", lambda e: self.switch_project())
+        self.project.trace_add("write", self.on_project_typed)
         
         # Mode selector
         ttk.Label(bar, text="Mode").grid(row=0, column=1, sticky="w")
@@ -142,6 +236,10 @@ class ChatGUI:
         
         # Configure text tags
         self.setup_text_tags()
+        
+        # Bounded, batched transcript on top of the text widget
+        self.display = ChatDisplay(self.root, self.chat_text, history_loader=self.load_history)
+        self.chat_text.tag_raise("sel")
     
     def setup_text_tags(self) -> None:
         """Configure text tags for different message types."""
@@ -183,6 +281,7 @@ class ChatGUI:
         self.entry = ttk.Entry(input_frame, font=INPUT_FONT)
         self.entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
         self.entry.bind("<Return>", lambda e: self.send_message())
+        self.entry.bind("<Escape>", lambda e: self.stop_message())
         self.entry.focus()
         
         # Send button
@@ -192,6 +291,15 @@ class ChatGUI:
             command=self.send_message
         )
         self.send_button.pack(side=tk.RIGHT, padx=(8, 0))
+        
+        # Stop button (cancels the running request of the current project)
+        self.stop_button = ttk.Button(
+            input_frame,
+            text="Stop",
+            command=self.stop_message,
+            state="disabled"
+        )
+        self.stop_button.pack(side=tk.RIGHT, padx=(8, 0))
     
     def create_status_bar(self) -> None:
         """Create the status bar."""
@@ -367,10 +475,9 @@ class ChatGUI:
         
         self.update_status(f"Mode changed to '{mode}'")
     
-    def write_message(self, text: str, tag: str = "system") -> None:
-        """Write a message to the chat display."""
-        self.chat_text.insert("end", text + "\n\n", tag)
-        self.chat_text.see("end")
+    def write_message(self, text: str, tag: str = "system", project: Optional[str] = None) -> None:
+        """Write a message to the chat display (to `project`'s transcript if given)."""
+        self.display.add(text, tag, project=project)
     
     def update_status(self, message: str) -> None:
         """Update the status bar text."""
@@ -397,59 +504,192 @@ class ChatGUI:
         self.chat_text.tag_add("sel", "1.0", "end-1c")
         return "break"
     
+    # ========================================================================
+    # PROJECTS AND HISTORY
+    # ========================================================================
+    
+    def current_project(self) -> str:
+        """Project name from the Project field."""
+        return self.project.get().strip() or DEFAULT_PROJECT_NAME
+    
+    def on_project_typed(self, *args) -> None:
+        """Switch projects once typing in the Project field pauses."""
+        if self.switch_job is not None:
+            self.root.after_cancel(self.switch_job)
+        self.switch_job = self.root.after(PROJECT_SWITCH_MS, self.switch_project)
+    
+    def switch_project(self) -> None:
+        """Show the transcript of the project in the Project field."""
+        if self.switch_job is not None:
+            self.root.after_cancel(self.switch_job)
+            self.switch_job = None
+        project = self.current_project()
+        if project == self.display.project:
+            return
+        self.display.show(project)
+        self.update_status(f"Project '{project}'")
+        self.tick_status()
+    
+    def load_history(self, project: str, before_id: Optional[int]) -> None:
+        """Fetch a page of stored history in the background (ChatDisplay loader)."""
+        self.history_executor.submit(self.fetch_history, project, before_id)
+    
+    def fetch_history(self, project: str, before_id: Optional[int]) -> None:
+        """Read one history page (history thread) and hand it to the display."""
+        try:
+            rows, has_more = get_history_page(project, before_id)
+        except Exception:
+            log.exception("history load failed", extra=fields(project=project))
+            rows, has_more = [], False
+        
+        entries = []
+        for _, message, response, stamp in rows:
+            try:
+                stamp = datetime.fromisoformat(stamp).strftime(HISTORY_TIME_FORMAT)
+            except (TypeError, ValueError):
+                pass
+            entries.append((f"You [{stamp}]:\n", message, "user"))
+            entries.append((f"Assistant [{stamp}]:\n", response, "assistant"))
+        
+        cursor = rows[0][0] if rows else before_id
+        self.root.after(0, self.display.add_history, project, entries, cursor, has_more)
+    
     # ========================================================================
     # MESSAGE HANDLING
     # ========================================================================
     
     def send_message(self) -> None:
-        """Send the user's message for processing."""
+        """Send the user's message, or queue it behind the project's running request."""
         message = self.entry.get().strip()
         if not message:
             return
         
-        # Clear input and disable send button
+        # Clear input
         self.entry.delete(0, "end")
-        self.send_button.config(state="disabled")
-        self.update_status("Thinking…")
+        self.switch_project()
         
         # Display user message
         timestamp = datetime.now().strftime(TIME_FORMAT)
         self.write_message(f"You [{timestamp}]:\n{message}", "user")
         
-        # Process in background thread
-        thread = threading.Thread(
-            target=self.process_message_wrapper,
-            args=(message,),
-            daemon=True
-        )
-        thread.start()
+        # Settings are fixed when the message is sent
+        mode = self.mode.get().strip() or DEFAULT_RUN_MODE
+        request = {
+            "message": message,
+            "project": self.current_project(),
+            "mode": mode,
+            "model": self.model.get().strip() or self.get_default_model(mode),
+            "cancel": CancelToken(),
+            "started": None,
+            "streaming": False
+        }
+        
+        with self.requests_lock:
+            project = request["project"]
+            if project in self.active:
+                self.queued.setdefault(project, deque()).append(request)
+                position = len(self.queued[project])
+            else:
+                self.active[project] = request
+                position = 0
+        
+        if position:
+            self.write_message(f"Queued (#{position} for '{project}')", "system")
+        else:
+            self.start_request(request)
+        self.tick_status()
+    
+    def start_request(self, request: Dict[str, Any]) -> None:
+        """Run a request on the shared executor."""
+        request["started"] = time.monotonic()
+        self.executor.submit(self.process_message_wrapper, request)
     
-    def process_message_wrapper(self, message: str) -> None:
-        """Wrapper to process message and handle response."""
+    def finish_request(self, request: Dict[str, Any]) -> None:
+        """Start the next queued request of the same project, if any."""
+        project = request["project"]
+        with self.requests_lock:
+            pending = self.queued.get(project)
+            if pending:
+                following = pending.popleft()
+                self.active[project] = following
+            else:
+                following = None
+                self.queued.pop(project, None)
+                self.active.pop(project, None)
+        if following is not None:
+            self.start_request(following)
+    
+    def stop_message(self) -> None:
+        """Cancel the running request of the current project (queued ones still run)."""
+        project = self.current_project()
+        with self.requests_lock:
+            request = self.active.get(project)
+        if request is not None and not request["cancel"].cancelled:
+            request["cancel"].cancel()
+            self.update_status(f"Stopping '{project}'…")
+    
+    def tick_status(self) -> None:
+        """Show the current project's request state, elapsed time and queue length."""
+        project = self.current_project()
+        with self.requests_lock:
+            request = self.active.get(project)
+            waiting = len(self.queued.get(project, ()))
+            others = len(self.active) - (request is not None)
+            busy = bool(self.active)
+        
+        self.stop_button.config(state="normal" if request is not None else "disabled")
+        if request is not None and request["started"] is not None:
+            state = "Generating" if request["streaming"] else "Waiting for model"
+            parts = [f"{state} · {time.monotonic() - request['started']:.0f}s"]
+            if waiting:
+                parts.append(f"{waiting} queued")
+            if others:
+                parts.append(f"{others} other project{'s' if others > 1 else ''} busy")
+            self.update_status(" · ".join(parts))
+        elif others:
+            self.update_status(f"{others} other project{'s' if others > 1 else ''} busy")
+        
+        if busy and not self.ticking:
+            self.ticking = True
+            self.root.after(STATUS_TICK_MS, self._tick)
+    
+    def _tick(self) -> None:
+        self.ticking = False
+        self.tick_status()
+    
+    def process_message_wrapper(self, request: Dict[str, Any]) -> None:
+        """Run one request (executor thread) and stream its reply into the display."""
+        message, project = request["message"], request["project"]
+        model, mode = request["model"], request["mode"]
+        reply_id = None
+        
+        def on_chunk(chunk: str) -> None:
+            request["streaming"] = True
+            self.display.stream(reply_id, chunk)
+        
         try:
-            # Get configuration
-            project = self.project.get().strip() or DEFAULT_PROJECT_NAME
-            mode = self.mode.get().strip() or DEFAULT_RUN_MODE
-            model = self.model.get().strip() or self.get_default_model(mode)
-            
-            # Call the message processor
+            # Call the message processor, streaming the reply into the display
+            timestamp = datetime.now().strftime(TIME_FORMAT)
+            reply_id = self.display.begin_stream(f"Assistant [{timestamp}]:\n", "assistant", project)
             try:
                 response = self.message_processor(
-                    message, project, model, mode, None
+                    message, project, model, mode, None,
+                    on_chunk=on_chunk,
+                    cancel=request["cancel"]
                 )
+            except StreamCancelled:
+                self.display.end_stream(reply_id)
+                self.root.after(0, self.write_message, "Stopped.", "system", project)
+                self.root.after(0, self.update_status, "Stopped")
+                return
             except Exception as e:
-                self.root.after(0, self.write_message, str(e), "error")
+                self.display.end_stream(reply_id, "")
+                self.root.after(0, self.write_message, str(e), "error", project)
                 self.root.after(0, self.update_status, "Error processing message")
                 return
             
-            # Display response
-            timestamp = datetime.now().strftime(TIME_FORMAT)
-            self.root.after(
-                0,
-                self.write_message,
-                f"Assistant [{timestamp}]:\n{response}",
-                "assistant"
-            )
+            # Replace the streamed text with the cleaned-up reply
+            self.display.end_stream(reply_id, response)
             self.root.after(0, self.update_status, "Ready")
             
             # Push to Grasshopper if enabled
@@ -459,9 +699,8 @@ class ChatGUI:
                 )
         
         finally:
-            # Re-enable controls
-            self.root.after(0, self.send_button.config, {"state": "normal"})
-            self.root.after(0, self.entry.focus)
+            self.finish_request(request)
+            self.root.after(0, self.tick_status)
     
     def push_to_grasshopper(
         self,
@@ -471,22 +710,27 @@ class ChatGUI:
         model: str,
         mode: str
     ) -> None:
-        """Send conversation to Grasshopper endpoint."""
-        try:
-            payload = {
-                "user_input": user_input,
-                "ai_response": ai_response,
-                "timestamp": datetime.utcnow().isoformat() + "Z",
-                "project_name": project,
-                "model": model,
-                "api_mode": mode
-            }
-            
-            requests.post(
-                self.gh_url.get().strip(),
-                json=payload,
-                timeout=GH_TIMEOUT_SECONDS
-            )
-        except:
-            # Silently fail
-            pass
\ No newline at end of file
+        """
+        Queue the conversation for delivery to Grasshopper (non-blocking).
+        
+        Replies containing a layout are sent as a structural diff against the
+        project's previous layout ("layout_diff") or, for the first layout,
+        in full ("layout"); "ai_response" is always included. If a push for
+        the project is dropped or coalesced, the queue sends the next one in
+        full. GH compares "base_hash" with its current layout and fetches
+        /layout?project=... for a full resync on mismatch.
+        """
+        payload, full = build_gh_payload(self.layout_tracker, user_input, ai_response, project, model, mode)
+        self.gh_queue.submit(self.gh_url.get().strip(), payload, key=project, full=full)
+    
+    def on_close(self) -> None:
+        """Stop running requests, flush pending GH pushes to the spool and close the window."""
+        with self.requests_lock:
+            running = list(self.active.values())
+            self.queued.clear()
+        for request in running:
+            request["cancel"].cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.history_executor.shutdown(wait=False, cancel_futures=True)
+        self.gh_queue.close()
+        self.root.destroy()
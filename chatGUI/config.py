@@ -17,6 +17,7 @@ WINDOW_SIZE = "820x660"
 
 API_HOST = "127.0.0.1"
 API_PORT = 5000
+API_THREADS = 16  # /events long-polls hold a thread each
 
 # ============================================================================
 # DEFAULT VALUES
@@ -33,6 +34,12 @@ DEFAULT_SYSTEM_PROMPT: Optional[str] = None
 DEFAULT_GH_URL = "http://127.0.0.1:8081"
 DEFAULT_AUTO_PUSH = True
 GH_TIMEOUT_SECONDS = 1.5
+GH_QUEUE_SIZE = 100  # pending pushes kept while GH is slow or down
+GH_OVERFLOW_POLICY = "coalesce"  # when full: "coalesce" (latest per project) or "drop_oldest"
+GH_MAX_RETRIES = 3
+GH_BACKOFF_BASE = 0.25  # seconds; doubled per retry, with full jitter
+GH_BACKOFF_MAX = 5.0
+GH_SPOOL_PATH: Optional[str] = "gh_spool.jsonl"  # None disables on-disk spooling
 
 # ============================================================================
 # UI THEME
@@ -58,10 +65,19 @@ DARK_THEME = {
 CHAT_FONT = ("Arial", 10)
 INPUT_FONT = ("Arial", 12)
 TEXT_MARGINS = 6  # pixels for text margin
+MAX_VISIBLE_MESSAGES = 150  # older messages are trimmed from the widget
+RELOAD_PAGE_SIZE = 50  # trimmed messages restored per "load earlier" click
+STREAM_FRAME_MS = 33  # streamed text is drawn at most this often (~30 fps)
+COLLAPSE_JSON_CHARS = 1500  # longer JSON replies collapse into a summary line
+PROJECT_CACHE_SIZE = 8  # project transcripts kept in memory for instant switching
+PROJECT_SWITCH_MS = 400  # typing in the Project field switches after this pause
+HISTORY_TIME_FORMAT = "%Y-%m-%d %H:%M"  # Format for stored history timestamps
 
 # ============================================================================
 # CONVERSATION SETTINGS
 # ============================================================================
 
 CONTEXT_LIMIT = 2  # Number of previous exchanges to include
+GUI_WORKERS = 4  # requests in flight across projects (one per project at a time)
+STATUS_TICK_MS = 500  # status bar refresh while requests are running
 TIME_FORMAT = "%H:%M"  # Format for message timestamps
\ No newline at end of file
@@ -0,0 +1,289 @@
+"""
+gh_push.py - Background delivery queue for Grasshopper pushes
+
+Messages are handed to a worker thread that posts them over one pooled
+keep-alive session, retrying with jittered exponential backoff. The buffer
+is bounded: when full it either drops the oldest message or coalesces the
+new message with a queued one for the same project (only the latest one
+matters to GH), dropping the oldest if there is none. Below the bound
+every message is delivered. A message can come with a self-contained
+"full" version (e.g. the whole layout for a layout diff): once a message
+for its key is dropped, coalesced or fails, the next one for that key is
+sent in full so the receiver's chain of updates never has a hole.
+Messages that still fail can be spooled to disk and are re-sent after the
+next successful delivery or on the next start.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.logs import get_logger, fields
+from utils.metrics import observe
+
+from chatGUI.config import (
+    GH_TIMEOUT_SECONDS, GH_QUEUE_SIZE, GH_MAX_RETRIES, GH_BACKOFF_BASE,
+    GH_BACKOFF_MAX, GH_OVERFLOW_POLICY, GH_SPOOL_PATH
+)
+
+log = get_logger("gh")
+
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+
+
+class GrasshopperPushQueue:
+    """Non-blocking, bounded, retrying delivery of payloads to Grasshopper."""
+
+    def __init__(
+        self,
+        maxsize: int = GH_QUEUE_SIZE,
+        policy: str = GH_OVERFLOW_POLICY,
+        max_retries: int = GH_MAX_RETRIES,
+        timeout: float = GH_TIMEOUT_SECONDS,
+        spool_path: Optional[str] = GH_SPOOL_PATH
+    ):
+        """
+        Initialize the queue and start its worker thread.
+
+        Args:
+            maxsize: Maximum number of pending messages
+            policy: "drop_oldest" or "coalesce" (when full, the latest message per key wins)
+            max_retries: Attempts after the first failure before giving up
+            timeout: Per-request timeout in seconds
+            spool_path: JSONL file for undelivered messages (None disables)
+        """
+        if policy not in (DROP_OLDEST, COALESCE):
+            raise ValueError(f"policy must be '{DROP_OLDEST}' or '{COALESCE}'")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.spool_path = spool_path
+
+        self.pending: Deque[Dict[str, Any]] = deque()
+        self.cond = threading.Condition()
+        self.closed = False
+        self.spool_lock = threading.Lock()
+        # key -> queued_at of the newest delivered message, so stale
+        # spooled messages never overwrite newer ones in coalesce mode
+        self.delivered_at: Dict[str, float] = {}
+        # keys that lost a message; their next message with a full version is sent in full
+        self.lost: Set[str] = set()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.stats = {
+            "submitted": 0, "delivered": 0, "failed": 0, "retries": 0,
+            "dropped": 0, "coalesced": 0, "spooled": 0, "replayed": 0,
+            "last_error": "", "last_latency_ms": 0.0,
+        }
+
+        self.load_spool()
+        self.worker = threading.Thread(target=self.run, name="gh-push", daemon=True)
+        self.worker.start()
+
+    # ========================================================================
+    # PUBLIC API
+    # ========================================================================
+
+    def submit(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        key: Optional[str] = None,
+        full: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Queue a payload for delivery; never blocks on the network.
+
+        Args:
+            url: Grasshopper listener URL
+            payload: JSON-serializable body
+            key: Coalescing key (e.g. project name), used when the queue is full
+            full: Self-contained version of a payload that builds on the
+                  previous message for the key, sent instead once one of
+                  those messages was lost
+        """
+        item = {"url": url, "payload": payload, "full": full, "key": key, "queued_at": time.time()}
+        stale = None
+        with self.cond:
+            self.stats["submitted"] += 1
+            if key in self.lost and full is not None:
+                self.send_full(item)
+            if len(self.pending) >= self.maxsize:
+                if self.policy == COALESCE and key is not None:
+                    stale = next((queued for queued in self.pending
+                                  if queued["key"] == key and queued["url"] == url), None)
+                if stale is not None:
+                    self.pending.remove(stale)
+                    self.stats["coalesced"] += 1
+                else:
+                    stale = self.pending.popleft()
+                    self.stats["dropped"] += 1
+            self.pending.append(item)
+            if stale is not None:
+                self.mark_lost(stale["key"])
+            self.cond.notify()
+
+    def mark_lost(self, key: Optional[str]) -> None:
+        """A message for `key` won't arrive: send its next queued (or submitted) one in full (cond held)."""
+        if key is None:
+            return
+        for queued in self.pending:
+            if queued["key"] == key and queued.get("full") is not None:
+                self.send_full(queued)
+                return
+        self.lost.add(key)
+
+    def send_full(self, item: Dict[str, Any]) -> None:
+        """Replace an item's payload with its self-contained version."""
+        if item.get("full") is not None:
+            item["payload"], item["full"] = item["full"], None
+            self.lost.discard(item["key"])
+
+    def metrics(self) -> Dict[str, Any]:
+        """Delivery counters plus the current queue depth."""
+        with self.cond:
+            return dict(self.stats, queue_depth=len(self.pending))
+
+    def close(self, timeout: float = 2.0) -> None:
+        """Stop the worker; spool anything still pending."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.worker.join(timeout)
+        with self.cond:
+            leftover = list(self.pending)
+            self.pending.clear()
+        for item in leftover:
+            self.spool(item)
+        self.session.close()
+
+    # ========================================================================
+    # WORKER
+    # ========================================================================
+
+    def run(self) -> None:
+        """Worker loop: deliver queued items one at a time."""
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return
+                item = self.pending.popleft()
+            if self.deliver(item):
+                self.replay_spool()
+            else:
+                with self.cond:
+                    self.mark_lost(item.get("key"))
+                self.spool(item)
+
+    def deliver(self, item: Dict[str, Any]) -> bool:
+        """POST one item with bounded, jittered exponential backoff."""
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                resp = self.session.post(item["url"], json=item["payload"], timeout=self.timeout)
+                resp.raise_for_status()
+                observe("stage_duration_seconds", time.perf_counter() - start, stage="gh_push", mode="", model="")
+                observe("stage_duration_seconds", time.time() - item.get("queued_at", time.time()),
+                        stage="gh_delivery", mode="", model="")
+                with self.cond:
+                    self.stats["delivered"] += 1
+                    if item.get("key") is not None:
+                        self.delivered_at[item["key"]] = max(
+                            self.delivered_at.get(item["key"], 0.0), item.get("queued_at", 0.0))
+                    self.stats["last_latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+                return True
+            except requests.RequestException as e:
+                with self.cond:
+                    self.stats["last_error"] = str(e)
+                    if attempt < self.max_retries:
+                        self.stats["retries"] += 1
+                    closed = self.closed
+                if attempt >= self.max_retries or closed:
+                    break
+                # full jitter: sleep uniformly in [0, min(cap, base * 2^attempt)]
+                delay = random.uniform(0, min(GH_BACKOFF_MAX, GH_BACKOFF_BASE * 2 ** attempt))
+                with self.cond:
+                    self.cond.wait_for(lambda: self.closed, timeout=delay)
+        with self.cond:
+            self.stats["failed"] += 1
+            error = self.stats["last_error"]
+        log.warning("GH push failed", extra=fields(url=item["url"], key=item.get("key"), error=error))
+        return False
+
+    # ========================================================================
+    # SPOOL
+    # ========================================================================
+
+    def spool(self, item: Dict[str, Any]) -> None:
+        """Append an undelivered item to the spool file (if enabled)."""
+        if not self.spool_path:
+            return
+        with self.spool_lock:
+            with open(self.spool_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(item) + "\n")
+        with self.cond:
+            self.stats["spooled"] += 1
+
+    def take_spool(self) -> list:
+        """Read and clear the spool file."""
+        if not self.spool_path:
+            return []
+        with self.spool_lock:
+            if not os.path.exists(self.spool_path):
+                return []
+            with open(self.spool_path, encoding="utf-8") as f:
+                lines = f.readlines()
+            os.remove(self.spool_path)
+        items = []
+        for line in lines:
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                continue
+        return items
+
+    def requeue(self, item: Dict[str, Any]) -> bool:
+        """
+        Put a spooled item back in the queue (in full) unless a newer one
+        was delivered and the item is superseded by it.
+        """
+        key = item.get("key")
+        with self.cond:
+            if ((self.policy == COALESCE or item.get("full") is not None) and key is not None
+                    and self.delivered_at.get(key, 0.0) >= item.get("queued_at", 0.0)):
+                return False
+            if len(self.pending) >= self.maxsize:
+                self.stats["dropped"] += 1
+                return False
+            # what GH received since it was spooled is unknown
+            self.send_full(item)
+            self.pending.append(item)
+            self.cond.notify()
+            return True
+
+    def load_spool(self) -> None:
+        """Queue messages spooled by a previous run."""
+        for item in self.take_spool():
+            self.requeue(item)
+
+    def replay_spool(self) -> None:
+        """GH is reachable again: re-queue everything that was spooled."""
+        replayed = sum(self.requeue(item) for item in self.take_spool())
+        if replayed:
+            with self.cond:
+                self.stats["replayed"] += replayed
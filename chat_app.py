@@ -6,12 +6,13 @@ import tkinter as tk
 import threading
 import logging
 from datetime import datetime
-from typing import Optional, Dict, Any
-from flask import Flask, jsonify
+from typing import Any, Callable, Dict, Optional
+from flask import Flask, jsonify, request
 
 # Import configuration
 from chatGUI.config import (
-    API_HOST, API_PORT, DEFAULT_SYSTEM_PROMPT, CONTEXT_LIMIT
+    API_HOST, API_PORT, API_THREADS, DEFAULT_SYSTEM_PROMPT, CONTEXT_LIMIT,
+    DEFAULT_PROJECT_NAME
 )
 
 # Import GUI
@@ -19,8 +20,15 @@ from chatGUI.chat_gui import ChatGUI
 
 # Import your existing modules
 from server.config import api_mode
-from utils.llm_calls import query
+from utils.llm_calls import CancelToken, query, query_stream
 from utils.context_data import get_recent_context, save_conversation
+from utils.extractInfo import extract_layout_from_text
+from utils.events import EventLog, MAX_WAIT_SECONDS
+from utils.layout_diff import LayoutTracker
+from utils.metrics import instrument, span
+from utils import logs, recorder
+from utils.logs import get_logger, fields, payload
+from serve import serve_in_thread
 
 # ============================================================================
 # GLOBAL STATE
@@ -33,8 +41,17 @@ LAST_EXCHANGE: Dict[str, str] = {
     "timestamp": ""
 }
 
+log = get_logger("gui")
+
 # Thread safety for LLM calls
 LLM_LOCK = threading.Lock()
+LOCK_POLL_SECONDS = 0.1  # cancel checks while waiting for the lock
+
+# Exchange/layout events for /events subscribers
+EVENTS = EventLog()
+
+# Latest layout per project (GH receives diffs against it)
+LAYOUTS = LayoutTracker()
 
 # ============================================================================
 # LLM INTERFACE
@@ -45,7 +62,9 @@ def llm_infer(
     project: str,
     model: str,
     mode: str,
-    system_prompt: Optional[str] = None
+    system_prompt: Optional[str] = None,
+    on_chunk: Optional[Callable[[str], None]] = None,
+    cancel: Optional[CancelToken] = None
 ) -> str:
     """
     Make an inference call to the LLM with conversation context.
@@ -56,11 +75,18 @@ def llm_infer(
         model: Model identifier
         mode: API mode (local/cloudflare/openai)
         system_prompt: Optional system prompt
+        on_chunk: If given, the reply is streamed and passed here piece by piece
+        cancel: Stops the request, while waiting for the model or mid-stream
+                (raises StreamCancelled; nothing is saved)
         
     Returns:
         AI response text
     """
-    with LLM_LOCK:
+    with span("lock_wait", mode, model):
+        while not LLM_LOCK.acquire(timeout=LOCK_POLL_SECONDS):
+            if cancel is not None:
+                cancel.check()
+    try:
         # Initialize API client
         client, completion_model, _ = api_mode(mode, model)
         
@@ -68,28 +94,42 @@ def llm_infer(
         context = get_recent_context(project, limit=CONTEXT_LIMIT)
         
         # Build full prompt with context
-        if context:
-            context_str = "\n".join([
-                f"User: {user}\nAssistant: {assistant}" 
-                for user, assistant in context
-            ])
-            full_prompt = (
-                f"Previous conversation:\n{context_str}\n\n"
-                f"User: {text}"
-            )
-        else:
-            full_prompt = text
+        with span("prompt", mode, model):
+            if context:
+                context_str = "\n".join([
+                    f"User: {user}\nAssistant: {assistant}" 
+                    for user, assistant in context
+                ])
+                full_prompt = (
+                    f"Previous conversation:\n{context_str}\n\n"
+                    f"User: {text}"
+                )
+            else:
+                full_prompt = text
         
         # Query LLM
-        response = query(
-            client,
-            completion_model,
-            full_prompt,
-            system_prompt=system_prompt
-        )
+        if on_chunk is not None:
+            response = query_stream(
+                client,
+                completion_model,
+                full_prompt,
+                on_chunk,
+                system_prompt=system_prompt,
+                cancel=cancel
+            )
+        else:
+            response = query(
+                client,
+                completion_model,
+                full_prompt,
+                system_prompt=system_prompt
+            )
         
         # Save conversation
         save_conversation(project, text, response)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("exchange", extra=fields(project=project, mode=mode, model=model,
+                                               prompt=payload(full_prompt), response=payload(response)))
         
         # Update last exchange
         LAST_EXCHANGE.update({
@@ -98,7 +138,16 @@ def llm_infer(
             "timestamp": datetime.utcnow().isoformat() + "Z"
         })
         
+        # Notify subscribers
+        EVENTS.publish("exchange", dict(LAST_EXCHANGE), project=project)
+        with span("extract", mode, model):
+            layout = extract_layout_from_text(response)
+        if layout is not None:
+            EVENTS.publish("layout", layout, project=project)
+        
         return response
+    finally:
+        LLM_LOCK.release()
 
 # ============================================================================
 # FLASK API SERVER
@@ -109,6 +158,9 @@ logging.getLogger("werkzeug").setLevel(logging.ERROR)
 
 # Create Flask app
 app = Flask(__name__)
+instrument(app)
+logs.instrument(app)
+recorder.instrument(app)
 
 @app.get("/health")
 def health() -> Dict[str, Any]:
@@ -124,15 +176,38 @@ def last() -> Dict[str, str]:
     """Get the last conversation exchange."""
     return jsonify(LAST_EXCHANGE)
 
-def run_api() -> None:
-    """Run the Flask API server in a separate thread."""
-    app.run(
-        host=API_HOST,
-        port=API_PORT,
-        debug=False,
-        use_reloader=False,
-        threaded=True
-    )
+@app.get("/events")
+def events() -> Dict[str, Any]:
+    """
+    Long-poll for new events.
+    
+    Query args:
+        cursor: Last sequence number seen (0 replays everything buffered)
+        project: Only return events for this project
+        timeout: Seconds to wait for an event (max 30)
+    """
+    cursor = request.args.get("cursor", 0, type=int)
+    project = request.args.get("project") or None
+    timeout = request.args.get("timeout", MAX_WAIT_SECONDS, type=float)
+    return jsonify(EVENTS.wait(cursor, project, timeout))
+
+@app.get("/layout")
+def layout() -> Dict[str, Any]:
+    """Full current layout of a project, for GH resyncs after a missed diff."""
+    project = request.args.get("project") or DEFAULT_PROJECT_NAME
+    full = LAYOUTS.full(project)
+    if full is None:
+        return jsonify({"error": "no layout for project"}), 404
+    return jsonify(full)
+
+def run_api() -> threading.Thread:
+    """
+    Run the Flask API server in a background thread.
+    
+    Uses waitress when installed (the dev server otherwise); the pool is
+    sized so /events long-polls don't starve other requests.
+    """
+    return serve_in_thread(app, API_HOST, API_PORT, threads=API_THREADS)
 
 # ============================================================================
 # MAIN APPLICATION
@@ -151,8 +226,7 @@ class ChatApplication:
     
     def start_api_server(self) -> None:
         """Start the Flask API server in a background thread."""
-        api_thread = threading.Thread(target=run_api, daemon=True)
-        api_thread.start()
+        run_api()
         print(f"API server started on http://{API_HOST}:{API_PORT}")
     
     def create_gui(self) -> None:
@@ -162,7 +236,8 @@ class ChatApplication:
         # Create GUI with message processor callback
         self.gui = ChatGUI(
             self.root,
-            message_processor=self.process_message
+            message_processor=self.process_message,
+            layout_tracker=LAYOUTS
         )
         
         # Start the GUI event loop
@@ -174,7 +249,9 @@ class ChatApplication:
         project: str,
         model: str,
         mode: str,
-        system_prompt: Optional[str]
+        system_prompt: Optional[str],
+        on_chunk: Optional[Callable[[str], None]] = None,
+        cancel: Optional[CancelToken] = None
     ) -> str:
         """
         Process a message through the LLM.
@@ -185,6 +262,8 @@ class ChatApplication:
             model: Model identifier
             mode: API mode
             system_prompt: Optional system prompt
+            on_chunk: If given, the reply is streamed and passed here piece by piece
+            cancel: Stops the request (raises StreamCancelled)
             
         Returns:
             AI response text
@@ -194,7 +273,9 @@ class ChatApplication:
             project,
             model,
             mode,
-            system_prompt or DEFAULT_SYSTEM_PROMPT
+            system_prompt or DEFAULT_SYSTEM_PROMPT,
+            on_chunk=on_chunk,
+            cancel=cancel
         )
 
 # ============================================================================
@@ -203,6 +284,7 @@ class ChatApplication:
 
 def main():
     """Main entry point for the application."""
+    logs.setup_logging()
     app = ChatApplication()
 
 if __name__ == "__main__":
@@ -46,6 +46,32 @@ export class GalleryManager {
     this.applyTheme(this.themeName);
 
     const t=$("#themeToggle"); if(t){ t.checked=THEMES.light.isLight; t.onchange=()=>this.applyTheme(t.checked ? "light" : "dark"); }
+    this.loadManifest();
+  }
+
+  // Houses known to the server: cards come from /gallery/manifest and /thumbnails,
+  // the layout itself is fetched only when needed (see _withData)
+  async loadManifest(){
+    let manifest; try{ const r=await fetch("/gallery/manifest"); if(!r.ok) return; manifest=await r.json(); }catch{ return; } // opened from disk: uploads only
+    (manifest.houses||[]).forEach(s=>this.addSummary(s));
+    this.applyFilters(); this.updateAnalytics(); this._rebuildFacetDropdowns();
+  }
+
+  addSummary(s){
+    const id=uuid(), filename=`${s.id}.json`; const house={ id, layoutId:s.id, name:s.name, data:null, filename,
+      rooms:s.rooms, floors:s.floors||1, edges:s.edges||0, location:s.location || "Unknown", thumbnail:s.thumbnail,
+      bounds:{plan:s.plan_bounds} };
+    this.houses.push(house); if(this.favKeys.has(filename)) this.favorites.add(id);
+  }
+
+  _withData(h){
+    if(h.data) return Promise.resolve(h.data);
+    h._loading ??= fetch(`/layouts/${encodeURIComponent(h.layoutId)}`)
+      .then(r=>r.ok ? r.json() : Promise.reject(new Error(`HTTP ${r.status}`)))
+      .then(data=>{ const nodes=Array.isArray(data?.nodes)?data.nodes:[], edges=Array.isArray(data?.edges)?data.edges:[];
+        h.data={...data,nodes,edges}; return h.data; })
+      .catch(err=>{ h._loading=null; this._toast(`Could not load ${h.name}`); throw err; });
+    return h._loading;
   }
 
   applyTheme(name){
@@ -136,7 +162,7 @@ export class GalleryManager {
     const card=document.createElement("div"); card.className="asset-card";
     if(this.selectedHouses.has(h.id)) card.classList.add("selected");
     if(this.compareHouses.includes(h.id)) card.classList.add("compare");
-    const thumb=this.thumbnailCache.get(h.id, h.data, this.previewMode);
+    const thumb=h.data ? this.thumbnailCache.get(h.id, h.data, this.previewMode, h.bounds) : (this.thumbnailCache.url(h, this.previewMode) || "");
     const isFav=this.favorites.has(h.id);
     const heart=`<button class="heart-btn" aria-pressed="${isFav}" aria-label="${isFav?"Unfavorite":"Favorite"}" title="${isFav?"Unfavorite":"Favorite"}" data-id="${h.id}">${isFav?"❤":"♡"}</button>`;
     const d=h.data||{};
@@ -172,6 +198,8 @@ export class GalleryManager {
       </div>
     `;
 
+    if(!thumb){ const mode=this.previewMode; this._withData(h).then(data=>{ if(mode===this.previewMode) card.querySelector(".asset-preview img").src=this.thumbnailCache.get(h.id, data, mode, h.bounds); }).catch(()=>{}); }
+
     card.onclick = (e)=>{
       if(e.target.closest(".heart-btn")) return;
       if(e.ctrlKey||e.metaKey) this.toggleSelection(h.id);
@@ -209,8 +237,9 @@ export class GalleryManager {
   compareFavorites(){ const favs=this.houses.filter(h=>this.favorites.has(h.id)).slice(0,4); if(favs.length<2){ alert("Favorite at least 2 items to compare."); return; }
     this.compareHouses=favs.map(h=>h.id); this.enterComparisonMode(); }
 
-  enterComparisonMode(){
+  async enterComparisonMode(){
     if(this.compareHouses.length<2){ alert("Select at least 2 houses to compare."); return; }
+    try{ await Promise.all(this.compareHouses.map(id=>this.houses.find(h=>h.id===id)).filter(Boolean).map(h=>this._withData(h))); }catch{ return; }
     $("#galleryContainer").style.display="none"; $("#clusterView").classList.add("hidden"); $("#comparisonView").classList.remove("hidden");
     this.renderComparison();
   }
@@ -311,8 +340,9 @@ export class GalleryManager {
     overlay.style.setProperty("--heart-bottom", `${heartB}px`);
   }
 
-  openDetail(h){
-    this._detailHouse=h; this._currentDetailMode=this.previewMode;
+  openDetail(h, mode=this.previewMode){
+    if(!h.data){ this._withData(h).then(()=>{ this.openDetail(h, mode); this.renderDetail(h, mode); }, ()=>{}); return; }
+    this._detailHouse=h; this._currentDetailMode=mode;
     const modal=$("#viewerModal"); modal.classList.remove("hidden");
     const props=$("#houseProps");
     if(props){
@@ -400,6 +430,7 @@ export class GalleryManager {
     const getList=()=> (this.filteredHouses.length ? this.filteredHouses : this.houses);
     const goNeighbor=(delta)=>{ const list=getList(); const i=list.findIndex(x=>x.id===this._detailHouse.id); if(i===-1||!list.length) return;
       const j=(i+delta+list.length)%list.length; const next=list[j]; const mode=this._currentDetailMode;
+      if(!next.data){ this.openDetail(next, mode); return; }
       this.openDetail(next); this._currentDetailMode=mode; this.renderDetail(next,mode);
       $$(".viewer-toolbar .view-btn", modal).forEach(b=> b.classList.toggle("active", b.dataset.mode===mode));
       queueMicrotask(()=>{ this._sceneView?.fitToContent?.(mode); this._positionViewerNav(modal); });
@@ -1,13 +1,6 @@
-import { applyTheme } from './theme.js';
-import { GalleryManager } from './gallery/gallery-manager.js';
+import { GalleryManager } from './gallery-manager.js';
 
 document.addEventListener('DOMContentLoaded', () => {
+  // GalleryManager applies the theme and wires #themeToggle itself
   window.app = new GalleryManager();
-  applyTheme('light');
-
-  const t = document.getElementById('themeToggle');
-  if (t) {
-    t.checked = true;
-    t.addEventListener('change', () => applyTheme(t.checked ? 'light' : 'dark'));
-  }
-});
\ No newline at end of file
+});
@@ -41,13 +41,20 @@ export class ThumbnailCache {
     return {min:{x:minX,z:minZ}, max:{x:maxX,z:maxZ}};
   }
 
-  _render(data, mode){
+  // server-rendered plan thumbnail of a manifest house (null for other modes)
+  url(house, mode="plan"){
+    if(mode!=="plan" || !house?.thumbnail) return null;
+    const sep=house.thumbnail.includes("?")?"&":"?";
+    return `${house.thumbnail}${sep}w=${this.w}&h=${this.h}&theme=${this.theme?.isLight===false?"dark":"light"}`;
+  }
+
+  _render(data, mode, bounds=null){
     const scene=new THREE.Scene(); scene.background=new THREE.Color(this.theme.thumbBg);
     scene.add(new THREE.AmbientLight(0xffffff,0.6));
     let camera;
 
     if(mode==="plan"){
-      const {min,max}=this._planBounds(data);
+      const {min,max}=bounds?.plan ?? this._planBounds(data);
       const cx=(min.x+max.x)/2, cz=(min.z+max.z)/2;
       let w=(max.x-min.x)||2, h=(max.z-min.z)||2;
       const pad=Math.max(0.06*Math.max(w,h),0.12); w+=pad*2; h+=pad*2;
@@ -73,10 +80,10 @@ export class ThumbnailCache {
     return url;
   }
 
-  get(keyId, data, mode="plan"){
+  get(keyId, data, mode="plan", bounds=null){
     const themeKey=this.theme?.thumbBg??"t", key=`${keyId}:${mode}:${themeKey}`;
     if(this.cache.has(key)) return this.cache.get(key);
     if(this.cache.size>=this.maxSize) this.cache.delete(this.cache.keys().next().value);
-    const url=this._render(data,mode); this.cache.set(key,url); return url;
+    const url=this._render(data,mode,bounds); this.cache.set(key,url); return url;
   }
 }
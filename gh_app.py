@@ -1,9 +1,30 @@
-from flask import Flask, jsonify, request, send_from_directory,  render_template_string
+from flask import Blueprint, Flask, jsonify, request, send_from_directory,  render_template_string
 from utils.llm_calls import *
 from utils.context_data import *
 from utils.extractInfo import extract_json_from_text
+from utils.metrics import instrument, span
+from utils.admission import AdmissionController, admit, admit_job, request_class
+from utils.jobs import JobRunner, check as check_cancelled, register as register_jobs
+from utils import logs, recorder
+from utils.logs import get_logger, fields
 import json
-app = Flask(__name__)
+import logging
+
+MAX_CONTENT_LENGTH = 8 * 1024 * 1024
+
+bp = Blueprint('gh_app', __name__)
+log = get_logger('llm_call')
+
+# Per-project rate limits and fair queueing in front of the LLM (see utils/admission.py)
+admission = AdmissionController()
+
+def project_key(req):
+    data = req.get_json(force=True, silent=True)
+    if not isinstance(data, dict):
+        return req.remote_addr
+    if isinstance(data.get("params"), dict):  # /jobs submission
+        data = data["params"]
+    return data.get("project_name") or req.remote_addr
 
 from server.config import api_mode
 from chat.chat_template import HTML_TEMPLATE
@@ -20,13 +41,26 @@ def encode_image_to_data_uri(path: str) -> str:
         b64 = base64.b64encode(f.read()).decode("utf-8")
     return f"data:{mime};base64,{b64}"
 # Route to serve the chat UI
-@app.route('/')
+@bp.route('/')
 def index():
     return render_template_string(HTML_TEMPLATE)
 
-@app.route('/llm_call', methods=['POST'])
+@bp.route('/llm_call', methods=['POST'])
+@admit(admission, project_key, request_class)
 def llm_call():
-    payload = request.get_json(force=True) or {}
+    try:
+        return jsonify(run_llm_call(request.get_json(force=True) or {}))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+def run_llm_call(payload, job=None):
+    """
+    One /llm_call request (LLM or VLM). Raises ValueError for bad input.
+
+    job: optional utils.jobs.Job for progress reports and cancellation
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("expected a JSON object")
     input_text = (payload.get("input_text") or "").strip()
     run_mode   = payload.get("api_mode", "local")      # <- was api_mode (string)
     model_id   = payload.get("model_id") 
@@ -37,18 +71,22 @@ def llm_call():
     context = True
 
     if not input_text:
-            return jsonify({"error": "input_text is required"}), 400
+            raise ValueError("input_text is required")
     
-    print(run_mode, model_id)
     client, completion_model, embedding_model = api_mode(run_mode, model_id)
-    print(client, completion_model, embedding_model)
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("llm_call", extra=fields(mode=run_mode, model=completion_model, use_mode=use_mode,
+                                           project=project_name, input=logs.payload(input_text)))
     
  
    
     
+    if job:
+        job.progress(stage='generate')
     if use_mode=='vlm':
-        print("image_path")
-        image_data_uri = encode_image_to_data_uri(image_path)
+        log.debug("image", extra=fields(path=image_path))
+        with span("encode_image", run_mode, model_id):
+            image_data_uri = encode_image_to_data_uri(image_path)
         response = query_vlm(client, completion_model, image_data_uri,input_text,system_prompt=system_prompt)
   
     if use_mode =='llm':
@@ -63,13 +101,32 @@ def llm_call():
     # print(full_prompt)
     
     # response = query(client, completion_model, input_text, system_prompt=None)
+    check_cancelled(job)
     save_conversation(project_name, input_text, response)
     # print(response)
     
-    return jsonify({'response': response})
+    return {'response': response}
+
+# Long VLM analyses as background jobs: /jobs
+# each job waits for a backend slot when it runs, not only when it is submitted
+in_slot = admit_job(admission, lambda params: params.get('project_name') or 'default')
+jobs = JobRunner({'llm_call': in_slot(run_llm_call)})
+register_jobs(bp, jobs, admit(admission, project_key, slot=False))
+
 
+def create_app(config=None):
+    """Build the Flask app (used by `python gh_app.py` and serve.py)."""
+    app = Flask(__name__)
+    app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+    app.config.update(config or {})
+    app.register_blueprint(bp)
+    instrument(app, server_timing=app.config.get('SERVER_TIMING', False))
+    logs.setup_logging()
+    logs.instrument(app)
+    recorder.instrument(app)
+    return app
 
 
 if __name__ == '__main__':
-    print("\n Chat UI available at: http://localhost:5000\n")
-    app.run(port=5000, debug=True)
\ No newline at end of file
+    print("\n Chat UI available at: http://localhost:5000 (development; use serve.py in production)\n")
+    create_app().run(port=5000, debug=True)
\ No newline at end of file
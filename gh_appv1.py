@@ -1,12 +1,13 @@
 # chat_tk_with_last.py (compact, selectable + copy works)
 import tkinter as tk; from tkinter import ttk, scrolledtext
-import threading, requests, logging
+import threading, logging
 from datetime import datetime
 from typing import Optional
 from flask import Flask, jsonify
 from server.config import api_mode, COMPLETION_MODELS, DEFAULT_COMPLETION
 from utils.llm_calls import query
 from utils.context_data import get_recent_context, save_conversation
+from chatGUI.gh_push import GrasshopperPushQueue
 
 APP_TITLE, WINDOW_SIZE = "Chat Assistant", "820x660"
 API_HOST, API_PORT = "127.0.0.1", 5000
@@ -16,6 +17,7 @@ DEFAULT_GH_URL, DEFAULT_AUTO_PUSH, GH_TIMEOUT_SECONDS = "http://127.0.0.1:8081",
 
 LAST = {"user_input":"", "ai_response":"", "timestamp":""}
 LLM_LOCK = threading.Lock()
+GH_QUEUE = GrasshopperPushQueue(timeout=GH_TIMEOUT_SECONDS)  # non-blocking GH delivery
 
 def llm_infer(text, project, model, mode, system_prompt=None):
     with LLM_LOCK:
@@ -123,8 +125,7 @@ class ChatApp:
             except Exception as e: self.root.after(0,self._write,str(e),"error"); self.root.after(0,self._status,"Invalid mode/model"); return
             self.root.after(0,self._write,f"Assistant [{datetime.now().strftime('%H:%M')}]:\n{ans}","assistant"); self.root.after(0,self._status,"Ready")
             if self.auto_push.get():
-                try: requests.post(self.gh.get().strip(),json={"user_input":msg,"ai_response":ans,"timestamp":datetime.utcnow().isoformat()+"Z","project_name":proj,"model":model,"api_mode":mode},timeout=GH_TIMEOUT_SECONDS)
-                except: pass
+                GH_QUEUE.submit(self.gh.get().strip(),{"user_input":msg,"ai_response":ans,"timestamp":datetime.utcnow().isoformat()+"Z","project_name":proj,"model":model,"api_mode":mode},key=proj)
         finally:
             self.root.after(0,self.btn.config,{"state":"normal"}); self.root.after(0,self.entry.focus)
 
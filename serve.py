@@ -0,0 +1,236 @@
+"""
+serve.py - Run app.py / gh_app.py under a production WSGI server
+
+    python serve.py app --workers 4 --threads 8 --port 5000
+    python serve.py gh_app --server waitress --threads 16
+
+gunicorn (POSIX) runs several worker processes with a thread pool each;
+waitress (any platform, including the Windows box next to Rhino) runs one
+process with a thread pool. Both get keep-alive, request size limits and
+graceful draining on SIGTERM: no new requests are taken (waitress answers
+them 503), in-flight requests finish (up to --graceful-timeout), then the
+listener closes and the process exits.
+Shared state lives in utils.layout_store, so all workers see the same
+layouts.
+"""
+
+import _thread
+import argparse
+import importlib
+import os
+import signal
+import sys
+import threading
+import time
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5000
+DEFAULT_THREADS = 8
+DEFAULT_KEEPALIVE = 5  # seconds an idle keep-alive connection stays open
+DEFAULT_TIMEOUT = 180  # LLM calls can take minutes
+DEFAULT_GRACEFUL_TIMEOUT = 30
+FLUSH_SECONDS = 0.5  # waitress: time for finished responses to reach the socket
+MAX_REQUEST_BYTES = 8 * 1024 * 1024
+MAX_REQUEST_LINE = 8190
+METRICS_DIR = "metrics_data"
+TARGETS = {"app": "app:create_app", "gh_app": "gh_app:create_app"}
+
+
+def load_app(target, max_request_bytes=MAX_REQUEST_BYTES, server_timing=False, trace_dir=None):
+    """Build the WSGI app for "app", "gh_app" or "module:factory"."""
+    module_name, _, factory = TARGETS.get(target, target).partition(":")
+    module = importlib.import_module(module_name)
+    config = {"MAX_CONTENT_LENGTH": max_request_bytes, "SERVER_TIMING": server_timing}
+    if trace_dir:
+        config["TRACE_DIR"] = trace_dir
+    return getattr(module, factory or "create_app")(config)
+
+
+def default_server():
+    try:
+        import gunicorn  # noqa: F401
+        return "gunicorn" if os.name == "posix" else "waitress"
+    except ImportError:
+        return "waitress"
+
+
+# ============================================================================
+# GUNICORN
+# ============================================================================
+
+def run_gunicorn(target, args):
+    from gunicorn.app.base import BaseApplication
+
+    options = {
+        "bind": f"{args.host}:{args.port}",
+        "workers": args.workers,
+        "threads": args.threads,
+        "worker_class": "gthread",
+        "keepalive": args.keepalive,
+        "timeout": args.timeout,
+        "graceful_timeout": args.graceful_timeout,  # SIGTERM: finish in-flight requests
+        "limit_request_line": MAX_REQUEST_LINE,
+        "max_requests": args.max_requests,
+        "max_requests_jitter": args.max_requests // 10 if args.max_requests else 0,
+    }
+
+    class Application(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # each worker builds its own app after the fork
+            return load_app(target, args.max_request_bytes, args.server_timing, args.trace_dir)
+
+    if args.workers > 1:
+        # /metrics merges per-worker snapshots from this directory
+        metrics_dir = os.environ.setdefault("METRICS_DIR", os.path.abspath(METRICS_DIR))
+        os.makedirs(metrics_dir, exist_ok=True)
+        for name in os.listdir(metrics_dir):
+            if name.startswith("metrics_"):
+                os.remove(os.path.join(metrics_dir, name))
+    Application().run()
+
+
+# ============================================================================
+# WAITRESS
+# ============================================================================
+
+class _Closing:
+    """Response iterable that reports completion when the server closes it."""
+
+    def __init__(self, result, done):
+        self.result = result
+        self.done = done
+
+    def __iter__(self):
+        return iter(self.result)
+
+    def close(self):
+        try:
+            if hasattr(self.result, "close"):
+                self.result.close()
+        finally:
+            self.done()
+
+
+class DrainMiddleware:
+    """Counts in-flight requests so SIGTERM can wait for them."""
+
+    def __init__(self, app):
+        self.app = app
+        self.cond = threading.Condition()
+        self.inflight = 0
+        self.draining = False
+
+    def _done(self):
+        with self.cond:
+            self.inflight -= 1
+            self.cond.notify_all()
+
+    def __call__(self, environ, start_response):
+        with self.cond:
+            if self.draining:
+                start_response("503 Service Unavailable", [("Content-Type", "text/plain"), ("Retry-After", "1")])
+                return [b"shutting down\n"]
+            self.inflight += 1
+        try:
+            result = self.app(environ, start_response)
+        except BaseException:
+            self._done()
+            raise
+        return _Closing(result, self._done)
+
+    def wait_idle(self, timeout):
+        """Block until no request is in flight; False on timeout."""
+        with self.cond:
+            return self.cond.wait_for(lambda: self.inflight == 0, timeout)
+
+
+def run_waitress(target, args):
+    from waitress import create_server
+
+    if args.workers > 1:
+        print("waitress runs a single process; using --threads only", file=sys.stderr)
+    app = DrainMiddleware(load_app(target, args.max_request_bytes, args.server_timing, args.trace_dir))
+    server = create_server(
+        app,
+        host=args.host,
+        port=args.port,
+        threads=args.threads,
+        channel_timeout=max(args.keepalive, args.timeout),
+        cleanup_interval=min(30, args.keepalive),
+        max_request_body_size=args.max_request_bytes,
+        max_request_header_size=MAX_REQUEST_LINE * 32,
+        connection_limit=args.threads * 32,
+        ident="house-gen",
+    )
+
+    def drain():
+        # new requests get 503 from DrainMiddleware while in-flight ones finish
+        app.wait_idle(args.graceful_timeout)
+        # waitress has no documented graceful stop: the app returning does not
+        # mean the loop thread has written the response yet, so allow it a
+        # fixed FLUSH_SECONDS, then stop the way Ctrl-C does (server.run()
+        # catches KeyboardInterrupt and shuts its task threads down); the
+        # listening socket closes when the process exits
+        time.sleep(FLUSH_SECONDS)
+        _thread.interrupt_main()
+
+    def on_term(signum, frame):
+        if app.draining:
+            return
+        print(f"Draining (up to {args.graceful_timeout}s)...", file=sys.stderr)
+        app.draining = True
+        threading.Thread(target=drain, name="drain", daemon=True).start()
+
+    for name in ("SIGTERM", "SIGBREAK"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), on_term)
+    print(f"Serving {target} on http://{args.host}:{args.port} (waitress, {args.threads} threads)")
+    server.run()
+
+
+def serve_in_thread(app, host, port, threads=DEFAULT_THREADS):
+    """Run an app on a daemon thread (waitress if installed, else the Flask dev server)."""
+    try:
+        from waitress import create_server
+    except ImportError:
+        run = lambda: app.run(host=host, port=port, debug=False, use_reloader=False, threaded=True)  # noqa: E731
+    else:
+        run = create_server(app, host=host, port=port, threads=threads,
+                            channel_timeout=DEFAULT_TIMEOUT, ident="house-gen").run
+    thread = threading.Thread(target=run, name="api-server", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Production server for app.py / gh_app.py")
+    parser.add_argument("target", help="app, gh_app or module:factory")
+    parser.add_argument("--server", choices=["gunicorn", "waitress"], default=default_server())
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (gunicorn)")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="threads per worker")
+    parser.add_argument("--keepalive", type=int, default=DEFAULT_KEEPALIVE)
+    parser.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT, help="per-request timeout (s)")
+    parser.add_argument("--graceful-timeout", type=int, default=DEFAULT_GRACEFUL_TIMEOUT,
+                        help="seconds to drain in-flight requests on SIGTERM")
+    parser.add_argument("--max-request-bytes", type=int, default=MAX_REQUEST_BYTES)
+    parser.add_argument("--max-requests", type=int, default=0,
+                        help="recycle a gunicorn worker after this many requests (0 = never)")
+    parser.add_argument("--server-timing", action="store_true",
+                        help="send a Server-Timing header on every response")
+    parser.add_argument("--trace-dir", help="record every request to rotating JSONL traces here (bench.replay)")
+    args = parser.parse_args(argv)
+
+    if args.server == "gunicorn":
+        run_gunicorn(args.target, args)
+    else:
+        run_waitress(args.target, args)
+
+
+if __name__ == "__main__":
+    main()
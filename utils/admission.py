@@ -0,0 +1,272 @@
+"""
+admission.py - Per-user admission control in front of the LLM backends
+
+Each request names a key (user_id / project_name) and a class
+("interactive" or "bulk"; bulk unless the request asks for interactive).
+Admission runs in three steps:
+  1. token bucket per key: sustained rate plus burst; an empty bucket is
+     rejected with the time until the next token as Retry-After,
+  2. in-flight cap per key (running + queued),
+  3. a fixed number of backend slots handed out by a weighted fair queue
+     (start-time fair queuing). Every request gets a virtual finish tag
+     max(V, last tag of its key) + 1 / class weight, and the smallest tag
+     runs next. A key with a long backlog can't push its later requests
+     ahead of another key's first one, and interactive requests (weight
+     8) get ahead of bulk ones (weight 1).
+A full queue or a wait past max_wait is rejected as well, so overload
+turns into 429s instead of piled-up threads. Limits are per process.
+
+Background jobs only pass steps 1 and 2 when submitted (admit(...,
+slot=False) on POST /jobs, which returns at once) and take their backend
+slot when they run (admit_job() on the handler), waiting up to
+JOB_MAX_WAIT_SECONDS without being charged again.
+"""
+
+import heapq
+import itertools
+import math
+import threading
+import time
+from functools import wraps
+
+from utils.metrics import inc, observe
+
+DEFAULT_RATE = 1.0  # requests per second per key
+DEFAULT_BURST = 5
+MAX_INFLIGHT_PER_KEY = 4
+BACKEND_SLOTS = 4  # concurrent upstream calls
+MAX_QUEUE = 64
+MAX_WAIT_SECONDS = 30.0
+JOB_MAX_WAIT_SECONDS = 600.0  # jobs already waited in their queue; slot waits may be long
+CLASS_WEIGHTS = {"interactive": 8.0, "bulk": 1.0}
+DEFAULT_CLASS = "bulk"  # interactive must be asked for
+IDLE_BUCKET_SECONDS = 600  # forget keys idle this long
+
+
+class Rejected(Exception):
+    """Request not admitted; retry_after is in seconds."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+
+    def take(self, now):
+        """Take one token; returns 0 on success or seconds until one is available."""
+        if now > self.stamp:  # `now` may predate the bucket (taken before the lock)
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else MAX_WAIT_SECONDS
+
+
+class _Waiter:
+    __slots__ = ("key", "tag", "granted", "cancelled")
+
+    def __init__(self, key, tag):
+        self.key = key
+        self.tag = tag
+        self.granted = False
+        self.cancelled = False
+
+
+class AdmissionController:
+    """Token buckets, per-key in-flight caps and a weighted fair queue."""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, max_inflight=MAX_INFLIGHT_PER_KEY,
+                 slots=BACKEND_SLOTS, max_queue=MAX_QUEUE, max_wait=MAX_WAIT_SECONDS,
+                 weights=CLASS_WEIGHTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_inflight = max_inflight
+        self.slots = slots
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.weights = weights
+
+        self.cond = threading.Condition()
+        self.buckets = {}
+        self.inflight = {}  # key -> running + queued
+        self.last_tag = {}  # key -> finish tag of its latest request
+        self.virtual = 0.0
+        self.running = 0
+        self.heap = []  # (tag, seq, waiter)
+        self.seq = itertools.count()
+        self.service_time = 1.0  # EWMA of slot hold time, for Retry-After
+        self.last_sweep = time.monotonic()
+
+    def _reject(self, reason, retry_after):
+        inc("admission_rejected_total", reason=reason)
+        return Rejected(reason, max(1, math.ceil(retry_after)))
+
+    def _sweep(self, now):
+        if now - self.last_sweep < IDLE_BUCKET_SECONDS:
+            return
+        self.last_sweep = now
+        for key in [k for k, b in self.buckets.items() if now - b.stamp > IDLE_BUCKET_SECONDS]:
+            if not self.inflight.get(key):
+                self.buckets.pop(key, None)
+                self.last_tag.pop(key, None)
+
+    def _dispatch(self):
+        """Hand free slots to the lowest tags (caller holds the lock)."""
+        while self.running < self.slots and self.heap:
+            tag, _, waiter = heapq.heappop(self.heap)
+            if waiter.cancelled:
+                continue
+            self.virtual = max(self.virtual, tag)
+            waiter.granted = True
+            self.running += 1
+        self.cond.notify_all()
+
+    def _limit(self, key, now):
+        """Token bucket and in-flight cap for `key` (caller holds the lock)."""
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.rate, self.burst)
+        wait = bucket.take(now)
+        if wait:
+            raise self._reject("rate_limited", wait)
+        if self.inflight.get(key, 0) >= self.max_inflight:
+            raise self._reject("too_many_inflight", self.service_time)
+
+    def limit(self, key):
+        """Charge `key` one request without taking a slot. Raises Rejected."""
+        now = time.monotonic()
+        with self.cond:
+            self._sweep(now)
+            self._limit(key, now)
+
+    def acquire(self, key, cls=DEFAULT_CLASS, limit=True, max_wait=None):
+        """
+        Wait for a backend slot. Raises Rejected instead of queueing forever.
+
+        limit: apply the token bucket, in-flight cap and queue bound (False for
+        work admitted earlier, e.g. a queued job)
+        max_wait: seconds to wait for a slot (default: the controller's max_wait)
+
+        Returns:
+            a token to pass to release()
+        """
+        weight = self.weights.get(cls, self.weights[DEFAULT_CLASS])
+        start = time.monotonic()
+        with self.cond:
+            self._sweep(start)
+            if limit:
+                self._limit(key, start)
+                if len(self.heap) >= self.max_queue:
+                    raise self._reject("queue_full", self.service_time * len(self.heap) / max(1, self.slots))
+
+            tag = max(self.virtual, self.last_tag.get(key, 0.0)) + 1.0 / weight
+            self.last_tag[key] = tag
+            self.inflight[key] = self.inflight.get(key, 0) + 1
+            waiter = _Waiter(key, tag)
+            heapq.heappush(self.heap, (tag, next(self.seq), waiter))
+            self._dispatch()
+            deadline = start + (self.max_wait if max_wait is None else max_wait)
+            while not waiter.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    waiter.cancelled = True
+                    self._leave(key)
+                    raise self._reject("queue_timeout", self.service_time)
+                self.cond.wait(remaining)
+        granted = time.monotonic()
+        observe("stage_duration_seconds", granted - start, stage="admission_wait", mode="", model="")
+        return (key, granted)
+
+    def _leave(self, key):
+        left = self.inflight.get(key, 1) - 1
+        if left > 0:
+            self.inflight[key] = left
+        else:
+            self.inflight.pop(key, None)
+
+    def release(self, token):
+        key, granted = token
+        held = time.monotonic() - granted
+        with self.cond:
+            self.running -= 1
+            self._leave(key)
+            self.service_time = 0.8 * self.service_time + 0.2 * held
+            self._dispatch()
+
+    def stats(self):
+        with self.cond:
+            return {"running": self.running, "queued": sum(not w.cancelled for _, _, w in self.heap),
+                    "keys": len(self.inflight), "service_time": round(self.service_time, 3)}
+
+
+def admit(controller, key_fn, class_fn=None, slot=True):
+    """
+    Flask view decorator: run the view inside an admission slot, or return
+    429 with Retry-After.
+
+    key_fn/class_fn: callables(request) -> key / class name
+    slot: False only rate limits the request (for views that return at
+    once, such as job submission)
+    """
+    from flask import jsonify, request
+
+    def decorate(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cls = (class_fn(request) if class_fn else None) or DEFAULT_CLASS
+            token = None
+            try:
+                if slot:
+                    token = controller.acquire(key_fn(request), cls)
+                else:
+                    controller.limit(key_fn(request))
+            except Rejected as e:
+                resp = jsonify({"error": "Too many requests", "reason": e.reason, "retry_after": e.retry_after})
+                resp.status_code = 429
+                resp.headers["Retry-After"] = str(e.retry_after)
+                return resp
+            if token is None:
+                return view(*args, **kwargs)
+            try:
+                return view(*args, **kwargs)
+            finally:
+                controller.release(token)
+        return wrapper
+    return decorate
+
+
+def admit_job(controller, key_fn, cls="bulk", max_wait=JOB_MAX_WAIT_SECONDS):
+    """
+    Job handler decorator: run the handler inside a backend slot. The job was
+    rate limited when it was submitted, so only the slot is waited for; a
+    wait past max_wait fails the job with Rejected.
+
+    key_fn: callable(params) -> key
+    """
+    def decorate(handler):
+        @wraps(handler)
+        def wrapper(params, job=None):
+            token = controller.acquire(key_fn(params), cls, limit=False, max_wait=max_wait)
+            try:
+                return handler(params, job)
+            finally:
+                controller.release(token)
+        return wrapper
+    return decorate
+
+
+def request_class(request):
+    """Class from the X-Priority header or a "priority" field in the JSON body."""
+    body = request.get_json(force=True, silent=True) or {}
+    cls = request.headers.get("X-Priority") or (body.get("priority") if isinstance(body, dict) else None)
+    return cls if cls in CLASS_WEIGHTS else DEFAULT_CLASS
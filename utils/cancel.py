@@ -0,0 +1,61 @@
+"""
+cancel.py - Cancellation tokens for LLM calls
+
+A CancelToken is shared between the code that may stop a piece of work
+(the GUI's Stop button, a cancelled job, a design search that already has
+its answer) and the code doing it. Blocking work registers a callback,
+e.g. closing the upstream stream, so cancelling takes effect at once
+instead of at the next check.
+"""
+
+import threading
+
+
+class StreamCancelled(Exception):
+    """A query was stopped through its CancelToken."""
+
+
+class CancelToken:
+    """Cancellation flag that can also abort blocking work (e.g. close a stream)."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception:
+                pass
+
+    def on_cancel(self, fn):
+        """Run fn on cancel (at once if already cancelled). Returns an unregister function."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(fn)
+                return lambda: self._discard(fn)
+        fn()
+        return lambda: None
+
+    def _discard(self, fn):
+        with self._lock:
+            if fn in self._callbacks:
+                self._callbacks.remove(fn)
+
+    def wait(self, timeout=None):
+        return self._event.wait(timeout)
+
+    def check(self):
+        if self._event.is_set():
+            raise StreamCancelled()
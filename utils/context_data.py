@@ -2,7 +2,10 @@ from datetime import datetime
 import sqlite3
 import os
 
+from utils.metrics import span
+
 DB_PATH = 'conversations.db'
+HISTORY_PAGE_SIZE = 20  # exchanges per history page
 
 def init_db():
     """Initialize the database with conversations table"""
@@ -14,31 +17,66 @@ def init_db():
                   message TEXT,
                   response TEXT,
                   timestamp DATETIME)''')
+    # per-user lookups (context, history pages) walk this index newest-first
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_conversations_user
+                 ON conversations (user_id, id)''')
     conn.commit()
     conn.close()
 
 def save_conversation(user_id, message, response):
     """Save a conversation to the database"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('''INSERT INTO conversations 
-                 (user_id, message, response, timestamp) 
-                 VALUES (?, ?, ?, ?)''', 
-              (user_id, message, response, datetime.now()))
-    conn.commit()
-    conn.close()
+    with span("db_write"):
+        conn = sqlite3.connect(DB_PATH)
+        c = conn.cursor()
+        c.execute('''INSERT INTO conversations 
+                     (user_id, message, response, timestamp) 
+                     VALUES (?, ?, ?, ?)''', 
+                  (user_id, message, response, datetime.now()))
+        conn.commit()
+        conn.close()
 
 def get_recent_context(user_id, limit=10):
     """Get recent conversation history for a user"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('''SELECT message, response FROM conversations 
-                 WHERE user_id = ? 
-                 ORDER BY timestamp DESC LIMIT ?''', 
-              (user_id, limit))
-    result = c.fetchall()
-    conn.close()
+    with span("db_read"):
+        conn = sqlite3.connect(DB_PATH)
+        c = conn.cursor()
+        c.execute('''SELECT message, response FROM conversations 
+                     WHERE user_id = ? 
+                     ORDER BY id DESC LIMIT ?''', 
+                  (user_id, limit))
+        result = c.fetchall()
+        conn.close()
     return result[::-1]  # Reverse for chronological order
 
+def get_history_page(user_id, before_id=None, limit=HISTORY_PAGE_SIZE):
+    """
+    One page of a user's stored exchanges, newest page first.
+
+    Args:
+        user_id: user / project key
+        before_id: only exchanges older than this id (None for the newest page)
+        limit: page size
+
+    Returns:
+        (rows, has_more): rows are (id, message, response, timestamp) in
+        chronological order; pass rows[0][0] as before_id for the next page
+    """
+    with span("db_read"):
+        conn = sqlite3.connect(DB_PATH)
+        c = conn.cursor()
+        if before_id is None:
+            c.execute('''SELECT id, message, response, timestamp FROM conversations
+                         WHERE user_id = ?
+                         ORDER BY id DESC LIMIT ?''',
+                      (user_id, limit + 1))
+        else:
+            c.execute('''SELECT id, message, response, timestamp FROM conversations
+                         WHERE user_id = ? AND id < ?
+                         ORDER BY id DESC LIMIT ?''',
+                      (user_id, before_id, limit + 1))
+        rows = c.fetchall()
+        conn.close()
+    return rows[:limit][::-1], len(rows) > limit
+
 # Initialize database on import
 init_db()
\ No newline at end of file
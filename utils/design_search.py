@@ -0,0 +1,163 @@
+"""
+design_search.py - Generate-and-rank search over LLM layout candidates
+
+Runs N generations in parallel at varied temperatures, parses each one as
+soon as it finishes and scores it with fast local checks (schema, overlaps,
+connectivity, GRAPH_SYSTEM_PROMPT adjacency rules). Stops early once a
+candidate clears the quality threshold. All candidates share a CancelToken
+that is cancelled when the search ends (answer found, deadline, caller
+cancel), so generations still running are stopped upstream instead of
+using the LLM for a result nobody reads.
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from utils.cancel import CancelToken, StreamCancelled
+from utils.extractInfo import extract_layout_from_text
+from utils.schema import normalize_layout
+from utils.validation import validate_layout
+from utils.graph_metrics import get_metrics, build_graph
+from utils.layout import room_category
+
+DEFAULT_CANDIDATES = 4
+MAX_CANDIDATES = 8
+TEMPERATURE_RANGE = (0.2, 1.0)
+QUALITY_THRESHOLD = 0.9
+POLL_SECONDS = 0.25  # how often a waiting search checks cancelled()
+
+
+class SearchTimeout(TimeoutError):
+    """No candidate finished before the deadline."""
+
+
+def temperatures(n, low=TEMPERATURE_RANGE[0], high=TEMPERATURE_RANGE[1]):
+    """n temperatures spread evenly over [low, high]."""
+    if n <= 1:
+        return [low]
+    return [round(low + (high - low) * i / (n - 1), 3) for i in range(n)]
+
+
+def score_layout(layout):
+    """
+    Score a layout in [0, 1] (1 = no problems found).
+
+    Returns:
+        (score, checks) where checks lists the individual findings
+    """
+    penalties = {}
+    _, schema_errors = normalize_layout(layout)
+    if schema_errors:
+        penalties["schema"] = min(0.3, 0.05 * len(schema_errors))
+
+    validation = validate_layout(layout)
+    if validation["overlaps"]:
+        penalties["overlaps"] = min(0.3, 0.1 * len(validation["overlaps"]))
+    if validation["outside_site"]:
+        penalties["outside_site"] = min(0.2, 0.05 * len(validation["outside_site"]))
+    if validation["bad_edges"]:
+        penalties["bad_edges"] = min(0.2, 0.05 * len(validation["bad_edges"]))
+
+    metrics = get_metrics(layout)
+    if not metrics["connected"]:
+        penalties["disconnected"] = 0.3
+    if metrics["private_to_public_links"]:
+        penalties["private_to_public"] = min(0.2, 0.05 * len(metrics["private_to_public_links"]))
+
+    # entry should open onto living areas or circulation
+    nodes, adj = build_graph(layout)
+    entry = metrics["entry"]
+    if entry is None or not any(room_category(nodes[n]) in ("public", "circulation") for n in adj.get(entry, ())):
+        penalties["entry"] = 0.1
+
+    score = max(0.0, 1.0 - sum(penalties.values()))
+    return round(score, 4), {
+        "penalties": penalties,
+        "schema_errors": len(schema_errors),
+        "overlaps": len(validation["overlaps"]),
+        "bad_edges": len(validation["bad_edges"]),
+        "connected": metrics["connected"],
+    }
+
+
+def search(generate, n=DEFAULT_CANDIDATES, threshold=QUALITY_THRESHOLD, timeout=None,
+           on_candidate=None, cancelled=None):
+    """
+    Generate up to n candidates in parallel and return the best one.
+
+    Args:
+        generate: callable(temperature, cancel) -> raw LLM text; cancel is a
+                  CancelToken to pass to query_llm/query_stream
+        n: number of candidates
+        threshold: stop as soon as a candidate scores at least this
+        timeout: optional overall deadline in seconds
+        on_candidate: optional callable(candidates, best) after each candidate
+        cancelled: optional callable() -> bool; stops the search when true
+
+    Returns:
+        {"response", "layout", "score", "checks", "candidates": [...]}
+        (layout is None if no candidate contained a layout)
+
+    Raises:
+        SearchTimeout: the deadline passed before any candidate finished
+        StreamCancelled: cancelled before any candidate finished
+        RuntimeError: every candidate failed
+    """
+    n = max(1, min(int(n), MAX_CANDIDATES))
+    start = time.perf_counter()
+    deadline = start + timeout if timeout is not None else None
+    best = None
+    candidates = []
+    stopped = None  # "timeout" / "cancelled"
+    token = CancelToken()
+    pool = ThreadPoolExecutor(max_workers=n)
+    futures = {pool.submit(generate, t, token): t for t in temperatures(n)}
+    pending = set(futures)
+    try:
+        while pending:
+            if cancelled is not None and cancelled():
+                stopped = "cancelled"
+                break
+            wait_for = POLL_SECONDS if cancelled is not None else None
+            if deadline is not None:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    stopped = "timeout"
+                    break
+                wait_for = remaining if wait_for is None else min(wait_for, remaining)
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            found = False
+            for future in done:
+                temperature = futures[future]
+                entry = {"temperature": temperature, "elapsed": round(time.perf_counter() - start, 3)}
+                try:
+                    text = future.result()
+                except Exception as e:
+                    entry["error"] = str(e) or type(e).__name__
+                    candidates.append(entry)
+                    continue
+                layout = extract_layout_from_text(text)
+                score, checks = score_layout(layout) if layout else (0.0, {"penalties": {"no_layout": 1.0}})
+                entry["score"] = score
+                candidates.append(entry)
+                if best is None or score > best["score"]:
+                    best = {"response": text, "layout": layout, "score": score, "checks": checks}
+                if on_candidate is not None:
+                    on_candidate(candidates, best)
+                found = found or bool(layout and score >= threshold)
+            if found:
+                break
+    finally:
+        # stop the generations still running, and don't wait for them
+        token.cancel()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if best is None:
+        if stopped == "timeout":
+            raise SearchTimeout(f"no candidate finished within {timeout:g} s")
+        if stopped == "cancelled":
+            raise StreamCancelled()
+        errors = [c["error"] for c in candidates if c.get("error")]
+        raise RuntimeError(f"all {len(errors)} candidates failed: " + "; ".join(errors[:3]))
+    best["candidates"] = candidates
+    return best
@@ -0,0 +1,84 @@
+"""
+events.py - In-process event log for push-style subscribers
+
+Every event gets a monotonically increasing sequence number. Subscribers
+long-poll with the last sequence they saw (their cursor) and are woken as
+soon as a newer event is published, so there is no idle polling. Recent
+events are kept in a ring buffer, so a late subscriber can replay from an
+older cursor.
+"""
+
+import threading
+import time
+from collections import deque
+
+EVENT_BUFFER_SIZE = 1000
+MAX_WAIT_SECONDS = 30.0
+
+
+class EventLog:
+    """Bounded, sequence-numbered event log with blocking waits."""
+
+    def __init__(self, maxlen=EVENT_BUFFER_SIZE):
+        self.events = deque(maxlen=maxlen)
+        self.seq = 0
+        self.cond = threading.Condition()
+
+    def publish(self, kind, data, project=None):
+        """Append an event and wake all waiting subscribers. Returns its seq."""
+        with self.cond:
+            self.seq += 1
+            self.events.append({
+                "seq": self.seq,
+                "type": kind,
+                "project": project,
+                "timestamp": time.time(),
+                "data": data,
+            })
+            self.cond.notify_all()
+            return self.seq
+
+    def since(self, cursor, project=None):
+        """
+        Events after `cursor` (optionally for one project).
+
+        Returns:
+            (events, missed) where missed is True if the cursor is older than
+            the buffer and some events could not be replayed
+        """
+        with self.cond:
+            oldest = self.events[0]["seq"] if self.events else self.seq + 1
+            missed = cursor + 1 < oldest and cursor < self.seq
+            found = [e for e in self.events if e["seq"] > cursor
+                     and (project is None or e["project"] == project)]
+            return found, missed
+
+    def wait(self, cursor, project=None, timeout=MAX_WAIT_SECONDS):
+        """
+        Block until there are events after `cursor` or `timeout` expires.
+
+        Returns:
+            {"events": [...], "cursor": int, "missed": bool}
+        """
+        deadline = time.monotonic() + min(timeout, MAX_WAIT_SECONDS)
+        with self.cond:
+            reset = cursor > self.seq  # cursor from before a server restart
+            if reset:
+                cursor = 0
+            while True:
+                events, missed = self.since(cursor, project)
+                if events or missed or reset:
+                    break
+                # nothing for this subscriber up to here
+                cursor = self.seq
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            if not events and (missed or reset):
+                cursor = self.seq
+            return {
+                "events": events,
+                "cursor": events[-1]["seq"] if events else cursor,
+                "missed": missed or reset,
+            }
@@ -19,4 +19,19 @@ def extract_json_from_text(text):
         return None
 
     json_text = text[start:end + 1]
-    return json_text
\ No newline at end of file
+    return json_text
+
+
+def extract_layout_from_text(text):
+    """Return the first JSON layout (dict with nodes/edges) in `text`, or None."""
+    json_str = extract_json_from_text(text or "")
+    if not json_str:
+        return None
+    try:
+        data = json.loads(json_str)
+    except ValueError:
+        return None
+    body = data.get("graph", data) if isinstance(data, dict) else None
+    if isinstance(body, dict) and "nodes" in body and "edges" in body and body["nodes"]:
+        return data
+    return None
@@ -0,0 +1,137 @@
+"""
+gallery_manifest.py - Precomputed per-house summaries for the gallery
+
+The gallery (gallery/gallery-manager.js) draws its cards from these
+summaries and the server-rendered /thumbnails, and only fetches a layout
+(GET /layouts/<id>) when it needs the full data: another preview mode, the
+detail viewer or a comparison. The manifest computes the summaries once on
+the server and keeps a gzip-compressed, ETagged copy that is rebuilt only
+when a source file or stored layout changes.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+from utils.layout import layout_hash, DEFAULT_ROOM_HEIGHT
+from utils.schema import normalize_layout
+
+
+def plan_bounds(nodes):
+    """Same as ThumbnailCache._planBounds: {min: {x, z}, max: {x, z}}."""
+    placed = [n for n in nodes if n["center"]]
+    if not placed:
+        return {"min": {"x": -1, "z": -1}, "max": {"x": 1, "z": 1}}
+    xs, zs = [], []
+    for n in placed:
+        w, d = n["width"] or (4.0, 4.0)
+        xs += [n["center"][0] - w / 2, n["center"][0] + w / 2]
+        zs += [n["center"][1] - d / 2, n["center"][1] + d / 2]
+    return {"min": {"x": min(xs), "z": min(zs)}, "max": {"x": max(xs), "z": max(zs)}}
+
+
+def world_bounds(nodes):
+    """Same as ThumbnailCache._worldBounds: {center: [x, y, z], radius}."""
+    if not nodes:
+        return {"center": [0, 0, 0], "radius": 10}
+    bounds = plan_bounds(nodes)
+    ys = [n["floor"] for n in nodes] + [n["floor"] + (n["height"] or DEFAULT_ROOM_HEIGHT) for n in nodes]
+    lo = (bounds["min"]["x"], min(ys), bounds["min"]["z"])
+    hi = (bounds["max"]["x"], max(ys), bounds["max"]["z"])
+    spans = [max(0.01, b - a) for a, b in zip(lo, hi)]
+    return {
+        "center": [round((a + b) / 2, 4) for a, b in zip(lo, hi)],
+        "radius": round(max(spans) * 0.6, 4),
+    }
+
+
+def summarize(layout_id, layout, source):
+    """Compact gallery card summary for one layout."""
+    canon, errors = normalize_layout(layout)
+    nodes = canon["nodes"]
+    digest = layout_hash(layout)
+    return {
+        "id": layout_id,
+        "name": canon["name"] or layout_id,
+        "source": source,
+        "floors": len({n["floor"] for n in nodes}),
+        "rooms": len(nodes),
+        "edges": len(canon["edges"]),
+        "location": canon["meta"].get("location"),
+        "world_bounds": world_bounds(nodes),
+        "plan_bounds": plan_bounds(nodes),
+        "thumbnail": f"/thumbnails/{layout_id}.png?v={digest[:12]}",
+        "hash": digest,
+        "schema_errors": len(errors),
+    }
+
+
+class GalleryManifest:
+    """Incrementally maintained manifest over a JSON directory and stored layouts."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.files = {}    # filename -> ((mtime_ns, size), summary)
+        self.stored = {}   # layout id -> summary
+        self.version = 0
+        self.built_version = -1
+        self.body = b""
+        self.gzipped = b""
+        self.etag = ""
+
+    def put(self, layout_id, layout):
+        """Add or refresh a stored layout."""
+        summary = summarize(layout_id, layout, "stored")
+        with self.lock:
+            self.stored[layout_id] = summary
+            self.version += 1
+
+    def remove(self, layout_id):
+        with self.lock:
+            if self.stored.pop(layout_id, None) is not None:
+                self.version += 1
+
+    def _scan(self):
+        """Re-summarize only files whose mtime/size changed."""
+        try:
+            entries = [e for e in os.scandir(self.directory) if e.name.endswith(".json")]
+        except FileNotFoundError:
+            entries = []
+        seen = set()
+        changed = False
+        for entry in entries:
+            stat = entry.stat()
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            seen.add(entry.name)
+            cached = self.files.get(entry.name)
+            if cached and cached[0] == stamp:
+                continue
+            try:
+                with open(entry.path, encoding="utf-8") as f:
+                    layout = json.load(f)
+            except (OSError, ValueError):
+                continue
+            layout_id = os.path.splitext(entry.name)[0]
+            self.files[entry.name] = (stamp, summarize(layout_id, layout, "file"))
+            changed = True
+        for name in set(self.files) - seen:
+            del self.files[name]
+            changed = True
+        return changed
+
+    def get(self):
+        """Return (json_bytes, gzip_bytes, etag), rebuilding only if something changed."""
+        with self.lock:
+            if self._scan():
+                self.version += 1
+            if self.built_version != self.version:
+                houses = [summary for _, (_, summary) in sorted(self.files.items())]
+                houses += [self.stored[k] for k in sorted(self.stored)]
+                self.body = json.dumps({"houses": houses}, separators=(",", ":")).encode("utf-8")
+                self.gzipped = gzip.compress(self.body, 6)
+                self.etag = hashlib.sha1(self.body).hexdigest()[:20]
+                self.built_version = self.version
+            return self.body, self.gzipped, self.etag
@@ -0,0 +1,152 @@
+"""
+gltf_export.py - Binary glTF (GLB) export of layouts
+
+Each room becomes a box from center/width/height/floor with a material
+from the node `color`. A single unit cube is written to the buffer once
+and every room is a node that scales and translates it; rooms sharing a
+colour share one mesh, so the file size barely grows with room count.
+Opens directly in Blender (File > Import > glTF) and three.js.
+"""
+
+import json
+import struct
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.layout import layout_hash, DEFAULT_ROOM_HEIGHT
+from utils.schema import normalize_layout
+
+FLOOR_HEIGHT = DEFAULT_ROOM_HEIGHT  # elevation step between floors
+DEFAULT_COLOR = "#cccccc"
+CACHE_SIZE = 256
+
+_CACHE = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+GLB_MAGIC = 0x46546C67
+JSON_CHUNK = 0x4E4F534A
+BIN_CHUNK = 0x004E4942
+
+
+def unit_cube():
+    """Positions, normals and indices of a 1x1x1 box with its base at y=0."""
+    faces = [
+        ((1, 0, 0), [(.5, 0, -.5), (.5, 1, -.5), (.5, 1, .5), (.5, 0, .5)]),
+        ((-1, 0, 0), [(-.5, 0, .5), (-.5, 1, .5), (-.5, 1, -.5), (-.5, 0, -.5)]),
+        ((0, 1, 0), [(-.5, 1, -.5), (-.5, 1, .5), (.5, 1, .5), (.5, 1, -.5)]),
+        ((0, -1, 0), [(-.5, 0, .5), (-.5, 0, -.5), (.5, 0, -.5), (.5, 0, .5)]),
+        ((0, 0, 1), [(.5, 0, .5), (.5, 1, .5), (-.5, 1, .5), (-.5, 0, .5)]),
+        ((0, 0, -1), [(-.5, 0, -.5), (-.5, 1, -.5), (.5, 1, -.5), (.5, 0, -.5)]),
+    ]
+    positions = np.array([v for _, quad in faces for v in quad], dtype=np.float32)
+    normals = np.repeat(np.array([n for n, _ in faces], dtype=np.float32), 4, axis=0)
+    base = np.arange(6, dtype=np.uint16)[:, None] * 4
+    indices = (base + np.array([0, 1, 2, 0, 2, 3], dtype=np.uint16)).ravel().astype(np.uint16)
+    return positions, normals, indices
+
+
+_CUBE = unit_cube()
+
+
+def _linear_rgba(color):
+    """'#rrggbb' (sRGB) -> linear RGBA factors for pbrMetallicRoughness."""
+    text = str(color or DEFAULT_COLOR).lstrip("#")
+    if len(text) == 3:
+        text = "".join(c * 2 for c in text)
+    try:
+        srgb = np.array([int(text[i:i + 2], 16) for i in (0, 2, 4)], dtype=np.float64) / 255
+    except ValueError:
+        return _linear_rgba(DEFAULT_COLOR)
+    linear = np.where(srgb <= 0.04045, srgb / 12.92, ((srgb + 0.055) / 1.055) ** 2.4)
+    return [round(float(c), 5) for c in linear] + [1.0]
+
+
+def _pad(data, fill=b"\x00"):
+    return data + fill * (-len(data) % 4)
+
+
+def build_glb(layout):
+    """Return GLB bytes for a layout."""
+    canon, _ = normalize_layout(layout)
+    positions, normals, indices = _CUBE
+    blob = positions.tobytes() + normals.tobytes() + _pad(indices.tobytes())
+
+    gltf = {
+        "asset": {"version": "2.0", "generator": "ThesisDesignAgent gltf_export"},
+        "scene": 0,
+        "scenes": [{"name": canon["name"] or "layout", "nodes": []}],
+        "nodes": [],
+        "meshes": [],
+        "materials": [],
+        "buffers": [{"byteLength": len(blob)}],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": positions.nbytes, "target": 34962},
+            {"buffer": 0, "byteOffset": positions.nbytes, "byteLength": normals.nbytes, "target": 34962},
+            {"buffer": 0, "byteOffset": positions.nbytes + normals.nbytes,
+             "byteLength": indices.nbytes, "target": 34963},
+        ],
+        "accessors": [
+            {"bufferView": 0, "componentType": 5126, "count": len(positions), "type": "VEC3",
+             "min": positions.min(axis=0).tolist(), "max": positions.max(axis=0).tolist()},
+            {"bufferView": 1, "componentType": 5126, "count": len(normals), "type": "VEC3"},
+            {"bufferView": 2, "componentType": 5123, "count": len(indices), "type": "SCALAR"},
+        ],
+    }
+
+    mesh_for_color = {}
+    for node in canon["nodes"]:
+        if not node["center"] or not node["width"]:
+            continue
+        color = (node["color"] or DEFAULT_COLOR).lower()
+        mesh = mesh_for_color.get(color)
+        if mesh is None:
+            mesh = len(gltf["meshes"])
+            mesh_for_color[color] = mesh
+            gltf["materials"].append({
+                "name": color,
+                "pbrMetallicRoughness": {"baseColorFactor": _linear_rgba(color),
+                                         "metallicFactor": 0.0, "roughnessFactor": 0.9},
+            })
+            gltf["meshes"].append({"primitives": [{
+                "attributes": {"POSITION": 0, "NORMAL": 1}, "indices": 2, "material": mesh,
+            }]})
+        height = node["height"] or DEFAULT_ROOM_HEIGHT
+        gltf["scenes"][0]["nodes"].append(len(gltf["nodes"]))
+        gltf["nodes"].append({
+            "name": node["id"],
+            "mesh": mesh,
+            "translation": [node["center"][0], (node["floor"] - 1) * FLOOR_HEIGHT, node["center"][1]],
+            "scale": [node["width"][0], height, node["width"][1]],
+            "extras": {"type": node["type"], "floor": node["floor"]},
+        })
+
+    json_chunk = _pad(json.dumps(gltf, separators=(",", ":")).encode("utf-8"), b" ")
+    total = 12 + 8 + len(json_chunk) + 8 + len(blob)
+    return b"".join([
+        struct.pack("<III", GLB_MAGIC, 2, total),
+        struct.pack("<II", len(json_chunk), JSON_CHUNK), json_chunk,
+        struct.pack("<II", len(blob), BIN_CHUNK), blob,
+    ])
+
+
+def get_glb(layout):
+    """Return (glb_bytes, content_hash), memoized by layout content hash."""
+    key = layout_hash(layout)
+    with _CACHE_LOCK:
+        if key in _CACHE:
+            _CACHE.move_to_end(key)
+            return _CACHE[key], key
+    data = build_glb(layout)
+    with _CACHE_LOCK:
+        _CACHE[key] = data
+        if len(_CACHE) > CACHE_SIZE:
+            _CACHE.popitem(last=False)
+    return data, key
+
+
+def iter_chunks(data, size=64 * 1024):
+    """Yield `data` in fixed-size pieces for streamed responses."""
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
@@ -0,0 +1,220 @@
+"""
+graph_metrics.py - Circulation metrics for layout graphs
+
+Computes depth from the entrance, mean depth / integration (space syntax),
+betweenness centrality, connected components and degree distribution.
+Results are memoized by layout content hash; `batch_metrics` spreads a
+corpus over a process pool.
+"""
+
+from collections import OrderedDict, deque, Counter
+from concurrent.futures import ProcessPoolExecutor
+import threading
+
+from utils.layout import unwrap_layout, edge_endpoints, room_category, is_entry, layout_hash
+
+CACHE_SIZE = 2048
+_CACHE = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+
+def build_graph(layout):
+    """Return (nodes_by_id, adjacency) for any of the three edge encodings."""
+    data = unwrap_layout(layout) or {}
+    nodes = {n["id"]: n for n in data.get("nodes") or [] if isinstance(n, dict) and "id" in n}
+    adj = {node_id: set() for node_id in nodes}
+    for edge in data.get("edges") or []:
+        ends = edge_endpoints(edge)
+        if ends is None:
+            continue
+        a, b = ends
+        if a in adj and b in adj and a != b:
+            adj[a].add(b)
+            adj[b].add(a)
+    return nodes, adj
+
+
+def bfs_depths(adj, start):
+    """Shortest step depth from `start` to every reachable node."""
+    depths = {start: 0}
+    queue = deque([start])
+    while queue:
+        u = queue.popleft()
+        for v in adj[u]:
+            if v not in depths:
+                depths[v] = depths[u] + 1
+                queue.append(v)
+    return depths
+
+
+def connected_components(adj):
+    """List of components (sorted lists of ids), largest first."""
+    seen = set()
+    components = []
+    for node_id in adj:
+        if node_id in seen:
+            continue
+        component = bfs_depths(adj, node_id)
+        seen.update(component)
+        components.append(sorted(component))
+    components.sort(key=len, reverse=True)
+    return components
+
+
+def betweenness(adj):
+    """Brandes betweenness centrality for an unweighted, undirected graph (normalized)."""
+    score = dict.fromkeys(adj, 0.0)
+    for s in adj:
+        stack = []
+        preds = {v: [] for v in adj}
+        sigma = dict.fromkeys(adj, 0)
+        sigma[s] = 1
+        dist = {s: 0}
+        queue = deque([s])
+        while queue:
+            v = queue.popleft()
+            stack.append(v)
+            for w in adj[v]:
+                if w not in dist:
+                    dist[w] = dist[v] + 1
+                    queue.append(w)
+                if dist[w] == dist[v] + 1:
+                    sigma[w] += sigma[v]
+                    preds[w].append(v)
+        delta = dict.fromkeys(adj, 0.0)
+        while stack:
+            w = stack.pop()
+            for v in preds[w]:
+                delta[v] += sigma[v] / sigma[w] * (1 + delta[w])
+            if w != s:
+                score[w] += delta[w]
+    n = len(adj)
+    # undirected: each pair counted twice; normalize to [0, 1]
+    scale = 1.0 / ((n - 1) * (n - 2)) if n > 2 else 0.0
+    return {v: round(c * scale, 4) for v, c in score.items()}
+
+
+def integration(adj):
+    """
+    Mean depth and integration (1 / relative asymmetry) per node, computed
+    within each node's connected component.
+    """
+    mean_depth = {}
+    integ = {}
+    for node_id in adj:
+        depths = bfs_depths(adj, node_id)
+        k = len(depths)
+        if k < 2:
+            mean_depth[node_id] = 0.0
+            integ[node_id] = 0.0
+            continue
+        md = sum(depths.values()) / (k - 1)
+        mean_depth[node_id] = round(md, 4)
+        ra = 2 * (md - 1) / (k - 2) if k > 2 else 0.0
+        integ[node_id] = round(1 / ra, 4) if ra > 0 else 0.0
+    return mean_depth, integ
+
+
+def find_entry(nodes, adj):
+    """Pick the entrance node, falling back to the best-connected room."""
+    for node_id, node in nodes.items():
+        if is_entry(node):
+            return node_id
+    if not adj:
+        return None
+    return max(adj, key=lambda n: len(adj[n]))
+
+
+def compute_metrics(layout, entry=None):
+    """
+    Compute circulation metrics for a single layout.
+
+    Args:
+        layout: layout dict (any edge encoding, optionally wrapped in "graph")
+        entry: optional id of the entrance node
+
+    Returns:
+        dict of graph-level and per-node metrics
+    """
+    nodes, adj = build_graph(layout)
+    entry = entry if entry in adj else find_entry(nodes, adj)
+    depth = bfs_depths(adj, entry) if entry is not None else {}
+    mean_depth, integ = integration(adj)
+    components = connected_components(adj)
+    degrees = {n: len(v) for n, v in adj.items()}
+
+    # GRAPH_SYSTEM_PROMPT: bedrooms connect via halls, not to public spaces
+    categories = {n: room_category(node) for n, node in nodes.items()}
+    private_to_public = sorted(
+        [a, b] for a in adj for b in adj[a]
+        if a < b and {categories[a], categories[b]} == {"private", "public"}
+    )
+
+    return {
+        "entry": entry,
+        "node_count": len(adj),
+        "edge_count": sum(degrees.values()) // 2,
+        "depth_from_entry": depth,
+        "max_depth": max(depth.values()) if depth else 0,
+        "mean_depth_from_entry": round(sum(depth.values()) / max(len(depth) - 1, 1), 4) if depth else 0.0,
+        "unreachable_from_entry": sorted(set(adj) - set(depth)),
+        "mean_depth": mean_depth,
+        "integration": integ,
+        "betweenness": betweenness(adj),
+        "components": components,
+        "connected": len(components) <= 1,
+        "degree": degrees,
+        "degree_distribution": dict(sorted(Counter(degrees.values()).items())),
+        "private_to_public_links": private_to_public,
+    }
+
+
+def get_metrics(layout, entry=None):
+    """Memoized `compute_metrics`, keyed by layout content hash."""
+    key = (layout_hash(layout), entry)
+    with _CACHE_LOCK:
+        if key in _CACHE:
+            _CACHE.move_to_end(key)
+            return _CACHE[key]
+    result = compute_metrics(layout, entry)
+    with _CACHE_LOCK:
+        _CACHE[key] = result
+        if len(_CACHE) > CACHE_SIZE:
+            _CACHE.popitem(last=False)
+    return result
+
+
+def batch_metrics(layouts, workers=None, chunksize=16):
+    """
+    Metrics for many layouts. Cached results are reused; the rest are
+    computed across a process pool and added to the cache.
+
+    Returns:
+        list of metric dicts in the same order as `layouts`
+    """
+    layouts = list(layouts)
+    keys = [(layout_hash(layout), None) for layout in layouts]
+    results = [None] * len(layouts)
+    missing = []
+    with _CACHE_LOCK:
+        for i, key in enumerate(keys):
+            if key in _CACHE:
+                results[i] = _CACHE[key]
+            else:
+                missing.append(i)
+
+    if len(missing) == 1 or workers == 1:
+        computed = [compute_metrics(layouts[i]) for i in missing]
+    elif missing:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            computed = list(pool.map(compute_metrics, [layouts[i] for i in missing], chunksize=chunksize))
+    else:
+        computed = []
+
+    with _CACHE_LOCK:
+        for i, result in zip(missing, computed):
+            results[i] = result
+            _CACHE[keys[i]] = result
+        while len(_CACHE) > CACHE_SIZE:
+            _CACHE.popitem(last=False)
+    return results
@@ -0,0 +1,318 @@
+"""
+jobs.py - Asynchronous jobs for long-running generations
+
+    POST   /jobs             {"kind": "chat", "params": {...}} -> 202 {"id", "status", ...}
+    GET    /jobs/<id>        status, partial results and (when done) the result
+    GET    /jobs/<id>?rev=N  long-poll: wait up to `wait` seconds for a newer revision
+    DELETE /jobs/<id>        cancel
+
+Submitting returns at once; the work runs on a small bounded executor, so
+request threads are never held for the length of a generation. Handlers
+are plain functions `handler(params, job)` that may report partial
+results with `job.progress(...)` and should check `job.cancelled` between
+steps (an upstream call that already started is allowed to finish).
+
+Jobs live in the SQLite database next to the conversation history, so any
+worker can answer a poll or a cancel for a job another worker runs.
+Finished jobs are kept for JOB_TTL_SECONDS. A job whose process died
+stays in its last state until it expires.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.context_data import DB_PATH
+from utils.logs import fields, get_logger
+from utils.metrics import inc, observe
+
+JOB_WORKERS = 2
+MAX_PENDING = 32  # queued + running per process
+JOB_TTL_SECONDS = 3600
+MAX_RUNTIME_SECONDS = 1800  # unfinished jobs expire after this plus the TTL
+MAX_WAIT_SECONDS = 30.0
+POLL_INTERVAL = 0.5  # long-poll recheck for jobs run by other workers
+PURGE_INTERVAL = 60.0
+BUSY_TIMEOUT_SECONDS = 10.0
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+log = get_logger("jobs")
+
+
+class QueueFull(Exception):
+    """Too many pending jobs in this process."""
+
+
+class JobStore:
+    """SQLite-backed job records (one row per job, `rev` bumped on every write)."""
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self.local = threading.local()
+        conn = self._conn()
+        conn.execute('''CREATE TABLE IF NOT EXISTS jobs
+                        (id TEXT PRIMARY KEY,
+                         kind TEXT,
+                         status TEXT,
+                         params TEXT,
+                         partial TEXT,
+                         result TEXT,
+                         error TEXT,
+                         cancel INTEGER DEFAULT 0,
+                         rev INTEGER,
+                         created REAL,
+                         updated REAL,
+                         expires REAL)''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_expires ON jobs (expires)')
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_SECONDS)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+        return conn
+
+    def create(self, kind, params):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute('''INSERT INTO jobs (id, kind, status, params, partial, rev, created, updated, expires)
+                            VALUES (?, ?, ?, ?, '{}', 1, ?, ?, ?)''',
+                         (job_id, kind, QUEUED, json.dumps(params), now, now,
+                          now + MAX_RUNTIME_SECONDS + JOB_TTL_SECONDS))
+        return job_id
+
+    def update(self, job_id, **values):
+        """Set columns (partial/result are JSON-encoded); finished jobs get their TTL."""
+        for name in ("partial", "result"):
+            if name in values:
+                values[name] = json.dumps(values[name])
+        now = time.time()
+        values["updated"] = now
+        if values.get("status") in FINISHED:
+            values["expires"] = now + JOB_TTL_SECONDS
+        columns = ", ".join(f"{name} = ?" for name in values)
+        with self._conn() as conn:
+            conn.execute(f'UPDATE jobs SET {columns}, rev = rev + 1 WHERE id = ?', (*values.values(), job_id))
+
+    def get(self, job_id):
+        row = self._conn().execute('''SELECT id, kind, status, partial, result, error, cancel, rev,
+                                             created, updated, expires
+                                      FROM jobs WHERE id = ? AND expires > ?''',
+                                   (job_id, time.time())).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0], "kind": row[1], "status": row[2],
+            "partial": json.loads(row[3] or "{}"),
+            "result": json.loads(row[4]) if row[4] is not None else None,
+            "error": row[5], "cancel_requested": bool(row[6]), "rev": row[7],
+            "created": row[8], "updated": row[9], "expires": row[10],
+        }
+
+    def rev(self, job_id):
+        row = self._conn().execute('SELECT rev FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def cancel_requested(self, job_id):
+        row = self._conn().execute('SELECT cancel FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def request_cancel(self, job_id):
+        """Flag a job for cancellation; a queued job is cancelled at once. Returns False if unknown."""
+        now = time.time()
+        with self._conn() as conn:
+            cur = conn.execute('''UPDATE jobs SET cancel = 1, rev = rev + 1, updated = ?,
+                                  status = CASE WHEN status = ? THEN ? ELSE status END,
+                                  expires = CASE WHEN status = ? THEN ? ELSE expires END
+                                  WHERE id = ? AND expires > ?''',
+                               (now, QUEUED, CANCELLED, QUEUED, now + JOB_TTL_SECONDS, job_id, now))
+        return cur.rowcount > 0
+
+    def purge(self):
+        with self._conn() as conn:
+            return conn.execute('DELETE FROM jobs WHERE expires <= ?', (time.time(),)).rowcount
+
+
+class Job:
+    """Handle passed to a running handler."""
+
+    def __init__(self, runner, job_id):
+        self.runner = runner
+        self.id = job_id
+        self.partial = {}
+        self.checked = 0.0
+        self._cancelled = False
+
+    def progress(self, **partial):
+        """Merge fields into the job's partial results (visible to pollers)."""
+        self.partial.update(partial)
+        self.runner.store.update(self.id, partial=self.partial)
+        self.runner.notify()
+
+    @property
+    def cancelled(self):
+        # the flag may be set by another worker; re-read it at most every POLL_INTERVAL
+        if not self._cancelled and time.monotonic() - self.checked >= POLL_INTERVAL:
+            self.checked = time.monotonic()
+            self._cancelled = self.runner.store.cancel_requested(self.id)
+        return self._cancelled
+
+
+class Cancelled(Exception):
+    """Raised by handlers (or check()) to stop a cancelled job."""
+
+
+def check(job):
+    """Raise Cancelled if `job` (may be None) was cancelled."""
+    if job is not None and job.cancelled:
+        raise Cancelled()
+
+
+class JobRunner:
+    """Runs submitted jobs on a bounded executor and records their state."""
+
+    def __init__(self, handlers, store=None, workers=JOB_WORKERS, max_pending=MAX_PENDING):
+        """handlers: {kind: callable(params, job) -> JSON-serialisable result}"""
+        self.handlers = handlers
+        self.store = store or JobStore()
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pool = None
+        self.pending = 0
+        self.cond = threading.Condition()
+        self.purged = 0.0
+
+    def notify(self):
+        with self.cond:
+            self.cond.notify_all()
+
+    def submit(self, kind, params):
+        """Queue a job; returns its id. Raises KeyError (unknown kind) or QueueFull."""
+        if kind not in self.handlers:
+            raise KeyError(kind)
+        with self.cond:
+            if self.pending >= self.max_pending:
+                inc("jobs_total", kind=kind, status="rejected")
+                raise QueueFull()
+            self.pending += 1
+            if self.pool is None:
+                self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        if time.monotonic() - self.purged > PURGE_INTERVAL:
+            self.purged = time.monotonic()
+            self.store.purge()
+        job_id = self.store.create(kind, params)
+        self.pool.submit(self._run, job_id, kind, params, time.monotonic())
+        log.info("job queued", extra=fields(job_id=job_id, kind=kind))
+        return job_id
+
+    def _run(self, job_id, kind, params, queued_at):
+        job = Job(self, job_id)
+        start = time.monotonic()
+        observe("stage_duration_seconds", start - queued_at, stage="job_queue", mode="", model="")
+        try:
+            if job.cancelled:
+                raise Cancelled()
+            self.store.update(job_id, status=RUNNING)
+            self.notify()
+            result = self.handlers[kind](params, job)
+            job.checked = 0.0  # re-read the flag: a late cancel discards the result
+            check(job)
+            self.store.update(job_id, status=DONE, result=result)
+            status = DONE
+        except Cancelled:
+            self.store.update(job_id, status=CANCELLED)
+            status = CANCELLED
+        except Exception as e:
+            log.exception("job failed", extra=fields(job_id=job_id, kind=kind))
+            self.store.update(job_id, status=FAILED, error=str(e))
+            status = FAILED
+        finally:
+            with self.cond:
+                self.pending -= 1
+                self.cond.notify_all()
+        inc("jobs_total", kind=kind, status=status)
+        observe("stage_duration_seconds", time.monotonic() - start, stage="job_run", mode="", model=kind)
+
+    def get(self, job_id, rev=None, wait=0.0):
+        """
+        Current job record. With `rev`, wait up to `wait` seconds for a newer one.
+
+        Returns:
+            the record, or None if unknown or expired
+        """
+        deadline = time.monotonic() + min(max(wait, 0.0), MAX_WAIT_SECONDS)
+        while True:
+            current = self.store.rev(job_id)
+            if current is None or rev is None or current > rev:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            with self.cond:
+                self.cond.wait(min(remaining, POLL_INTERVAL))
+        return self.store.get(job_id)
+
+    def cancel(self, job_id):
+        found = self.store.request_cancel(job_id)
+        self.notify()
+        return found
+
+
+def register(bp, runner, admit=None):
+    """
+    Add the /jobs routes to a Flask app or blueprint.
+
+    admit: optional view decorator for submissions (e.g. utils.admission.admit)
+    """
+    from flask import jsonify, request
+
+    def submit():
+        data = request.get_json(force=True, silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "expected a JSON object"}), 400
+        kind = data.get("kind")
+        params = data.get("params")
+        if not isinstance(params, dict):
+            return jsonify({"error": "params must be an object"}), 400
+        try:
+            job_id = runner.submit(kind, params)
+        except KeyError:
+            return jsonify({"error": f"unknown job kind: {kind}", "kinds": sorted(runner.handlers)}), 400
+        except QueueFull:
+            resp = jsonify({"error": "Too many pending jobs"})
+            resp.status_code = 503
+            resp.headers["Retry-After"] = "5"
+            return resp
+        resp = jsonify({"id": job_id, "status": QUEUED, "url": f"{request.script_root}/jobs/{job_id}"})
+        resp.status_code = 202
+        resp.headers["Location"] = f"{request.script_root}/jobs/{job_id}"
+        return resp
+
+    if admit is not None:
+        submit = admit(submit)
+    bp.add_url_rule("/jobs", "submit_job", submit, methods=["POST"])
+
+    @bp.get("/jobs/<job_id>")
+    def get_job(job_id):
+        rev = request.args.get("rev", type=int)
+        job = runner.get(job_id, rev, request.args.get("wait", MAX_WAIT_SECONDS if rev is not None else 0, type=float))
+        if job is None:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(job)
+
+    @bp.delete("/jobs/<job_id>")
+    def cancel_job(job_id):
+        if not runner.cancel(job_id):
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(runner.store.get(job_id))
+
+    return bp
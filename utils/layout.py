@@ -0,0 +1,126 @@
+"""
+layout.py - Shared helpers for reading house layouts
+
+A layout is a dict with "nodes" (rooms) and "edges" (adjacencies). It may
+arrive wrapped as {"graph": {...}} (GRAPH_SYSTEM_PROMPT) and its edges may be
+{"source", "target"}, {"from", "to"} or plain [a, b] pairs.
+"""
+
+import hashlib
+import json
+import re
+
+DEFAULT_ROOM_SIZE = 4.0
+DEFAULT_ROOM_HEIGHT = 3.0
+
+# Entry/entrance as a word of the type/id ("MainEntrance", "front_entry"),
+# so "central_hall" or "centre" don't count.
+ENTRY_PATTERN = re.compile(r"\bentr(?:y|yway|ance|ies|ances)\b")
+
+# Keyword -> category, checked in order against the lower-cased node type/id
+# (entrances are circulation, see is_entry). Room words come first; owner
+# words (master, child, guest) only decide when no room word matches, so
+# "master_bath" is service and "guest_living" public.
+# Categories follow GRAPH_SYSTEM_PROMPT: circulation, public, private, service.
+ROOM_CATEGORIES = [
+    ("hall", "circulation"), ("corridor", "circulation"),
+    ("stair", "circulation"), ("circulation", "circulation"), ("lobby", "circulation"),
+    ("bed", "private"), ("sleep", "private"), ("secondroom", "private"), ("private", "private"),
+    ("bath", "service"), ("wc", "service"), ("toilet", "service"), ("laundry", "service"),
+    ("storage", "service"), ("kitchen", "service"), ("utility", "service"), ("service", "service"),
+    ("living", "public"), ("dining", "public"), ("study", "public"), ("studio", "public"),
+    ("common", "public"), ("courtyard", "public"), ("balcony", "public"), ("public", "public"),
+    ("master", "private"), ("child", "private"), ("guest", "private"),
+]
+
+
+def unwrap_layout(data):
+    """Return the dict holding nodes/edges, unwrapping {"graph": {...}}."""
+    if isinstance(data, dict) and "nodes" not in data and isinstance(data.get("graph"), dict):
+        return data["graph"]
+    return data
+
+
+def edge_endpoints(edge):
+    """Return (a, b) node ids for any edge encoding, or None if unreadable."""
+    if isinstance(edge, dict):
+        a = edge.get("source", edge.get("from"))
+        b = edge.get("target", edge.get("to"))
+    elif isinstance(edge, (list, tuple)) and len(edge) >= 2:
+        a, b = edge[0], edge[1]
+    else:
+        return None
+    if a is None or b is None:
+        return None
+    return a, b
+
+
+def node_dims(node, default=DEFAULT_ROOM_SIZE):
+    """
+    Raw (width, depth) of a room with the gallery's precedence
+    (gallery/builders.js):
+        width = width[0] ?? width ?? w ?? size[0] ?? default
+        depth = width[1] ?? depth ?? size[1] ?? default
+    Values are returned as found; callers convert them.
+    """
+    width, size = node.get("width"), node.get("size")
+    width_pair = width if isinstance(width, (list, tuple)) and len(width) >= 2 else (None, None)
+    size_pair = size if isinstance(size, (list, tuple)) and len(size) >= 2 else (None, None)
+    scalar = None if isinstance(width, (list, tuple)) else width
+    w = next((v for v in (width_pair[0], scalar, node.get("w"), size_pair[0]) if v is not None), default)
+    d = next((v for v in (width_pair[1], node.get("depth"), size_pair[1]) if v is not None), default)
+    return w, d
+
+
+def node_rect(node):
+    """
+    Return (xmin, ymin, xmax, ymax) of a room footprint, or None when the
+    node has no numeric center (e.g. symbolic location/size only).
+    """
+    center = node.get("center")
+    if not isinstance(center, (list, tuple)) or len(center) < 2:
+        return None
+    w, d = node_dims(node)
+    try:
+        cx, cy, w, d = float(center[0]), float(center[1]), float(w), float(d)
+    except (TypeError, ValueError):
+        return None
+    return (cx - w / 2, cy - d / 2, cx + w / 2, cy + d / 2)
+
+
+def node_floor(node):
+    """Return the floor index of a node (defaults to 1)."""
+    try:
+        return int(node.get("floor", 1))
+    except (TypeError, ValueError):
+        return 1
+
+
+def room_category(node):
+    """Map a node to circulation/public/private/service (None if unknown)."""
+    if is_entry(node):
+        return "circulation"
+    text = f"{node.get('type', '')} {node.get('id', '')}".lower().replace("_", "").replace(" ", "")
+    for keyword, category in ROOM_CATEGORIES:
+        if keyword in text:
+            return category
+    return None
+
+
+def _words(value):
+    """Lower-cased words of a type/id: "MainEntrance_2" -> "main entrance 2"."""
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", str(value or ""))
+    return re.sub(r"[^a-z0-9]+", " ", text.lower())
+
+
+def is_entry(node):
+    """True for entrance/entry nodes."""
+    if node.get("type") == "Entrance":
+        return True
+    return any(ENTRY_PATTERN.search(_words(node.get(key))) for key in ("type", "id"))
+
+
+def layout_hash(layout):
+    """Stable content hash of a layout (key order and whitespace ignored)."""
+    blob = json.dumps(layout, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
@@ -0,0 +1,177 @@
+"""
+layout_diff.py - Structural diffs between successive layouts of a project
+
+Nodes are matched by id; edges are compared as unordered pairs in any
+encoding, and an edge whose attributes changed (e.g. its type) is sent
+again. The other fields next to nodes/edges (site_area, floors, name, ...)
+are diffed as well, and a new node or edge order is sent when it differs.
+A diff carries the hash of the layout it applies to (`base_hash`) and of
+the result (`hash`), so a receiver that missed an update can detect it and
+ask for a full resync. LayoutTracker only hands out diffs that reproduce
+the new layout exactly; anything else is sent in full.
+"""
+
+import copy
+import threading
+
+from utils.layout import unwrap_layout, edge_endpoints, layout_hash
+
+STRUCTURE = ("nodes", "edges")
+
+
+def _edge_key(edge):
+    ends = edge_endpoints(edge)
+    if ends is None:
+        return None
+    a, b = str(ends[0]), str(ends[1])
+    return (a, b) if a <= b else (b, a)
+
+
+def _edges(layout):
+    data = unwrap_layout(layout) or {}
+    out = {}
+    for edge in data.get("edges") or []:
+        key = _edge_key(edge)
+        if key is not None:
+            out[key] = edge
+    return out
+
+
+def _nodes(layout):
+    data = unwrap_layout(layout) or {}
+    return {n["id"]: n for n in data.get("nodes") or [] if isinstance(n, dict) and "id" in n}
+
+
+def _fields(layout):
+    data = unwrap_layout(layout)
+    if not isinstance(data, dict):
+        return {}
+    return {k: v for k, v in data.items() if k not in STRUCTURE}
+
+
+def _changes(before, after):
+    """{field: new value (None if removed)} for fields that differ."""
+    return {k: after.get(k) for k in before.keys() | after.keys() if before.get(k) != after.get(k)}
+
+
+def diff_layouts(old, new):
+    """
+    Structural diff from `old` to `new`.
+
+    Returns:
+        {
+          "base_hash", "hash",
+          "fields": {field: new_value (None if removed)},  # besides nodes/edges
+          "added": [node, ...],
+          "removed": [node_id, ...],
+          "changed": {node_id: {field: new_value (None if removed)}},
+          "edges_added": [edge, ...],
+          "edges_removed": [[a, b], ...],
+          "edges_changed": [edge, ...],  # same endpoints, other attributes
+          "order": [node_id, ...],       # only if the node order changed
+          "edge_order": [[a, b], ...]    # only if the edge order changed
+        }
+    """
+    old_nodes, new_nodes = _nodes(old), _nodes(new)
+    changed = {}
+    for node_id in old_nodes.keys() & new_nodes.keys():
+        fields = _changes(old_nodes[node_id], new_nodes[node_id])
+        if fields:
+            changed[node_id] = fields
+
+    old_edges, new_edges = _edges(old), _edges(new)
+    diff = {
+        "base_hash": layout_hash(old),
+        "hash": layout_hash(new),
+        "fields": _changes(_fields(old), _fields(new)),
+        "added": [new_nodes[n] for n in new_nodes if n not in old_nodes],
+        "removed": [n for n in old_nodes if n not in new_nodes],
+        "changed": changed,
+        "edges_added": [new_edges[k] for k in new_edges if k not in old_edges],
+        "edges_removed": [list(k) for k in old_edges if k not in new_edges],
+        "edges_changed": [new_edges[k] for k in new_edges if k in old_edges and old_edges[k] != new_edges[k]],
+    }
+    # apply_diff keeps surviving items in place and appends new ones
+    order = list(new_nodes)
+    if [n for n in old_nodes if n in new_nodes] + [n for n in new_nodes if n not in old_nodes] != order:
+        diff["order"] = order
+    edge_order = list(new_edges)
+    if [k for k in old_edges if k in new_edges] + [k for k in new_edges if k not in old_edges] != edge_order:
+        diff["edge_order"] = [list(k) for k in edge_order]
+    return diff
+
+
+def is_empty(diff):
+    """True if the diff changes nothing."""
+    return diff["base_hash"] == diff["hash"]
+
+
+def apply_diff(layout, diff):
+    """Apply a diff to a layout (returns a new layout)."""
+    result = copy.deepcopy(layout)
+    data = unwrap_layout(result)
+    for field, value in diff.get("fields", {}).items():
+        if value is None:
+            data.pop(field, None)
+        else:
+            data[field] = copy.deepcopy(value)
+    removed = set(diff["removed"])
+    nodes = []
+    for node in data.get("nodes") or []:
+        if node.get("id") in removed:
+            continue
+        for field, value in diff["changed"].get(node.get("id"), {}).items():
+            if value is None:
+                node.pop(field, None)
+            else:
+                node[field] = value
+        nodes.append(node)
+    data["nodes"] = nodes + copy.deepcopy(diff["added"])
+    dropped = {tuple(k) for k in diff["edges_removed"]}
+    replaced = {_edge_key(e): e for e in diff.get("edges_changed", [])}
+    data["edges"] = [copy.deepcopy(replaced.get(_edge_key(e), e)) for e in data.get("edges") or []
+                     if _edge_key(e) not in dropped]
+    data["edges"] += copy.deepcopy(diff["edges_added"])
+    if "order" in diff:
+        rank = {node_id: i for i, node_id in enumerate(diff["order"])}
+        data["nodes"].sort(key=lambda n: rank.get(n.get("id"), len(rank)))
+    if "edge_order" in diff:
+        rank = {tuple(k): i for i, k in enumerate(diff["edge_order"])}
+        data["edges"].sort(key=lambda e: rank.get(_edge_key(e), len(rank)))
+    return result
+
+
+class LayoutTracker:
+    """Latest layout per project, producing full or diff updates."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.layouts = {}
+
+    def update(self, project, layout):
+        """
+        Record a new layout for `project`.
+
+        Returns:
+            {"kind": "diff", "diff": {...}} when a diff from the previous
+            layout reproduces `layout` exactly, otherwise (first layout of a
+            project, other wrapping, unmatched nodes) {"kind": "full",
+            "layout", "hash"}
+        """
+        with self.lock:
+            previous = self.layouts.get(project)
+            self.layouts[project] = layout
+        if previous is not None and isinstance(unwrap_layout(previous), dict) \
+                and isinstance(unwrap_layout(layout), dict):
+            diff = diff_layouts(previous, layout)
+            if layout_hash(apply_diff(previous, diff)) == diff["hash"]:
+                return {"kind": "diff", "diff": diff}
+        return {"kind": "full", "layout": layout, "hash": layout_hash(layout)}
+
+    def full(self, project):
+        """Current layout of a project for a full resync (or None)."""
+        with self.lock:
+            layout = self.layouts.get(project)
+        if layout is None:
+            return None
+        return {"kind": "full", "layout": layout, "hash": layout_hash(layout)}
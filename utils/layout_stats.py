@@ -0,0 +1,216 @@
+"""
+layout_stats.py - Area, footprint and program statistics per floor
+
+Layouts are flattened into a columnar table (one NumPy array per field,
+one row per room) so a whole corpus is aggregated in one vectorized pass.
+
+CLI:
+    python -m utils.layout_stats grasshopperFiles/jsons --format csv -o stats.csv
+    python -m utils.layout_stats a.json b.json --format parquet -o stats.parquet
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.layout import layout_hash, room_category
+from utils.schema import normalize_layout
+
+CATEGORIES = ("circulation", "public", "private", "service", "other")
+WET_KEYWORDS = ("bath", "wc", "toilet", "kitchen", "laundry", "shower", "utility")
+
+STAT_COLUMNS = [
+    "layout", "floor", "rooms", "gross_area", "site_area", "site_ratio",
+    *[f"area_{c}" for c in CATEGORIES],
+    "wet_rooms", "wet_spread",
+]
+
+CACHE_SIZE = 4096
+_CACHE = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+
+def to_columns(layouts):
+    """
+    Flatten layouts into columns. Rooms without numeric geometry get area 0.
+
+    Returns:
+        dict of equal-length arrays: layout, floor, cx, cy, area, category,
+        wet, plus "types" (list of type strings) and "site" (site area per layout)
+    """
+    layout_idx, floors, cx, cy, area, cat, wet, types = [], [], [], [], [], [], [], []
+    site = []
+    for i, layout in enumerate(layouts):
+        canon, _ = normalize_layout(layout)
+        s = canon["site_area"]
+        site.append(s["width"] * s["height"] if s else np.nan)
+        for node in canon["nodes"]:
+            center, width = node["center"], node["width"]
+            kind = (node["type"] or "unknown").lower()
+            layout_idx.append(i)
+            floors.append(node["floor"])
+            cx.append(center[0] if center else np.nan)
+            cy.append(center[1] if center else np.nan)
+            area.append(width[0] * width[1] if width else 0.0)
+            category = room_category(node) or "other"
+            cat.append(CATEGORIES.index(category))
+            wet.append(any(k in kind or k in node["id"].lower() for k in WET_KEYWORDS))
+            types.append(kind)
+    return {
+        "layout": np.array(layout_idx, dtype=np.int64),
+        "floor": np.array(floors, dtype=np.int64),
+        "cx": np.array(cx, dtype=np.float64),
+        "cy": np.array(cy, dtype=np.float64),
+        "area": np.array(area, dtype=np.float64),
+        "category": np.array(cat, dtype=np.int64),
+        "wet": np.array(wet, dtype=bool),
+        "types": types,
+        "site": np.array(site, dtype=np.float64),
+    }
+
+
+def compute_stats(layouts, names=None):
+    """
+    Per-floor statistics for a list of layouts.
+
+    Returns:
+        list of row dicts (keys: STAT_COLUMNS plus "area_by_type")
+    """
+    layouts = list(layouts)
+    names = names or [l.get("name") or l.get("id") or str(i) for i, l in enumerate(layouts)]
+    cols = to_columns(layouts)
+    if not len(cols["layout"]):
+        return []
+
+    # one group per (layout, floor)
+    keys = np.stack([cols["layout"], cols["floor"]], axis=1)
+    groups, group_of = np.unique(keys, axis=0, return_inverse=True)
+    group_of = group_of.ravel()
+    n = len(groups)
+
+    rooms = np.bincount(group_of, minlength=n)
+    gross = np.bincount(group_of, weights=cols["area"], minlength=n)
+    by_cat = np.zeros((n, len(CATEGORIES)))
+    np.add.at(by_cat, (group_of, cols["category"]), cols["area"])
+
+    # wet-room clustering: mean distance of wet rooms to their centroid
+    wet = cols["wet"] & ~np.isnan(cols["cx"])
+    wet_count = np.bincount(group_of[wet], minlength=n)
+    sx = np.bincount(group_of[wet], weights=cols["cx"][wet], minlength=n)
+    sy = np.bincount(group_of[wet], weights=cols["cy"][wet], minlength=n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mx, my = sx / wet_count, sy / wet_count
+        dist = np.hypot(cols["cx"][wet] - mx[group_of[wet]], cols["cy"][wet] - my[group_of[wet]])
+        spread = np.bincount(group_of[wet], weights=dist, minlength=n) / wet_count
+
+    site = cols["site"][groups[:, 0]]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = gross / site
+
+    by_type = [dict() for _ in range(n)]
+    for g, kind, a in zip(group_of, cols["types"], cols["area"]):
+        by_type[g][kind] = round(by_type[g].get(kind, 0.0) + a, 3)
+
+    rows = []
+    for g, (layout_i, floor) in enumerate(groups):
+        row = {
+            "layout": names[layout_i],
+            "floor": int(floor),
+            "rooms": int(rooms[g]),
+            "gross_area": round(float(gross[g]), 3),
+            "site_area": None if np.isnan(site[g]) else round(float(site[g]), 3),
+            "site_ratio": None if np.isnan(ratio[g]) else round(float(ratio[g]), 4),
+        }
+        for c, name in enumerate(CATEGORIES):
+            row[f"area_{name}"] = round(float(by_cat[g, c]), 3)
+        row["wet_rooms"] = int(wet_count[g])
+        row["wet_spread"] = None if wet_count[g] == 0 else round(float(spread[g]), 3)
+        row["area_by_type"] = by_type[g]
+        rows.append(row)
+    return rows
+
+
+def get_stats(layout, name=None):
+    """Cached per-floor statistics for one layout, keyed by content hash."""
+    key = layout_hash(layout)
+    with _CACHE_LOCK:
+        if key in _CACHE:
+            _CACHE.move_to_end(key)
+            rows = _CACHE[key]
+            return [dict(row, layout=name or row["layout"]) for row in rows]
+    rows = compute_stats([layout], [name] if name else None)
+    with _CACHE_LOCK:
+        _CACHE[key] = rows
+        if len(_CACHE) > CACHE_SIZE:
+            _CACHE.popitem(last=False)
+    return rows
+
+
+# ============================================================================
+# OUTPUT
+# ============================================================================
+
+def write_csv(rows, out):
+    """Write stat rows as CSV (area_by_type serialized as JSON)."""
+    writer = csv.DictWriter(out, fieldnames=STAT_COLUMNS + ["area_by_type"])
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(dict(row, area_by_type=json.dumps(row["area_by_type"])))
+
+
+def write_parquet(rows, path):
+    """Write stat rows as Parquet (needs pandas + pyarrow)."""
+    try:
+        import pandas as pd
+    except ImportError:
+        raise RuntimeError("Parquet output needs pandas and pyarrow: pip install pandas pyarrow")
+    frame = pd.DataFrame([dict(r, area_by_type=json.dumps(r["area_by_type"])) for r in rows])
+    frame.to_parquet(path, index=False)
+
+
+def load_layout_files(paths):
+    """Yield (name, layout) for JSON files and directories of JSON files."""
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".json"))
+        else:
+            files = [path]
+        for file in files:
+            with open(file, encoding="utf-8") as f:
+                yield os.path.splitext(os.path.basename(file))[0], json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-floor area and program statistics")
+    parser.add_argument("paths", nargs="+", help="layout JSON files or directories")
+    parser.add_argument("--format", choices=["csv", "parquet", "json"], default="csv")
+    parser.add_argument("-o", "--output", help="output file (default: stdout; required for parquet)")
+    args = parser.parse_args(argv)
+
+    loaded = list(load_layout_files(args.paths))
+    rows = compute_stats([l for _, l in loaded], [n for n, _ in loaded])
+
+    if args.format == "parquet":
+        if not args.output:
+            parser.error("--output is required for parquet")
+        write_parquet(rows, args.output)
+        return
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        if args.format == "csv":
+            write_csv(rows, out)
+        else:
+            json.dump(rows, out, indent=2)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+layout_store.py - Stored layouts shared by all server workers
+
+Layouts live in a SQLite table next to the conversation history, so every
+worker process and thread sees the same set. Each write bumps a store-wide
+revision; per-process derived state (similarity index, gallery manifest)
+calls changed_since() to pick up writes made by other workers.
+Content-addressed caches (metrics, thumbnails, GLB) need no syncing.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+from utils.context_data import DB_PATH
+
+BUSY_TIMEOUT_SECONDS = 10.0
+
+
+class LayoutStore:
+    """Dict-like, process-safe store of layouts keyed by layout id."""
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self.local = threading.local()
+        conn = self._conn()
+        conn.execute('''CREATE TABLE IF NOT EXISTS layouts
+                        (seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                         id TEXT UNIQUE,
+                         data TEXT,
+                         rev INTEGER,
+                         updated REAL)''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_layouts_rev ON layouts (rev)')
+        conn.commit()
+
+    def _conn(self):
+        """One connection per thread (sqlite3 connections aren't shareable)."""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_SECONDS)
+            conn.execute('PRAGMA journal_mode=WAL')  # readers don't block the writer
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+        return conn
+
+    def _next_rev(self, conn):
+        return conn.execute('SELECT COALESCE(MAX(rev), 0) + 1 FROM layouts').fetchone()[0]
+
+    def add(self, user_id, layout):
+        """Store a new layout; returns its id (layout_<n>_<user_id>)."""
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            rev = self._next_rev(conn)
+            cur = conn.execute('INSERT INTO layouts (data, rev, updated) VALUES (?, ?, ?)',
+                               ('{}', rev, time.time()))
+            layout_id = f"layout_{cur.lastrowid - 1}_{user_id}"
+            layout['id'] = layout_id
+            conn.execute('UPDATE layouts SET id = ?, data = ? WHERE seq = ?',
+                         (layout_id, json.dumps(layout), cur.lastrowid))
+        return layout_id
+
+    def get(self, layout_id, default=None):
+        row = self._conn().execute('SELECT data FROM layouts WHERE id = ?', (layout_id,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def __getitem__(self, layout_id):
+        layout = self.get(layout_id)
+        if layout is None:
+            raise KeyError(layout_id)
+        return layout
+
+    def __setitem__(self, layout_id, layout):
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('''INSERT INTO layouts (id, data, rev, updated) VALUES (?, ?, ?, ?)
+                            ON CONFLICT(id) DO UPDATE SET
+                            data = excluded.data, rev = excluded.rev, updated = excluded.updated''',
+                         (layout_id, json.dumps(layout), self._next_rev(conn), time.time()))
+
+    def update(self, layout_id, change):
+        """
+        Read-modify-write one layout in a single BEGIN IMMEDIATE transaction,
+        so concurrent updates from any worker apply one after the other
+        instead of overwriting each other.
+
+        change: callable(layout) -> layout to store, or None to store nothing
+
+        Returns:
+            the stored layout, or None if there is no such layout or change
+            returned None
+        """
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT data FROM layouts WHERE id = ?', (layout_id,)).fetchone()
+            layout = change(json.loads(row[0])) if row else None
+            if layout is not None:
+                conn.execute('UPDATE layouts SET data = ?, rev = ?, updated = ? WHERE id = ?',
+                             (json.dumps(layout), self._next_rev(conn), time.time(), layout_id))
+        return layout
+
+    def __contains__(self, layout_id):
+        return self._conn().execute('SELECT 1 FROM layouts WHERE id = ?', (layout_id,)).fetchone() is not None
+
+    def __len__(self):
+        return self._conn().execute('SELECT COUNT(*) FROM layouts').fetchone()[0]
+
+    def keys(self):
+        return [r[0] for r in self._conn().execute('SELECT id FROM layouts ORDER BY seq')]
+
+    def items(self):
+        return [(r[0], json.loads(r[1])) for r in self._conn().execute('SELECT id, data FROM layouts ORDER BY seq')]
+
+    def values(self):
+        return [layout for _, layout in self.items()]
+
+    def changed_since(self, rev):
+        """
+        Layouts written after revision `rev`.
+
+        Returns:
+            (items, latest_rev) with items as [(layout_id, layout), ...]
+        """
+        rows = self._conn().execute('SELECT id, data, rev FROM layouts WHERE rev > ? ORDER BY rev',
+                                    (rev,)).fetchall()
+        if not rows:
+            return [], rev
+        return [(r[0], json.loads(r[1])) for r in rows], rows[-1][2]
+
+
+class StoreFollower:
+    """Feeds layouts written by any worker into per-process derived state."""
+
+    def __init__(self, store, *sinks):
+        """sinks: callables(layout_id, layout) applied to every new write."""
+        self.store = store
+        self.sinks = sinks
+        self.rev = 0
+        self.lock = threading.Lock()
+
+    def sync(self):
+        """Apply writes since the last sync; cheap when nothing changed."""
+        with self.lock:
+            items, self.rev = self.store.changed_since(self.rev)
+            for layout_id, layout in items:
+                for sink in self.sinks:
+                    sink(layout_id, layout)
+            return len(items)
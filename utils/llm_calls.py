@@ -1,13 +1,41 @@
 from server.config import *
+from utils.metrics import span, record_tokens, observe, inc
+from utils.cancel import CancelToken, StreamCancelled
 import re
 import random
 import json
+import time
 
-def query_llm(message, system_prompt=None):
+
+def _mode_of(client):
+    """api_mode name of a configured client ("" if unknown)."""
+    return next((mode for mode, c in CLIENTS.items() if c is client), "")
+
+
+def _complete(client, model, **kwargs):
+    """chat.completions.create, timed as the "llm" stage with token metrics."""
+    mode = _mode_of(client)
+    start = time.perf_counter()
+    with span("llm", mode, model):
+        resp = client.chat.completions.create(model=model, **kwargs)
+    record_tokens(mode, model, getattr(resp, "usage", None), time.perf_counter() - start)
+    return resp
+
+def _strip_markdown(text):
+    """Remove stray markdown characters from a reply."""
+    out = text.strip()
+    for ch in ["```", "`", "*", "json"]:
+        out = out.replace(ch, "")
+    return out.strip()
+
+def query_llm(message, system_prompt=None, temperature=None, cancel=None):
     """
     Query the LLM with a given prompt.
     - message: the user’s question or content
     - system_prompt: optional override of the system‐level instruction
+    - temperature: optional sampling temperature (model default if None)
+    - cancel: optional CancelToken; the reply is then streamed so cancelling
+      stops the generation upstream (raises StreamCancelled)
     """
     # 1) Choose which system prompt to send
     default_system = """
@@ -37,9 +65,15 @@ def query_llm(message, system_prompt=None):
         """
     system_content = system_prompt.strip() if system_prompt else default_system.strip()
 
+    if cancel is not None:
+        return query_stream(client, completion_model, message, lambda piece: None,
+                            system_prompt=system_content, cancel=cancel, temperature=temperature)
+
     # 2) Call the API
-    response = client.chat.completions.create(
-        model=completion_model,
+    extra = {"temperature": temperature} if temperature is not None else {}
+    response = _complete(
+        client,
+        completion_model,
         messages=[
             {
                 "role": "system",
@@ -50,22 +84,20 @@ def query_llm(message, system_prompt=None):
                 "content": message,
             },
         ],
+        **extra,
     )
 
-    # 3) Clean up the output
-    result = response.choices[0].message.content.strip()
-    # remove stray markdown characters
-    for ch in ["```", "`", "*","json"]:
-        result = result.replace(ch, "")
-    return result.strip()
+    # 3) Clean up the output (remove stray markdown characters)
+    return _strip_markdown(response.choices[0].message.content)
 
 def classify_message(message):
     """
     Ask the LLM whether `message` is a graph‐request or not.
     Returns: dict with key 'is_graph_request' (boolean).
     """
-    response = client.chat.completions.create(
-        model=completion_model,
+    response = _complete(
+        client,
+        completion_model,
         messages=[
             { "role": "system",  "content": CLASSIFY_SYSTEM_PROMPT },
             { "role": "user",    "content": message }
@@ -168,16 +200,69 @@ def query(client, model, message, system_prompt=None, temperature=0.2):
     msgs = [{"role": "system", "content": system_content},
             {"role": "user", "content": message}]
 
-    resp = client.chat.completions.create(
-        model=model,
+    resp = _complete(
+        client,
+        model,
         messages=msgs,
         # temperature=temperature,
     )
 
-    out = resp.choices[0].message.content.strip()
-    for ch in ["```", "`", "*", "json"]:
-        out = out.replace(ch, "")
-    return out.strip()
+    with span("postprocess", _mode_of(client), model):
+        return _strip_markdown(resp.choices[0].message.content)
+
+
+def query_stream(client, model, message, on_chunk, system_prompt=None, cancel=None, temperature=None):
+    """
+    Like query(), but streams the reply: on_chunk(text) is called with each
+    piece as it arrives. Time to first token is recorded as llm_ttft_seconds.
+
+    cancel: optional CancelToken; cancelling closes the upstream stream (the
+    server stops generating) and raises StreamCancelled here
+    temperature: optional sampling temperature (model default if None)
+
+    Returns:
+        the full reply, cleaned up like query()
+    """
+    system_content = system_prompt or "Respond to the user query in a concise manner that answers the question directly."
+    msgs = [{"role": "system", "content": system_content},
+            {"role": "user", "content": message}]
+
+    mode = _mode_of(client)
+    parts = []
+    usage = None
+    start = time.perf_counter()
+    with span("llm", mode, model):
+        if cancel is not None:
+            cancel.check()
+        extra = {"temperature": temperature} if temperature is not None else {}
+        stream = client.chat.completions.create(model=model, messages=msgs, stream=True, **extra)
+        unregister = cancel.on_cancel(stream.close) if cancel is not None else None
+        try:
+            for event in stream:
+                usage = getattr(event, "usage", None) or usage
+                if not event.choices:
+                    continue
+                piece = event.choices[0].delta.content
+                if not piece:
+                    continue
+                if not parts:
+                    observe("llm_ttft_seconds", time.perf_counter() - start, mode=mode, model=model)
+                parts.append(piece)
+                on_chunk(piece)
+        except Exception:
+            if cancel is None or not cancel.cancelled:
+                raise
+        finally:
+            if unregister is not None:
+                unregister()
+            stream.close()
+        if cancel is not None and cancel.cancelled:
+            inc("llm_cancelled_total", mode=mode, model=model)
+            raise StreamCancelled()
+    record_tokens(mode, model, usage, time.perf_counter() - start)
+
+    with span("postprocess", mode, model):
+        return _strip_markdown("".join(parts))
 
 
 def query_vlm(client, model,image_path, message, system_prompt=None, temperature=0.2):
@@ -215,13 +300,12 @@ def query_vlm(client, model,image_path, message, system_prompt=None, temperature
         },
     ]
 
-    resp = client.chat.completions.create(
-        model=model,
+    resp = _complete(
+        client,
+        model,
         messages=messages,
         temperature=temperature,
     )
 
-    out = resp.choices[0].message.content.strip()
-    for ch in ["```", "`", "*", "json"]:
-        out = out.replace(ch, "")
-    return out.strip()
\ No newline at end of file
+    with span("postprocess", _mode_of(client), model):
+        return _strip_markdown(resp.choices[0].message.content)
\ No newline at end of file
@@ -0,0 +1,185 @@
+"""
+logs.py - Structured, non-blocking logging
+
+Records are formatted as one JSON object per line and written by a
+background listener thread. Request threads only put the record on a
+bounded queue, and drop it (counted) if the queue is full, so request
+latency never waits on the terminal.
+
+Categories are child loggers of "house" (house.chat, house.llm, house.gh,
+...), each with its own level:
+
+    LOG_LEVEL=INFO LOG_LEVELS="chat=DEBUG,gh=WARNING"
+
+Prompts and responses are logged as sizes and hashes. LOG_PAYLOAD_SAMPLE
+(0..1, default 0) is the fraction of records that also include the full
+text. Within a Flask request every record carries the request id (taken
+from X-Request-ID or generated), and the id is echoed in the response.
+"""
+
+import atexit
+import contextvars
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+
+ROOT_LOGGER = "house"
+QUEUE_SIZE = 10000
+DEFAULT_LEVEL = "INFO"
+PAYLOAD_SAMPLE_RATE = float(os.environ.get("LOG_PAYLOAD_SAMPLE", "0") or 0)
+HASH_LENGTH = 12
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+_listener = None
+
+
+def get_logger(category):
+    """Logger for one category, e.g. get_logger("chat")."""
+    return logging.getLogger(f"{ROOT_LOGGER}.{category}")
+
+
+def payload(text, sample_rate=None):
+    """
+    Loggable summary of a large payload: size and hash, plus the text itself
+    for a sampled fraction of records.
+    """
+    if text is None:
+        return None
+    data = text if isinstance(text, bytes) else str(text).encode("utf-8", "replace")
+    out = {"bytes": len(data), "sha1": hashlib.sha1(data).hexdigest()[:HASH_LENGTH]}
+    rate = PAYLOAD_SAMPLE_RATE if sample_rate is None else sample_rate
+    if rate > 0 and random.random() < rate:
+        out["body"] = text if isinstance(text, str) else data.decode("utf-8", "replace")
+    return out
+
+
+def fields(**kwargs):
+    """`extra=` for structured fields: log.info("stored", extra=fields(id=x))."""
+    return {"fields": kwargs}
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record."""
+
+    def format(self, record):
+        out = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            out["request_id"] = request_id
+        out.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, default=str, ensure_ascii=False)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking or erroring when full."""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # capture the request id on the calling thread; the listener has none.
+        # Formatting is left to the listener (records stay in-process).
+        record.request_id = _request_id.get()
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _parse_levels(spec):
+    levels = {}
+    for part in (spec or "").split(","):
+        name, _, level = part.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(level=None, categories=None, stream=None, queue_size=QUEUE_SIZE):
+    """
+    Route the "house" loggers through a queue to a JSON stream handler.
+
+    Args:
+        level: default level (LOG_LEVEL env, else INFO)
+        categories: {category: level}, merged over LOG_LEVELS env
+        stream: output stream (stderr by default)
+
+    Safe to call more than once; later calls only update levels.
+    """
+    global _listener
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(level or os.environ.get("LOG_LEVEL", DEFAULT_LEVEL))
+    for name, lvl in {**_parse_levels(os.environ.get("LOG_LEVELS")), **(categories or {})}.items():
+        get_logger(name).setLevel(lvl)
+    if _listener is not None:
+        return root
+
+    q = queue.Queue(maxsize=queue_size)
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter())
+    handler = DroppingQueueHandler(q)
+    root.addHandler(handler)
+    root.propagate = False
+    _listener = logging.handlers.QueueListener(q, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return root
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def instrument(app):
+    """Request-id correlation and one access record per request."""
+    from flask import g, request
+
+    access = get_logger("http")
+
+    @app.before_request
+    def _start_request():
+        g.log_start = time.perf_counter()
+        _request_id.set(request.headers.get("X-Request-ID") or uuid.uuid4().hex[:16])
+
+    @app.after_request
+    def _finish_request(response):
+        request_id = _request_id.get()
+        if request_id:
+            response.headers["X-Request-ID"] = request_id
+        start = g.pop("log_start", None)
+        if start is not None and access.isEnabledFor(logging.INFO):
+            access.info("request", extra=fields(
+                method=request.method, path=request.path, status=response.status_code,
+                ms=round((time.perf_counter() - start) * 1000, 2),
+                bytes=response.calculate_content_length(),
+            ))
+        _request_id.set(None)
+        return response
+
+    return app
@@ -0,0 +1,296 @@
+"""
+metrics.py - Per-stage timing histograms with Prometheus text output
+
+    with span("context", mode=mode, model=model):
+        context = get_recent_context(project)
+
+Every span feeds `stage_duration_seconds{stage,mode,model}`. LLM calls also
+record token counts and tokens/second. `instrument(app)` adds GET /metrics
+and request timing to a Flask app, and optionally a per-request
+Server-Timing header listing the spans of that request.
+
+A span costs about a microsecond (one label lookup, two perf_counter calls
+and a locked bucket increment). Metrics are per process. When METRICS_DIR
+is set (serve.py does this for multi-worker gunicorn), each process writes
+a snapshot there every few seconds and /metrics merges them all.
+"""
+
+import contextvars
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                    0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 35, 50, 75, 100, 150, 200, 500, 1000)
+FLUSH_INTERVAL = 5.0
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HELP = {
+    "stage_duration_seconds": "Time spent per request stage",
+    "http_request_duration_seconds": "Request latency per endpoint",
+    "llm_tokens_total": "Tokens reported by the completion API",
+    "llm_tokens_per_second": "Completion tokens per second of generation",
+    "llm_ttft_seconds": "Time to the first streamed token",
+    "llm_cancelled_total": "Streamed completions stopped by the client",
+    "admission_rejected_total": "Requests answered 429 by admission control",
+    "trace_dropped_total": "Trace records dropped because the recorder queue was full",
+}
+
+_lock = threading.Lock()
+_histograms = {}  # (name, labels) -> Histogram
+_counters = {}  # (name, labels) -> [value]
+_timings = contextvars.ContextVar("server_timing", default=None)
+_flusher = None
+
+
+class Histogram:
+    """Fixed-bucket histogram (cumulative on output)."""
+
+    __slots__ = ("buckets", "counts", "sum", "lock")
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+def histogram(name, buckets=DURATION_BUCKETS, **labels):
+    """Get or create the histogram for a name and label set."""
+    key = (name, tuple(sorted(labels.items())))
+    hist = _histograms.get(key)
+    if hist is None:
+        with _lock:
+            hist = _histograms.setdefault(key, Histogram(buckets))
+        _start_flusher()
+    return hist
+
+
+def inc(name, value=1, **labels):
+    """Add to a counter."""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        cell = _counters.get(key)
+        if cell is None:
+            cell = _counters[key] = [0]
+        cell[0] += value
+
+
+def observe(name, value, buckets=DURATION_BUCKETS, **labels):
+    histogram(name, buckets, **labels).observe(value)
+
+
+class span:
+    """Time a block into stage_duration_seconds (and Server-Timing)."""
+
+    __slots__ = ("stage", "hist", "start")
+
+    def __init__(self, stage, mode="", model=""):
+        self.stage = stage
+        self.hist = histogram("stage_duration_seconds", stage=stage, mode=mode or "", model=model or "")
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.hist.observe(elapsed)
+        timings = _timings.get()
+        if timings is not None:
+            timings.append((self.stage, elapsed))
+        return False
+
+
+def record_tokens(mode, model, usage, seconds):
+    """Token counters and tokens/second from an OpenAI-style usage object."""
+    if usage is None:
+        return
+    completion = getattr(usage, "completion_tokens", None) or 0
+    prompt = getattr(usage, "prompt_tokens", None) or 0
+    inc("llm_tokens_total", prompt, mode=mode or "", model=model or "", kind="prompt")
+    inc("llm_tokens_total", completion, mode=mode or "", model=model or "", kind="completion")
+    if completion and seconds > 0:
+        observe("llm_tokens_per_second", completion / seconds, RATE_BUCKETS, mode=mode or "", model=model or "")
+
+
+# ============================================================================
+# EXPOSITION
+# ============================================================================
+
+def snapshot():
+    """Plain-data copy of this process's metrics."""
+    with _lock:
+        hists = list(_histograms.items())
+        counters = [(k, v[0]) for k, v in _counters.items()]
+    out = {"histograms": [], "counters": []}
+    for (name, labels), hist in hists:
+        with hist.lock:
+            out["histograms"].append({"name": name, "labels": labels, "buckets": list(hist.buckets),
+                                      "counts": list(hist.counts), "sum": hist.sum})
+    for (name, labels), value in counters:
+        out["counters"].append({"name": name, "labels": labels, "value": value})
+    return out
+
+
+def merge(snapshots):
+    """Sum snapshots from several processes."""
+    hists, counters = {}, {}
+    for snap in snapshots:
+        for h in snap["histograms"]:
+            key = (h["name"], tuple(map(tuple, h["labels"])))
+            if key not in hists:
+                hists[key] = dict(h, counts=list(h["counts"]))
+            else:
+                merged = hists[key]
+                merged["counts"] = [a + b for a, b in zip(merged["counts"], h["counts"])]
+                merged["sum"] += h["sum"]
+        for c in snap["counters"]:
+            key = (c["name"], tuple(map(tuple, c["labels"])))
+            counters[key] = counters.get(key, 0) + c["value"]
+    return {"histograms": list(hists.values()),
+            "counters": [{"name": k[0], "labels": k[1], "value": v} for k, v in counters.items()]}
+
+
+def _fmt_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    body = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                    for k, v in items)
+    return "{" + body + "}"
+
+
+def render(snap=None):
+    """Prometheus text exposition format."""
+    snap = snap or collect()
+    lines = []
+    by_name = {}
+    for h in snap["histograms"]:
+        by_name.setdefault(("histogram", h["name"]), []).append(h)
+    for c in snap["counters"]:
+        by_name.setdefault(("counter", c["name"]), []).append(c)
+    for (kind, name), series in sorted(by_name.items(), key=lambda item: item[0][1]):
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} {kind}")
+        for s in sorted(series, key=lambda s: tuple(map(tuple, s["labels"]))):
+            labels = [tuple(l) for l in s["labels"]]
+            if kind == "counter":
+                lines.append(f"{name}{_fmt_labels(labels)} {s['value']}")
+                continue
+            total = 0
+            for bound, count in zip(list(s["buckets"]) + ["+Inf"], s["counts"]):
+                total += count
+                lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', bound)])} {total}")
+            lines.append(f"{name}_sum{_fmt_labels(labels)} {s['sum']:.6f}")
+            lines.append(f"{name}_count{_fmt_labels(labels)} {total}")
+    return "\n".join(lines) + "\n"
+
+
+def _snapshot_path(directory):
+    return os.path.join(directory, f"metrics_{os.getpid()}.json")
+
+
+def flush(directory=None):
+    """Write this process's snapshot to METRICS_DIR (if set)."""
+    directory = directory or os.environ.get("METRICS_DIR")
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    path = _snapshot_path(directory)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f)
+    os.replace(path + ".tmp", path)
+
+
+def collect():
+    """This process's metrics, merged with other workers' when METRICS_DIR is set."""
+    directory = os.environ.get("METRICS_DIR")
+    if not directory:
+        return snapshot()
+    flush(directory)
+    snaps = []
+    for entry in os.scandir(directory):
+        if entry.name.startswith("metrics_") and entry.name.endswith(".json"):
+            try:
+                with open(entry.path, encoding="utf-8") as f:
+                    snaps.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return merge(snaps)
+
+
+def _start_flusher():
+    global _flusher
+    if _flusher is not None or not os.environ.get("METRICS_DIR"):
+        return
+    with _lock:
+        if _flusher is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(FLUSH_INTERVAL)
+                try:
+                    flush()
+                except OSError:
+                    pass
+
+        _flusher = threading.Thread(target=run, name="metrics-flush", daemon=True)
+        _flusher.start()
+
+
+# ============================================================================
+# FLASK
+# ============================================================================
+
+def server_timing_header(timings):
+    """Server-Timing value: stages merged by name, durations in ms."""
+    merged = {}
+    for stage, seconds in timings:
+        merged[stage] = merged.get(stage, 0.0) + seconds
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in merged.items())
+
+
+def instrument(app, server_timing=False):
+    """
+    Add GET /metrics and request timing to a Flask app.
+
+    server_timing: always send Server-Timing (otherwise only for requests
+    with ?timing=1 or an X-Server-Timing header)
+    """
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timing():
+        g.metrics_start = time.perf_counter()
+        _timings.set([])
+
+    @app.after_request
+    def _finish_timing(response):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        observe("http_request_duration_seconds", elapsed,
+                endpoint=request.endpoint or "unknown", method=request.method, status=str(response.status_code))
+        timings = _timings.get() or []
+        _timings.set(None)
+        if server_timing or request.args.get("timing") or "X-Server-Timing" in request.headers:
+            response.headers["Server-Timing"] = server_timing_header(timings + [("total", elapsed)])
+        return response
+
+    @app.get("/metrics")
+    def metrics():
+        return Response(render(), content_type=CONTENT_TYPE)
+
+    return app
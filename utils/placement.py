@@ -0,0 +1,329 @@
+"""
+placement.py - Turn symbolic layouts into room rectangles
+
+The query_llm schema gives each room only a compass `location` and a size
+class (XS..XL). The solver, for each floor on its own:
+  1. cuts a footprint sized for that floor's rooms into compass columns
+     (or rows) sized by the room area they hold, widening any that would
+     be too thin and keeping empty compass cells unbuilt,
+  2. tiles every column with its rooms in compass order using an ordered
+     strip treemap, so room areas are exact and rooms stay squarish,
+  3. refines the room order inside each compass cell with a seeded local
+     search that minimizes the gap between rooms joined by an edge and the
+     number of slivers (the cost is evaluated for all edges at once with
+     NumPy), and keeps columns or rows, whichever scores better.
+With a site_area the footprint takes the site's proportions and is
+squeezed along each axis to fit inside it; a floor whose rooms need more
+area than the site raises SiteTooSmall. Rooms tile their tracks without overlapping. North
+is +y, east is +x; the site spans (0, 0) to (width, height).
+"""
+
+import copy
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils.layout import unwrap_layout, edge_endpoints, node_floor, DEFAULT_ROOM_HEIGHT
+
+SIZE_AREAS = {"XS": 6.0, "S": 10.0, "M": 16.0, "L": 25.0, "XL": 36.0}
+DEFAULT_SIZE = "M"
+DEFAULT_LOCATION = "center"
+
+# compass zone -> (column, row); column 0 = west, row 0 = south
+ZONES = {
+    "southwest": (0, 0), "south": (1, 0), "southeast": (2, 0),
+    "west": (0, 1), "center": (1, 1), "east": (2, 1),
+    "northwest": (0, 2), "north": (1, 2), "northeast": (2, 2),
+}
+
+SEARCH_ITERATIONS = 300
+MIN_WALL = 0.9  # shared wall a door needs; less (or a corner) doesn't connect rooms
+SHORT_WALL_PENALTY = 0.5
+SLIVER_PENALTY = 1.0
+MAX_ASPECT = 3.0  # long side / short side of a room the plan should avoid
+EMPTY_TRACK = 0.15  # unbuilt share of a track per empty compass cell (of the floor per empty track)
+TOLERANCE = 1e-6
+
+
+class SiteTooSmall(ValueError):
+    """The rooms of a floor need more area than the site has."""
+
+
+def strips(areas, x, y, w, h):
+    """
+    Ordered strip treemap (Bederson et al.): tile rect (x, y, w, h) with
+    rectangles of the given areas in rows stacked bottom to top, filled
+    left to right, so the order of `areas` is kept along y. A row takes
+    items while that keeps its rectangles squarer. Areas are rescaled to
+    fill the rect exactly. Returns a list of (xmin, ymin, xmax, ymax).
+    """
+    total = sum(areas)
+    if not areas or total <= 0 or w <= 0 or h <= 0:
+        return [(x, y, x, y) for _ in areas]
+    scaled = [a * w * h / total for a in areas]
+
+    def worst(row):
+        s = sum(row)
+        return max(max(w * w * r / (s * s), s * s / (w * w * r)) for r in row)
+
+    rows, k = [], 0
+    while k < len(scaled):
+        row = [scaled[k]]
+        k += 1
+        while k < len(scaled) and worst(row + [scaled[k]]) <= worst(row):
+            row.append(scaled[k])
+            k += 1
+        rows.append(row)
+    # nothing follows the last row to widen it: join it to the one before if squarer
+    if len(rows) > 1 and worst(rows[-2] + rows[-1]) < worst(rows[-1]):
+        rows[-2:] = [rows[-2] + rows[-1]]
+    rects = []
+    for row in rows:
+        strip = sum(row) / w
+        cx = x
+        for r in row:
+            rects.append((cx, y, cx + r / strip, y + strip))
+            cx += r / strip
+        y += strip
+    return rects
+
+
+def _room_area(node):
+    return SIZE_AREAS.get(str(node.get("size") or DEFAULT_SIZE).upper(), SIZE_AREAS[DEFAULT_SIZE])
+
+
+def _zone(node):
+    return ZONES.get(str(node.get("location") or DEFAULT_LOCATION).lower(), ZONES[DEFAULT_LOCATION])
+
+
+def _edge_cost(rects, pairs):
+    """Total gap between connected rooms (vectorized over all edges)."""
+    if not len(pairs):
+        return 0.0
+    a, b = rects[pairs[:, 0]], rects[pairs[:, 1]]
+    dx = np.minimum(a[:, 2], b[:, 2]) - np.maximum(a[:, 0], b[:, 0])
+    dy = np.minimum(a[:, 3], b[:, 3]) - np.maximum(a[:, 1], b[:, 1])
+    gap = np.hypot(np.maximum(0, -dx), np.maximum(0, -dy))
+    touching = (np.abs(dx) <= TOLERANCE) | (np.abs(dy) <= TOLERANCE)
+    short = touching & (np.maximum(dx, dy) < MIN_WALL)
+    return float(gap.sum() + SHORT_WALL_PENALTY * short.sum())
+
+
+class _FloorPlan:
+    """
+    Compass-grid treemap of one floor.
+
+    The floor is cut into tracks (compass columns, or rows when transposed)
+    sized by the area they hold, at least 1/MAX_ASPECT of the floor's side
+    so a track never becomes a sliver. Each track is tiled with its rooms
+    in compass order by an ordered strip treemap, so a small "north" room
+    shares the top strip with its neighbours instead of spanning the track.
+    Compass rows/columns left empty keep EMPTY_TRACK of the track (or floor)
+    unbuilt, and so does the slack of a widened track, so a "north" room
+    stays north. The footprint is sized for the floor's own rooms; room
+    areas are exact.
+    """
+
+    def __init__(self, areas, zones, aspect=1.0, transpose=False):
+        self.areas = areas
+        self.transpose = transpose
+        # cells[(col, row)] = list of room indices in tiling order
+        self.cells = {}
+        for i, zone in enumerate(zones):
+            self.cells.setdefault(zone, []).append(i)
+        for members in self.cells.values():
+            members.sort(key=lambda i: -areas[i])
+        self.tracks, self.side, length = self._tracks(1 / aspect if transpose else aspect)
+        self.width, self.height = (self.side, length) if transpose else (length, self.side)
+
+    def _tracks(self, aspect):
+        """
+        Tracks along x in plan coordinates (x = column, y = row; swapped
+        when transposed): ([(x, width, items)], length of the tracks, total
+        width including empty tracks), items being (cell key, or None for
+        unbuilt space, area) in tiling order.
+        """
+        def axes(key):
+            return (key[1], key[0]) if self.transpose else key
+
+        cell_area = {key: sum(self.areas[i] for i in m) for key, m in self.cells.items()}
+        majors = {axes(key)[0] for key in self.cells}
+        minors = {axes(key)[1] for key in self.cells}
+        total = sum(self.areas)
+        tracks = []  # (items or None for an empty track, area)
+        for major in range(3):
+            if major not in majors:
+                if len(majors) > 1:
+                    tracks.append((None, EMPTY_TRACK * total))
+                continue
+            used = {axes(key)[1]: key for key in self.cells if axes(key)[0] == major}
+            empty = [m for m in range(3) if m not in used and len(minors) > 1]
+            area = sum(cell_area[key] for key in used.values()) / (1 - EMPTY_TRACK * len(empty))
+            items = [[used.get(m), cell_area[used[m]] if m in used else EMPTY_TRACK * area]
+                     for m in range(3) if m in used or m in empty]
+            tracks.append((items, area))
+
+        side = (sum(area for _, area in tracks) / aspect) ** 0.5
+        placed, x = [], 0.0
+        for items, area in tracks:
+            width = area / side
+            if items is not None:
+                if width < side / MAX_ASPECT:
+                    # widen it, leaving the slack unbuilt in its empty compass
+                    # cells, else just short of a cell at the far end
+                    slack = (side / MAX_ASPECT - width) * side
+                    width = side / MAX_ASPECT
+                    voids = [item for item in items if item[0] is None]
+                    if not voids:
+                        voids = [[None, 0.0]]
+                        far_end = len(items) > 1 and axes(items[-1][0])[1] == 2
+                        items.insert(len(items) - far_end, voids[0])
+                    for item in voids:
+                        item[1] += slack / len(voids)
+                placed.append((x, width, [tuple(item) for item in items]))
+            x += width
+        return placed, side, x
+
+    def place(self, out, cell=None):
+        """Write room rects into `out` (n, 4) for one cell or all cells."""
+        for x, width, items in self.tracks:
+            if cell is not None and all(key != cell for key, _ in items):
+                continue
+            rooms, areas = [], []
+            for key, area in items:
+                if key is None:
+                    rooms.append(None)
+                    areas.append(area)
+                else:
+                    rooms += self.cells[key]
+                    areas += [self.areas[i] for i in self.cells[key]]
+            for i, (x0, y0, x1, y1) in zip(rooms, strips(areas, x, 0.0, width, self.side)):
+                if i is not None:
+                    out[i] = (y0, x0, y1, x1) if self.transpose else (x0, y0, x1, y1)
+
+
+def _aspects(rects):
+    w, h = rects[:, 2] - rects[:, 0], rects[:, 3] - rects[:, 1]
+    return np.maximum(w, h) / np.maximum(np.minimum(w, h), TOLERANCE)
+
+
+def _cost(rects, pairs):
+    """Edge gaps plus a penalty per room longer than MAX_ASPECT."""
+    return _edge_cost(rects, pairs) + SLIVER_PENALTY * float(np.sum(_aspects(rects) > MAX_ASPECT))
+
+
+def _search(plan, pairs, rng, iterations):
+    """
+    Local search: swap rooms within a cell if it shortens edge gaps or
+    removes a sliver.
+
+    Returns:
+        (rects, cost) of the best order found
+    """
+    rects = np.zeros((len(plan.areas), 4))
+    plan.place(rects)
+    swappable = [key for key, m in plan.cells.items() if len(m) > 1]
+    cost = _cost(rects, pairs)
+    for _ in range(iterations if swappable else 0):
+        key = rng.choice(swappable)
+        order = plan.cells[key]
+        i, j = rng.sample(range(len(order)), 2)
+        order[i], order[j] = order[j], order[i]
+        trial = rects.copy()
+        plan.place(trial, key)
+        trial_cost = _cost(trial, pairs)
+        if trial_cost < cost:
+            rects, cost = trial, trial_cost
+            if cost == 0:
+                break
+        else:
+            order[i], order[j] = order[j], order[i]
+    return rects, cost
+
+
+def solve_layout(layout, seed=0, iterations=SEARCH_ITERATIONS):
+    """
+    Place rooms of a symbolic layout.
+
+    Returns:
+        a copy of the layout with numeric center/width/height on every node
+        and site_area set to the footprint (if it was missing)
+
+    Raises:
+        SiteTooSmall if a floor's rooms need more area than site_area
+    """
+    result = copy.deepcopy(layout)
+    data = unwrap_layout(result)
+    nodes = [n for n in data.get("nodes") or [] if isinstance(n, dict) and "id" in n]
+    if not nodes:
+        return result
+    index = {n["id"]: i for i, n in enumerate(nodes)}
+    areas = [_room_area(n) for n in nodes]
+    floors = [node_floor(n) for n in nodes]
+
+    # each floor gets its own grid, sized for its own rooms
+    site = result.get("site_area") or data.get("site_area")
+    aspect, bounds = 1.0, None
+    if isinstance(site, dict) and site.get("width") and site.get("height"):
+        bounds = float(site["width"]), float(site["height"])
+        aspect = bounds[0] / bounds[1]
+
+    pairs = []
+    for edge in data.get("edges") or []:
+        ends = edge_endpoints(edge)
+        if ends and ends[0] in index and ends[1] in index:
+            a, b = index[ends[0]], index[ends[1]]
+            if floors[a] == floors[b] and a != b:
+                pairs.append((a, b))
+    pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+
+    rects = np.zeros((len(nodes), 4))
+    rng = random.Random(seed)
+    width = height = 0.0
+    for floor in sorted(set(floors)):
+        members = [i for i, f in enumerate(floors) if f == floor]
+        if bounds is not None:
+            need = sum(areas[i] for i in members)
+            if need > bounds[0] * bounds[1] + TOLERANCE:
+                raise SiteTooSmall(f"floor {floor}: rooms need {need:g} m2, "
+                                   f"the site has {bounds[0] * bounds[1]:g} m2")
+        local = {i: k for k, i in enumerate(members)}
+        floor_pairs = np.array([(local[a], local[b]) for a, b in pairs if a in local],
+                               dtype=np.int64).reshape(-1, 2)
+        # tracks as compass columns or rows, whichever leaves fewer edge
+        # gaps and slivers
+        best = None
+        for transpose in (False, True):
+            plan = _FloorPlan([areas[i] for i in members], [_zone(nodes[i]) for i in members],
+                              aspect, transpose)
+            floor_rects, cost = _search(plan, floor_pairs, rng, iterations)
+            worst = float(np.max(_aspects(floor_rects)))
+            if best is None or (cost, worst) < best[0]:
+                best = ((cost, worst), plan, floor_rects)
+        _, plan, rects[members] = best
+        sx = sy = 1.0
+        if bounds is not None:
+            # widened tracks and unbuilt cells can overrun the site: squeeze
+            # the floor into it along each axis (the tiling and compass
+            # order survive, rooms get smaller)
+            sx, sy = min(1.0, bounds[0] / plan.width), min(1.0, bounds[1] / plan.height)
+            rects[members] *= (sx, sy, sx, sy)
+        width, height = max(width, plan.width * sx), max(height, plan.height * sy)
+
+    for node, (x0, y0, x1, y1) in zip(nodes, rects.tolist()):
+        node["center"] = [round((x0 + x1) / 2, 3), round((y0 + y1) / 2, 3)]
+        node["width"] = [round(x1 - x0, 3), round(y1 - y0, 3)]
+        node.setdefault("height", DEFAULT_ROOM_HEIGHT)
+    if not site:
+        result["site_area"] = {"width": round(width, 3), "height": round(height, 3)}
+    return result
+
+
+def solve_batch(layouts, workers=None, chunksize=8):
+    """Solve many layouts across a process pool (order preserved)."""
+    layouts = list(layouts)
+    if len(layouts) <= 1 or workers == 1:
+        return [solve_layout(layout) for layout in layouts]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(solve_layout, layouts, chunksize=chunksize))
@@ -0,0 +1,164 @@
+"""
+recorder.py - Opt-in traffic recorder for the Flask apps
+
+Each request is appended to a JSONL trace with its endpoint, method, path,
+query, JSON payload, model, timing, status and a hash of the response
+body, so bench.replay can re-issue real traffic against another build:
+
+    TRACE_DIR=traces python serve.py app
+    python -m bench.replay traces --target http://127.0.0.1:5000
+
+Recording is off unless TRACE_DIR (or the app config key of the same name)
+is set. Request threads only build a small dict and put it on a bounded
+queue (dropped and counted when full); a listener thread serializes it and
+writes it to traces/trace-<pid>.jsonl, rotated at TRACE_MAX_BYTES with
+TRACE_BACKUPS old files kept. One file per process, so gunicorn workers
+never share a file. Payloads over TRACE_MAX_PAYLOAD bytes are stored as a
+size and hash only and are skipped on replay. Streamed responses have no
+hash.
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+
+from utils.logs import DroppingQueueHandler, current_request_id
+from utils.metrics import inc
+
+TRACE_LOGGER = "trace"  # outside "house" so traces never reach the log stream
+TRACE_MAX_BYTES = 64 * 1024 * 1024
+TRACE_BACKUPS = 5
+TRACE_MAX_PAYLOAD = 256 * 1024
+QUEUE_SIZE = 10000
+SKIP_ENDPOINTS = {"metrics", "static", "serve_static", "index"}  # /metrics and static files/pages
+MODEL_KEYS = ("model_id", "model")
+RECORDED_HEADERS = ("Content-Type", "X-Priority")
+
+_listener = None
+_handler = None
+
+
+class TraceFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(record.trace, default=str, ensure_ascii=False)
+
+
+def body_hash(data):
+    """Short sha1 of a response/request body (bytes)."""
+    return hashlib.sha1(data).hexdigest()[:16]
+
+
+def start_recording(directory, max_bytes=TRACE_MAX_BYTES, backups=TRACE_BACKUPS, queue_size=QUEUE_SIZE):
+    """
+    Route trace records to a rotating JSONL file in `directory`.
+
+    Safe to call more than once (the first directory wins).
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return
+    os.makedirs(directory, exist_ok=True)
+    output = logging.handlers.RotatingFileHandler(
+        os.path.join(directory, f"trace-{os.getpid()}.jsonl"),
+        maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+    output.setFormatter(TraceFormatter())
+    _handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    logger = logging.getLogger(TRACE_LOGGER)
+    logger.setLevel(logging.INFO)
+    logger.addHandler(_handler)
+    logger.propagate = False
+    _listener = logging.handlers.QueueListener(_handler.queue, output)
+    _listener.start()
+    atexit.register(stop_recording)
+
+
+def stop_recording():
+    """Flush queued records and close the trace file."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def dropped():
+    """Records dropped because the queue was full."""
+    return _handler.dropped if _handler is not None else 0
+
+
+def _model(body):
+    if not isinstance(body, dict):
+        return None
+    for source in (body, body.get("params")):
+        if isinstance(source, dict):
+            for key in MODEL_KEYS:
+                if source.get(key):
+                    return source[key]
+    return None
+
+
+def instrument(app, directory=None):
+    """
+    Record every request of a Flask app when a trace directory is given
+    (argument, app.config["TRACE_DIR"] or the TRACE_DIR env var).
+    """
+    directory = directory or app.config.get("TRACE_DIR") or os.environ.get("TRACE_DIR")
+    if not directory:
+        return app
+    from flask import g, request
+
+    start_recording(directory)
+    logger = logging.getLogger(TRACE_LOGGER)
+
+    @app.before_request
+    def _start_trace():
+        # endpoints are matched without their blueprint prefix ("house.serve_static")
+        if (request.endpoint or "").rpartition(".")[2] not in SKIP_ENDPOINTS:
+            g.trace_start = (time.time(), time.perf_counter())
+
+    @app.after_request
+    def _record(response):
+        start = g.pop("trace_start", None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start[1]
+
+        raw = request.get_data(cache=True)
+        trace = {
+            "ts": round(start[0], 6),
+            "request_id": current_request_id(),
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "query": request.query_string.decode("latin-1"),
+            "headers": {k: request.headers[k] for k in RECORDED_HEADERS if k in request.headers},
+            "status": response.status_code,
+            "ms": round(elapsed * 1000, 3),
+        }
+        if raw:
+            if len(raw) > TRACE_MAX_PAYLOAD:
+                trace["payload_truncated"] = {"bytes": len(raw), "sha1": body_hash(raw)}
+            else:
+                body = request.get_json(silent=True)
+                if body is not None:
+                    trace["payload"] = body
+                    trace["model"] = _model(body)
+                else:
+                    trace["body"] = raw.decode("utf-8", "replace")
+        if not response.is_streamed:
+            data = response.get_data()
+            trace["response"] = {"bytes": len(data), "sha1": body_hash(data)}
+
+        before = _handler.dropped
+        logger.info("request", extra={"trace": trace})
+        if _handler.dropped != before:
+            inc("trace_dropped_total")
+        return response
+
+    return app
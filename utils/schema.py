@@ -0,0 +1,268 @@
+"""
+schema.py - Normalize any layout dialect to one canonical form
+
+Dialects in circulation:
+  - query_llm:          source/target edges, symbolic location/size
+  - GRAPH_SYSTEM_PROMPT: {"graph": {...}} wrapper, from/to edges, x/y/z
+  - Grasshopper JSONs:  [a, b] edge lists, numeric center/width/height
+
+Canonical form:
+    {
+      "name": str | None,
+      "site_area": {"width": float, "height": float} | None,
+      "meta": {other top-level keys},
+      "nodes": [{"id", "label", "type", "floor", "center", "width",
+                 "height", "color", "location", "size", "features"}],
+      "edges": [{"source", "target", "type"}]
+    }
+
+The field table below is compiled once at import into per-field extractor
+functions, so normalizing is a single pass with no per-call schema work.
+"""
+
+import json
+import os
+import time
+
+from utils.layout import unwrap_layout, edge_endpoints, node_dims, DEFAULT_ROOM_HEIGHT
+
+VALID_LOCATIONS = frozenset([
+    "north", "northeast", "east", "southeast", "south",
+    "southwest", "west", "northwest", "center",
+])
+VALID_SIZES = frozenset(["XS", "S", "M", "L", "XL"])
+EDGE_TYPES = frozenset(["door", "open", "sliding_door"])
+
+TOP_LEVEL_KEYS = frozenset(["nodes", "edges", "graph", "name", "site_area"])
+
+
+class SchemaError(ValueError):
+    """Raised by `normalize_layout(strict=True)`; `.errors` holds the report."""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} schema error(s): " + "; ".join(
+            f"{e['path']}: {e['message']}" for e in errors[:5]))
+        self.errors = errors
+
+
+# ============================================================================
+# FIELD COERCERS
+# ============================================================================
+
+def _number(value):
+    if isinstance(value, bool):
+        raise ValueError("expected number")
+    return float(value)
+
+
+def _pair(value):
+    if isinstance(value, (list, tuple)):
+        if len(value) < 2:
+            raise ValueError("expected [x, y]")
+        return [_number(value[0]), _number(value[1])]
+    raise ValueError("expected [x, y]")
+
+
+def _text(value):
+    return str(value)
+
+
+def _floor(value):
+    return int(_number(value))
+
+
+def _location(value):
+    value = str(value).lower()
+    if value not in VALID_LOCATIONS:
+        raise ValueError(f"unknown location '{value}'")
+    return value
+
+
+def _size(value):
+    if isinstance(value, (list, tuple)):
+        return None  # numeric size is handled as width
+    value = str(value).upper()
+    if value not in VALID_SIZES:
+        raise ValueError(f"unknown size '{value}'")
+    return value
+
+
+# (canonical key, source aliases in priority order, coercer, default)
+NODE_FIELDS = [
+    ("label", ("label", "name"), _text, None),
+    ("type", ("type", "room_type"), _text, None),
+    ("floor", ("floor", "level"), _floor, 1),
+    ("height", ("height", "room_height"), _number, DEFAULT_ROOM_HEIGHT),
+    ("color", ("color", "colour"), _text, None),
+    ("location", ("location",), _location, None),
+    ("size", ("size",), _size, None),
+    ("features", ("features",), _text, None),
+]
+
+
+def _compile_field(key, aliases, coerce, default):
+    def extract(node, path, errors):
+        for alias in aliases:
+            value = node.get(alias)
+            if value is not None:
+                try:
+                    return coerce(value)
+                except (TypeError, ValueError) as e:
+                    errors.append({"path": f"{path}.{alias}", "message": str(e)})
+                    return default
+        return default
+    return key, extract
+
+
+_NODE_EXTRACTORS = [_compile_field(*field) for field in NODE_FIELDS]
+
+
+def _center(node, path, errors):
+    value = node.get("center")
+    if value is None and "x" in node and "y" in node:
+        value = (node["x"], node["y"])
+    if value is None:
+        return None
+    try:
+        return _pair(value)
+    except (TypeError, ValueError) as e:
+        errors.append({"path": f"{path}.center", "message": str(e)})
+        return None
+
+
+def _width(node, path, errors):
+    # utils.layout.node_dims, shared with node_rect and the gallery
+    value = node.get("width")
+    size = node.get("size")
+    if value is None and node.get("w") is None and node.get("depth") is None \
+            and not isinstance(size, (list, tuple)):
+        return None  # symbolic only
+    try:
+        if isinstance(value, (list, tuple)):
+            _pair(value)  # reports short lists
+        dims = [_number(v) for v in node_dims(node)]
+    except (TypeError, ValueError) as e:
+        errors.append({"path": f"{path}.width", "message": str(e)})
+        return None
+    if dims[0] <= 0 or dims[1] <= 0:
+        errors.append({"path": f"{path}.width", "message": "dimensions must be positive"})
+    return dims
+
+
+# ============================================================================
+# NORMALIZER
+# ============================================================================
+
+def normalize_layout(data, strict=False):
+    """
+    Convert any layout dialect to canonical form.
+
+    Args:
+        data: layout dict (or JSON string)
+        strict: raise SchemaError instead of returning errors
+
+    Returns:
+        (canonical_layout, errors) where errors is [{"path", "message"}]
+    """
+    errors = []
+    if isinstance(data, (str, bytes)):
+        try:
+            data = json.loads(data)
+        except ValueError as e:
+            errors.append({"path": "$", "message": f"invalid JSON: {e}"})
+            data = {}
+    if not isinstance(data, dict):
+        errors.append({"path": "$", "message": "expected object"})
+        data = {}
+
+    body = unwrap_layout(data)
+    prefix = "graph." if body is not data else ""
+
+    nodes = []
+    ids = set()
+    raw_nodes = body.get("nodes")
+    if not isinstance(raw_nodes, list):
+        errors.append({"path": f"{prefix}nodes", "message": "expected list"})
+        raw_nodes = []
+    for i, node in enumerate(raw_nodes):
+        path = f"{prefix}nodes[{i}]"
+        if not isinstance(node, dict):
+            errors.append({"path": path, "message": "expected object"})
+            continue
+        node_id = node.get("id")
+        if node_id is None:
+            errors.append({"path": f"{path}.id", "message": "missing id"})
+            continue
+        node_id = str(node_id)
+        if node_id in ids:
+            errors.append({"path": f"{path}.id", "message": f"duplicate id '{node_id}'"})
+            continue
+        ids.add(node_id)
+        out = {"id": node_id}
+        for key, extract in _NODE_EXTRACTORS:
+            out[key] = extract(node, path, errors)
+        out["center"] = _center(node, path, errors)
+        out["width"] = _width(node, path, errors)
+        nodes.append(out)
+
+    edges = []
+    raw_edges = body.get("edges")
+    if not isinstance(raw_edges, list):
+        errors.append({"path": f"{prefix}edges", "message": "expected list"})
+        raw_edges = []
+    for i, edge in enumerate(raw_edges):
+        path = f"{prefix}edges[{i}]"
+        ends = edge_endpoints(edge)
+        if ends is None:
+            errors.append({"path": path, "message": "expected {source, target}, {from, to} or [a, b]"})
+            continue
+        a, b = str(ends[0]), str(ends[1])
+        for end, name in ((a, "source"), (b, "target")):
+            if end not in ids:
+                errors.append({"path": f"{path}.{name}", "message": f"unknown node '{end}'"})
+        kind = edge.get("type") if isinstance(edge, dict) else (edge[2] if len(edge) > 2 else None)
+        if kind is not None and not isinstance(kind, str):
+            errors.append({"path": f"{path}.type", "message": "expected string"})
+            kind = None
+        elif kind is not None and kind not in EDGE_TYPES:
+            errors.append({"path": f"{path}.type", "message": f"unknown edge type '{kind}'"})
+        edges.append({"source": a, "target": b, "type": kind})
+
+    site = data.get("site_area") or body.get("site_area")
+    if site is not None:
+        try:
+            site = {"width": _number(site["width"]), "height": _number(site["height"])}
+        except (TypeError, ValueError, KeyError):
+            errors.append({"path": "site_area", "message": "expected {width, height}"})
+            site = None
+
+    canonical = {
+        "name": data.get("name"),
+        "site_area": site,
+        "meta": {k: v for k, v in data.items() if k not in TOP_LEVEL_KEYS},
+        "nodes": nodes,
+        "edges": edges,
+    }
+    if strict and errors:
+        raise SchemaError(errors)
+    return canonical, errors
+
+
+def benchmark(directory=os.path.join("grasshopperFiles", "jsons"), seconds=1.0):
+    """Normalize the sample layouts repeatedly and return layouts/second."""
+    samples = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".json"):
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                samples.append(json.load(f))
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for sample in samples:
+            normalize_layout(sample)
+        count += len(samples)
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    print(f"{benchmark():,.0f} layouts/s")
@@ -0,0 +1,287 @@
+"""
+similarity.py - "More like this" search over stored layouts
+
+Each layout is fingerprinted as:
+  - Weisfeiler-Lehman label histograms of the room-type adjacency graph,
+    feature-hashed into a fixed-size vector, plus an exact WL hash
+  - a small geometric descriptor (room count, areas, proportions)
+
+Vectors live in a NumPy matrix and are searched by cosine similarity.
+Below ANN_THRESHOLD rows the search is brute force; above it a
+random-hyperplane LSH shortlists candidates which are then re-ranked exactly.
+
+Writes only mark the index dirty; autosave() persists it at most every
+SAVE_INTERVAL seconds on a background thread (and at exit), so storing a
+layout never pays for rewriting the whole .npz.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from utils.layout import unwrap_layout, node_rect, node_floor, room_category
+from utils.graph_metrics import build_graph
+
+INDEX_PATH = 'layout_index.npz'
+WL_ITERATIONS = 3
+WL_DIM = 256
+GEO_WEIGHT = 0.5  # share of the vector norm given to geometry
+ANN_THRESHOLD = 20000
+LSH_TABLES = 8
+LSH_BITS = 12
+SAVE_INTERVAL = 30.0  # seconds between background saves of a dirty index
+
+CATEGORIES = ("circulation", "public", "private", "service")
+GEO_DIM = 6 + len(CATEGORIES)
+
+
+def _h(text, mod=None):
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return value % mod if mod else value
+
+
+def room_label(node):
+    """Coarse room label used as the initial WL colour."""
+    kind = str(node.get("type") or "").lower().replace(" ", "_")
+    return room_category(node) or kind or "room"
+
+
+def wl_fingerprint(layout, iterations=WL_ITERATIONS, dim=WL_DIM):
+    """
+    Return (wl_hash, histogram) for the room-type adjacency graph.
+    `histogram` is a float32 vector of hashed WL label counts over all
+    iterations; `wl_hash` is equal for WL-indistinguishable graphs.
+    """
+    nodes, adj = build_graph(layout)
+    labels = {n: room_label(node) for n, node in nodes.items()}
+    hist = np.zeros(dim, dtype=np.float32)
+    for label in labels.values():
+        hist[_h(label, dim)] += 1
+    for _ in range(iterations):
+        labels = {
+            n: str(_h(labels[n] + "|" + ",".join(sorted(labels[m] for m in adj[n]))))
+            for n in adj
+        }
+        for label in labels.values():
+            hist[_h(label, dim)] += 1
+    wl_hash = hashlib.sha1(",".join(sorted(labels.values())).encode("utf-8")).hexdigest()[:16]
+    return wl_hash, hist
+
+
+def geometric_descriptor(layout):
+    """Small vector of scale-free geometric features."""
+    data = unwrap_layout(layout) or {}
+    nodes = [n for n in data.get("nodes") or [] if isinstance(n, dict)]
+    rects = [node_rect(n) for n in nodes]
+    areas = np.array([(r[2] - r[0]) * (r[3] - r[1]) if r else 0.0 for r in rects], dtype=np.float32)
+    total = float(areas.sum()) or 1.0
+    share = [sum(a for a, n in zip(areas, nodes) if room_category(n) == c) / total for c in CATEGORIES]
+    placed = [r for r in rects if r]
+    if placed:
+        xs = [r[0] for r in placed] + [r[2] for r in placed]
+        ys = [r[1] for r in placed] + [r[3] for r in placed]
+        w, h = max(xs) - min(xs), max(ys) - min(ys)
+        aspect = min(w, h) / max(w, h) if max(w, h) > 0 else 1.0
+        coverage = float(areas.sum()) / (w * h) if w * h > 0 else 0.0
+    else:
+        aspect, coverage = 1.0, 0.0
+    n = len(nodes)
+    floors = len({node_floor(node) for node in nodes}) or 1
+    return np.array([
+        np.log1p(n) / 4,
+        np.log1p(float(areas.sum())) / 8,
+        float(areas.std() / areas.mean()) if n and areas.mean() > 0 else 0.0,
+        aspect,
+        min(coverage, 2.0) / 2,
+        floors / 4,
+        *share,
+    ], dtype=np.float32)
+
+
+def fingerprint(layout):
+    """Return (wl_hash, unit vector) for a layout."""
+    wl_hash, hist = wl_fingerprint(layout)
+    geo = geometric_descriptor(layout)
+    hist_norm = np.linalg.norm(hist)
+    geo_norm = np.linalg.norm(geo)
+    if hist_norm:
+        hist = hist / hist_norm * (1 - GEO_WEIGHT)
+    if geo_norm:
+        geo = geo / geo_norm * GEO_WEIGHT
+    vec = np.concatenate([hist, geo]).astype(np.float32)
+    norm = np.linalg.norm(vec)
+    return wl_hash, (vec / norm if norm else vec)
+
+
+class SimilarityIndex:
+    """Cosine-similarity index of layout fingerprints, persisted to .npz."""
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self.lock = threading.RLock()
+        self.ids = []
+        self.rows = {}
+        self.wl_hashes = []
+        self.matrix = np.zeros((0, WL_DIM + GEO_DIM), dtype=np.float32)
+        self.size = 0
+        self._lsh = None
+        self.dirty = False
+        self.saver = None
+        if path and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return self.size
+
+    def add(self, layout_id, layout):
+        """Insert or replace the fingerprint of `layout_id`."""
+        wl_hash, vec = fingerprint(layout)
+        with self.lock:
+            row = self.rows.get(layout_id)
+            if row is None:
+                if self.size == len(self.matrix):
+                    grown = np.zeros((max(64, 2 * self.size), self.matrix.shape[1]), dtype=np.float32)
+                    grown[:self.size] = self.matrix[:self.size]
+                    self.matrix = grown
+                row = self.size
+                self.size += 1
+                self.ids.append(layout_id)
+                self.wl_hashes.append(wl_hash)
+                self.rows[layout_id] = row
+                if self._lsh is not None:
+                    self._lsh_insert(row, vec)
+            else:
+                self.wl_hashes[row] = wl_hash
+                self._lsh = None  # rebuilt lazily
+            self.matrix[row] = vec
+            self.dirty = True
+
+    def query(self, layout_id=None, layout=None, k=10):
+        """
+        Return up to k [{"id", "score", "same_structure"}], most similar
+        first. Pass a stored `layout_id` or an unstored `layout`.
+        """
+        with self.lock:
+            if layout_id is not None and layout_id in self.rows:
+                row = self.rows[layout_id]
+                vec = self.matrix[row]
+                wl_hash = self.wl_hashes[row]
+            elif layout is not None:
+                wl_hash, vec = fingerprint(layout)
+                row = None
+            else:
+                raise KeyError(layout_id)
+
+            candidates = None
+            if self.size >= ANN_THRESHOLD:
+                candidates = self._lsh_candidates(vec)
+                if len(candidates) <= k:
+                    candidates = None
+            if candidates is None:
+                scores = self.matrix[:self.size] @ vec
+                rows = np.arange(self.size)
+            else:
+                rows = np.fromiter(candidates, dtype=np.int64)
+                scores = self.matrix[rows] @ vec
+            if row is not None:
+                scores = np.where(rows == row, -np.inf, scores)
+
+            top = min(k, len(rows))
+            if top <= 0:
+                return []
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            return [
+                {"id": self.ids[rows[i]], "score": round(float(scores[i]), 4),
+                 "same_structure": self.wl_hashes[rows[i]] == wl_hash}
+                for i in best if np.isfinite(scores[i])
+            ]
+
+    # ------------------------------------------------------------------
+    # LSH (only used above ANN_THRESHOLD)
+    # ------------------------------------------------------------------
+
+    def _lsh_keys(self, vecs):
+        bits = (np.einsum("tbd,nd->ntb", self._lsh["planes"], vecs) > 0)
+        return bits @ (1 << np.arange(LSH_BITS))
+
+    def _lsh_build(self):
+        rng = np.random.default_rng(0)
+        planes = rng.standard_normal((LSH_TABLES, LSH_BITS, self.matrix.shape[1])).astype(np.float32)
+        self._lsh = {"planes": planes, "buckets": [{} for _ in range(LSH_TABLES)]}
+        keys = self._lsh_keys(self.matrix[:self.size])
+        for row, row_keys in enumerate(keys):
+            for table, key in enumerate(row_keys):
+                self._lsh["buckets"][table].setdefault(int(key), []).append(row)
+
+    def _lsh_insert(self, row, vec):
+        for table, key in enumerate(self._lsh_keys(vec[None, :])[0]):
+            self._lsh["buckets"][table].setdefault(int(key), []).append(row)
+
+    def _lsh_candidates(self, vec):
+        if self._lsh is None:
+            self._lsh_build()
+        found = set()
+        for table, key in enumerate(self._lsh_keys(vec[None, :])[0]):
+            found.update(self._lsh["buckets"][table].get(int(key), ()))
+        return found
+
+    # ------------------------------------------------------------------
+    # PERSISTENCE
+    # ------------------------------------------------------------------
+
+    def save(self):
+        """Write the index next to the layout store (atomic replace)."""
+        with self.lock:
+            matrix = self.matrix[:self.size].copy()
+            meta = json.dumps({"ids": self.ids, "wl": self.wl_hashes})
+            self.dirty = False
+        # written outside the lock so queries and adds don't wait on the disk
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        try:
+            np.savez(tmp, matrix=matrix, meta=np.array(meta))
+            os.replace(tmp, self.path)
+        except Exception:
+            self.dirty = True
+            raise
+
+    def save_if_dirty(self):
+        if self.dirty and self.path:
+            self.save()
+
+    def autosave(self, interval=SAVE_INTERVAL):
+        """Save the index in the background while dirty, and once more at exit."""
+        if self.saver is not None:
+            return
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                try:
+                    self.save_if_dirty()
+                except OSError:
+                    pass  # retried on the next tick
+
+        def close():
+            stop.set()
+            self.save_if_dirty()
+
+        self.saver = threading.Thread(target=run, name="similarity-save", daemon=True)
+        self.saver.start()
+        atexit.register(close)
+
+    def load(self):
+        """Load a saved index from `self.path`."""
+        with self.lock, np.load(self.path) as saved:
+            meta = json.loads(str(saved["meta"]))
+            self.matrix = saved["matrix"].astype(np.float32)
+            self.ids = meta["ids"]
+            self.wl_hashes = meta["wl"]
+            self.size = len(self.ids)
+            self.rows = {layout_id: i for i, layout_id in enumerate(self.ids)}
+            self._lsh = None
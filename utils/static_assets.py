@@ -0,0 +1,293 @@
+"""
+static_assets.py - Fingerprinted, precompressed static files
+
+The build step copies every asset under STATIC_ROOTS into BUILD_DIR under
+a content-hashed name (js/chatUI.<hash>.js) together with .gz and .br
+variants. References are rewritten so pages load the hashed names: HTML
+src/href, JS relative imports (static and dynamic) and CSS url()/@import.
+Dependencies are hashed first, so a change in a module also changes the
+name of every module that imports it.
+
+Hashed URLs never change content and are served as immutable; original
+names and HTML pages are served with ETags and revalidated. The server
+picks brotli, gzip or identity from Accept-Encoding. Brotli variants need
+the optional `brotli` package.
+
+    python -m utils.static_assets          # build ahead of time
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_ROOTS = ("index.html", "js", "styles", "gallery", "galleryv2")
+BUILD_DIR = "static_build"
+MANIFEST_NAME = "manifest.json"
+SERVED_TYPES = {".js", ".mjs", ".css", ".html", ".svg", ".json", ".png", ".jpg", ".jpeg", ".webp", ".ico"}
+REWRITE_TYPES = {".js", ".mjs", ".css", ".html"}
+COMPRESS_TYPES = {".js", ".mjs", ".css", ".html", ".svg", ".json"}
+UNHASHED_TYPES = {".html"}  # pages keep their URLs
+MIN_COMPRESS_BYTES = 256
+HASH_LENGTH = 10
+CHECK_INTERVAL = 2.0  # seconds between source staleness checks
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+_JS_REF = re.compile(r"""((?:\bfrom|\bimport)\s*\(?\s*)(['"])(\.{1,2}/[^'"\n]+)(\2)""")
+_HTML_REF = re.compile(r"""(\b(?:src|href)\s*=\s*)(['"])([^'"]+)(\2)""", re.IGNORECASE)
+_CSS_REF = re.compile(r"""(url\(\s*|@import\s+)(['"]?)([^'")\s]+)(\2)""")
+_REF_PATTERNS = {".js": (_JS_REF,), ".mjs": (_JS_REF,), ".css": (_CSS_REF,),
+                 ".html": (_HTML_REF, _JS_REF)}  # inline <script type="module"> imports
+
+
+def content_hash(data):
+    return hashlib.sha1(data).hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(path, digest):
+    """js/app.js -> js/app.<digest>.js"""
+    root, ext = posixpath.splitext(path)
+    return f"{root}.{digest}{ext}"
+
+
+def discover(root=".", roots=STATIC_ROOTS):
+    """Served source files as {relative posix path: (mtime_ns, size)}."""
+    found = {}
+
+    def add(full):
+        rel = os.path.relpath(full, root).replace(os.sep, "/")
+        if os.path.splitext(rel)[1].lower() in SERVED_TYPES:
+            stat = os.stat(full)
+            found[rel] = (stat.st_mtime_ns, stat.st_size)
+
+    for name in roots:
+        full = os.path.join(root, name)
+        if os.path.isfile(full):
+            add(full)
+        for dirpath, dirnames, filenames in os.walk(full):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            for filename in filenames:
+                if not filename.startswith("."):
+                    add(os.path.join(dirpath, filename))
+    return found
+
+
+def compress(data):
+    """{encoding: bytes} for variants that are actually smaller."""
+    variants = {"gzip": gzip.compress(data, 9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(data, quality=11)
+    return {enc: body for enc, body in variants.items() if len(body) < len(data)}
+
+
+def choose_encoding(accept_encoding, available):
+    """Best of `available` (br before gzip) allowed by an Accept-Encoding header."""
+    allowed = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        allowed[name.strip().lower()] = q
+    for enc in ("br", "gzip"):
+        if enc in available and allowed.get(enc, allowed.get("*", 0.0)) > 0:
+            return enc
+    return None
+
+
+class _Builder:
+    """Hashes assets dependencies-first and rewrites references."""
+
+    def __init__(self, root, sources):
+        self.root = root
+        self.sources = sources
+        self.done = {}  # path -> (data, url, digest)
+        self.active = set()
+
+    def build(self, path):
+        if path in self.done:
+            return self.done[path]
+        self.active.add(path)
+        with open(os.path.join(self.root, path), "rb") as f:
+            data = f.read()
+        ext = posixpath.splitext(path)[1].lower()
+        if ext in REWRITE_TYPES:
+            text = data.decode("utf-8", "surrogateescape")
+            for pattern in _REF_PATTERNS[ext]:
+                text = pattern.sub(lambda m: self._rewrite(path, m), text)
+            data = text.encode("utf-8", "surrogateescape")
+        digest = content_hash(data)
+        url = path if ext in UNHASHED_TYPES else hashed_name(path, digest)
+        self.active.discard(path)
+        self.done[path] = (data, url, digest)
+        return self.done[path]
+
+    def _rewrite(self, path, match):
+        prefix, quote, ref, close = match.groups()
+        if "://" in ref or ref.startswith(("//", "data:", "#", "?")) or "?" in ref or "#" in ref:
+            return match.group(0)
+        if ref.startswith("/"):
+            target = posixpath.normpath(ref.lstrip("/"))
+        else:
+            target = posixpath.normpath(posixpath.join(posixpath.dirname(path), ref))
+        # cycles keep the plain name (still served, just revalidated)
+        if (target not in self.sources or target in self.active
+                or posixpath.splitext(target)[1].lower() in UNHASHED_TYPES):
+            return match.group(0)
+        _, url, _ = self.build(target)
+        new_ref = ref[:len(ref) - len(posixpath.basename(ref))] + posixpath.basename(url)
+        return f"{prefix}{quote}{new_ref}{close}"
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build_assets(root=".", out=BUILD_DIR, roots=STATIC_ROOTS):
+    """
+    Build hashed and precompressed copies of all static assets.
+
+    Returns:
+        the manifest: {"sources": {path: [mtime_ns, size]},
+                       "assets": {path: {"url", "etag", "type", "encodings"}}}
+    """
+    sources = discover(root, roots)
+    builder = _Builder(root, sources)
+    assets = {}
+    for path in sorted(sources):
+        data, url, digest = builder.build(path)
+        target = os.path.join(out, url)
+        encodings = []
+        if not os.path.exists(target) or url == path:  # hashed files are immutable
+            _write(target, data)
+        if posixpath.splitext(path)[1].lower() in COMPRESS_TYPES and len(data) >= MIN_COMPRESS_BYTES:
+            for enc, body in compress(data).items():
+                _write(target + ENCODING_SUFFIXES[enc], body)
+                encodings.append(enc)
+        assets[path] = {
+            "url": url,
+            "etag": digest,
+            "type": mimetypes.guess_type(path)[0] or "application/octet-stream",
+            "encodings": sorted(encodings),
+        }
+    manifest = {"sources": {p: list(v) for p, v in sources.items()}, "assets": assets}
+    _write(os.path.join(out, MANIFEST_NAME), json.dumps(manifest, indent=1).encode("utf-8"))
+    return manifest
+
+
+class StaticAssets:
+    """In-memory server for built assets; rebuilds when sources change."""
+
+    def __init__(self, root=".", build_dir=BUILD_DIR, roots=STATIC_ROOTS):
+        self.root = root
+        self.build_dir = build_dir
+        self.roots = roots
+        self.lock = threading.Lock()
+        self.routes = {}  # request path -> (asset, cache_control)
+        self.bodies = {}  # (url, encoding) -> bytes
+        self.sources = {}
+        self.checked = 0.0
+        self._load()
+
+    def _load(self):
+        manifest = None
+        path = os.path.join(self.build_dir, MANIFEST_NAME)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        current = discover(self.root, self.roots)
+        if manifest is None or manifest["sources"] != {p: list(v) for p, v in current.items()}:
+            manifest = build_assets(self.root, self.build_dir, self.roots)
+
+        routes, bodies = {}, {}
+        for source, asset in manifest["assets"].items():
+            url = asset["url"]
+            for enc in [None] + asset["encodings"]:
+                with open(os.path.join(self.build_dir, url) + ENCODING_SUFFIXES.get(enc, ""), "rb") as f:
+                    bodies[(url, enc)] = f.read()
+            routes[source] = (asset, REVALIDATE)
+            if url != source:
+                routes[url] = (asset, IMMUTABLE)
+        self.routes, self.bodies = routes, bodies
+        self.sources = manifest["sources"]
+        self.checked = time.monotonic()
+
+    def refresh(self):
+        """Rebuild if a source changed (checked at most every CHECK_INTERVAL)."""
+        with self.lock:
+            if time.monotonic() - self.checked < CHECK_INTERVAL:
+                return
+            self.checked = time.monotonic()
+            if discover(self.root, self.roots) != {p: tuple(v) for p, v in self.sources.items()}:
+                self._load()
+
+    def url(self, path):
+        """Hashed URL for a source path (the path itself if unknown)."""
+        route = self.routes.get(path)
+        return route[0]["url"] if route else path
+
+    def lookup(self, path, accept_encoding=""):
+        """
+        Find the best representation of `path`.
+
+        Returns:
+            (body, headers) or None if the path is not a static asset
+        """
+        self.refresh()
+        route = self.routes.get(path)
+        if route is None:
+            return None
+        asset, cache_control = route
+        enc = choose_encoding(accept_encoding, asset["encodings"])
+        body = self.bodies[(asset["url"], enc)]
+        headers = {
+            "Content-Type": asset["type"] + ("; charset=utf-8" if asset["type"].startswith("text/")
+                                             or asset["type"].endswith("javascript") else ""),
+            "Cache-Control": cache_control,
+            "ETag": f'"{asset["etag"]}{"." + enc if enc else ""}"',
+            "Vary": "Accept-Encoding",
+        }
+        if enc:
+            headers["Content-Encoding"] = enc
+        return body, headers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build fingerprinted, precompressed static assets")
+    parser.add_argument("--root", default=".")
+    parser.add_argument("--out", default=BUILD_DIR)
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    manifest = build_assets(args.root, args.out)
+    raw = sum(v[1] for v in manifest["sources"].values())
+    best = 0
+    for asset in manifest["assets"].values():
+        path = os.path.join(args.out, asset["url"])
+        sizes = [os.path.getsize(path + ENCODING_SUFFIXES.get(e, "")) for e in [None] + asset["encodings"]]
+        best += min(sizes)
+    print(f"{len(manifest['assets'])} assets, {raw / 1024:.0f} KiB -> {best / 1024:.0f} KiB compressed "
+          f"in {time.perf_counter() - start:.2f} s" + ("" if brotli else " (no brotli: pip install brotli)"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+thumbnails.py - Server-side top-down plan thumbnails
+
+Rasterizes room rectangles with NumPy (same look as the gallery's "plan"
+mode: translucent room fills, outlines, adjacency lines) and encodes PNG
+with zlib. WebP is produced when Pillow is installed. Rendered images are
+cached on disk keyed by layout hash, size and theme. Hits refresh a file's
+mtime; every PRUNE_INTERVAL writes (and on the first write of a process)
+the least recently used files are deleted until the cache is back under
+THUMBNAIL_CACHE_BYTES.
+"""
+
+import io
+import os
+import struct
+import tempfile
+import threading
+import zlib
+
+import numpy as np
+
+from utils.layout import layout_hash
+from utils.schema import normalize_layout
+
+THUMBNAIL_DIR = 'thumbnail_cache'
+DEFAULT_SIZE = (200, 150)
+MAX_SIZE = 1024
+PAD_RATIO = 0.06
+THUMBNAIL_CACHE_BYTES = 256 * 1024 * 1024
+PRUNE_INTERVAL = 100  # cache writes between size checks
+PRUNE_TARGET = 0.9  # prune down to this share of the budget
+
+# Mirrors gallery/themes.js
+THEMES = {
+    "light": {"bg": 0xffffff, "outline": 0x000000, "fill_opacity": 0.3, "edge": 0xff00ff, "edge_opacity": 0.85},
+    "dark": {"bg": 0x111111, "outline": 0xffffff, "fill_opacity": 0.22, "edge": 0xff00ff, "edge_opacity": 0.6},
+}
+DEFAULT_FILL = "#667eea"
+FORMATS = {"png": "image/png", "webp": "image/webp"}
+
+
+def _rgb(value):
+    """Hex int or '#rrggbb' string -> float RGB array in [0, 1]."""
+    if isinstance(value, str):
+        text = value.lstrip("#")
+        if len(text) == 3:
+            text = "".join(c * 2 for c in text)
+        try:
+            value = int(text[:6], 16)
+        except ValueError:
+            value = int(DEFAULT_FILL[1:], 16)
+    return np.array([(value >> 16) & 255, (value >> 8) & 255, value & 255], dtype=np.float32) / 255
+
+
+def render_plan(layout, width=DEFAULT_SIZE[0], height=DEFAULT_SIZE[1], theme="light"):
+    """Return an (height, width, 3) uint8 image of the layout plan."""
+    style = THEMES.get(theme, THEMES["light"])
+    img = np.empty((height, width, 3), dtype=np.float32)
+    img[:] = _rgb(style["bg"])
+
+    canon, _ = normalize_layout(layout)
+    rooms = [n for n in canon["nodes"] if n["center"] and n["width"]]
+    if not rooms:
+        return (img * 255).astype(np.uint8)
+
+    boxes = np.array([[n["center"][0] - n["width"][0] / 2, n["center"][1] - n["width"][1] / 2,
+                       n["center"][0] + n["width"][0] / 2, n["center"][1] + n["width"][1] / 2]
+                      for n in rooms], dtype=np.float64)
+
+    # fit plan bounds into the image, preserving aspect (like the ortho camera)
+    xmin, ymin = boxes[:, 0].min(), boxes[:, 1].min()
+    xmax, ymax = boxes[:, 2].max(), boxes[:, 3].max()
+    span_x, span_y = max(xmax - xmin, 2.0), max(ymax - ymin, 2.0)
+    pad = max(PAD_RATIO * max(span_x, span_y), 0.12)
+    scale = min(width / (span_x + 2 * pad), height / (span_y + 2 * pad))
+    ox = width / 2 - (xmin + xmax) / 2 * scale
+    oy = height / 2 - (ymin + ymax) / 2 * scale
+    px = np.rint(boxes * scale + [ox, oy, ox, oy]).astype(np.int64)
+    px[:, [0, 2]] = px[:, [0, 2]].clip(0, width - 1)
+    px[:, [1, 3]] = px[:, [1, 3]].clip(0, height - 1)
+
+    alpha = style["fill_opacity"]
+    for (x0, y0, x1, y1), room in zip(px, rooms):
+        region = img[y0:y1 + 1, x0:x1 + 1]
+        region *= 1 - alpha
+        region += alpha * _rgb(room["color"] or DEFAULT_FILL)
+
+    outline = _rgb(style["outline"])
+    for x0, y0, x1, y1 in px:
+        img[y0, x0:x1 + 1] = outline
+        img[y1, x0:x1 + 1] = outline
+        img[y0:y1 + 1, x0] = outline
+        img[y0:y1 + 1, x1] = outline
+
+    # adjacency lines between room centers
+    centers = {n["id"]: ((b[0] + b[2]) / 2, (b[1] + b[3]) / 2) for n, b in zip(rooms, px)}
+    segments = [(centers[e["source"]], centers[e["target"]]) for e in canon["edges"]
+                if e["source"] in centers and e["target"] in centers]
+    if segments:
+        ea = style["edge_opacity"]
+        edge = _rgb(style["edge"])
+        for (x0, y0), (x1, y1) in segments:
+            steps = int(max(abs(x1 - x0), abs(y1 - y0))) + 1
+            xs = np.rint(np.linspace(x0, x1, steps)).astype(np.int64)
+            ys = np.rint(np.linspace(y0, y1, steps)).astype(np.int64)
+            img[ys, xs] = img[ys, xs] * (1 - ea) + edge * ea
+
+    return (img.clip(0, 1) * 255).astype(np.uint8)
+
+
+def encode_png(pixels):
+    """Encode an (h, w, 3) uint8 array as PNG bytes."""
+    height, width, _ = pixels.shape
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = pixels.reshape(height, width * 3)  # filter type 0 per row
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body) & 0xffffffff)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)) + chunk(b"IEND", b""))
+
+
+def encode_webp(pixels):
+    """Encode as WebP (needs Pillow)."""
+    try:
+        from PIL import Image
+    except ImportError:
+        raise RuntimeError("WebP thumbnails need Pillow: pip install pillow")
+    out = io.BytesIO()
+    Image.fromarray(pixels).save(out, format="WEBP", quality=80)
+    return out.getvalue()
+
+
+def thumbnail_key(layout, width, height, theme, fmt):
+    """Cache key / filename for a thumbnail."""
+    return f"{layout_hash(layout)[:20]}_{width}x{height}_{theme}.{fmt}"
+
+
+def get_thumbnail(layout, width=DEFAULT_SIZE[0], height=DEFAULT_SIZE[1], theme="light", fmt="png"):
+    """
+    Return (image_bytes, key), rendering and caching on disk on a miss.
+
+    Raises:
+        ValueError: bad size, theme or format
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+    if theme not in THEMES:
+        raise ValueError(f"theme must be one of: {', '.join(THEMES)}")
+    if not (1 <= width <= MAX_SIZE and 1 <= height <= MAX_SIZE):
+        raise ValueError(f"size must be between 1 and {MAX_SIZE}")
+
+    key = thumbnail_key(layout, width, height, theme, fmt)
+    path = os.path.join(THUMBNAIL_DIR, key)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        try:
+            os.utime(path)  # recently used: keep through the next prune
+        except OSError:
+            pass
+        return data, key
+    except FileNotFoundError:
+        pass
+
+    pixels = render_plan(layout, width, height, theme)
+    data = encode_png(pixels) if fmt == "png" else encode_webp(pixels)
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+    # unique temp file per writer: concurrent misses for one key each replace atomically
+    with tempfile.NamedTemporaryFile(dir=THUMBNAIL_DIR, prefix=key, suffix=".tmp", delete=False) as f:
+        f.write(data)
+    os.replace(f.name, path)
+    _written()
+    return data, key
+
+
+_writes = 0
+_writes_lock = threading.Lock()
+
+
+def _written():
+    global _writes
+    with _writes_lock:
+        due = _writes % PRUNE_INTERVAL == 0
+        _writes += 1
+    if due:
+        prune_cache()
+
+
+def prune_cache(directory=THUMBNAIL_DIR, max_bytes=THUMBNAIL_CACHE_BYTES):
+    """
+    Delete least recently used thumbnails (oldest mtime first) until the
+    cache holds at most PRUNE_TARGET * max_bytes. Returns the number removed.
+    """
+    try:
+        entries = [e for e in os.scandir(directory) if e.is_file() and not e.name.endswith(".tmp")]
+    except FileNotFoundError:
+        return 0
+    files = []
+    for entry in entries:
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in files)
+    if total <= max_bytes:
+        return 0
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes * PRUNE_TARGET:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
@@ -0,0 +1,131 @@
+"""
+validation.py - Geometric checks for generated layouts
+
+Finds overlapping rooms, rooms outside the site and edges whose rooms don't
+touch. Overlaps are found per floor with a sort-and-sweep over the x axis, so
+only rooms whose x-intervals intersect are ever compared.
+"""
+
+from utils.layout import unwrap_layout, edge_endpoints, node_rect, node_floor
+
+TOLERANCE = 0.01  # metres; contact closer than this counts as touching
+
+
+def find_overlaps(rects, tol=TOLERANCE):
+    """
+    Return [(i, j, area)] for every pair of rectangles that overlap by more
+    than `tol` on both axes. `rects` is a list of (xmin, ymin, xmax, ymax).
+    """
+    order = sorted(range(len(rects)), key=lambda i: rects[i][0])
+    active = []
+    hits = []
+    for i in order:
+        x1, y1, x2, y2 = rects[i]
+        # drop rectangles that end before this one starts
+        active = [j for j in active if rects[j][2] - x1 > tol]
+        for j in active:
+            bx1, by1, bx2, by2 = rects[j]
+            dx = min(x2, bx2) - max(x1, bx1)
+            dy = min(y2, by2) - max(y1, by1)
+            if dx > tol and dy > tol:
+                hits.append((min(i, j), max(i, j), dx * dy))
+        active.append(i)
+    return hits
+
+
+def contact(a, b, tol=TOLERANCE):
+    """
+    Classify how two rectangles meet: "overlap", "wall" (share an edge of
+    positive length) or "none". Also returns the gap between them.
+    """
+    dx = min(a[2], b[2]) - max(a[0], b[0])
+    dy = min(a[3], b[3]) - max(a[1], b[1])
+    if dx > tol and dy > tol:
+        return "overlap", 0.0
+    if (abs(dx) <= tol and dy > tol) or (abs(dy) <= tol and dx > tol):
+        return "wall", 0.0
+    gap = (max(0.0, -dx) ** 2 + max(0.0, -dy) ** 2) ** 0.5
+    return "none", gap
+
+
+def outside_site(rect, site, tol=TOLERANCE):
+    """Return how far (max over sides) a rect extends past the site, or 0."""
+    width = float(site.get("width", 0) or 0)
+    height = float(site.get("height", 0) or 0)
+    if width <= 0 or height <= 0:
+        return 0.0
+    overflow = max(-rect[0], -rect[1], rect[2] - width, rect[3] - height, 0.0)
+    return overflow if overflow > tol else 0.0
+
+
+def validate_layout(layout, tol=TOLERANCE):
+    """
+    Validate room geometry of a layout.
+
+    Returns:
+        {
+          "valid": bool,
+          "overlaps": [{"a", "b", "floor", "area"}],
+          "outside_site": [{"id", "floor", "overflow"}],
+          "bad_edges": [{"source", "target", "reason", "gap"}],
+          "unplaced": [node ids without numeric center/width]
+        }
+    """
+    data = unwrap_layout(layout) or {}
+    nodes = data.get("nodes") or []
+    site = layout.get("site_area") or data.get("site_area") or {}
+
+    rects = {}
+    floors = {}
+    node_floors = {}
+    unplaced = []
+    for node in nodes:
+        if not isinstance(node, dict) or "id" not in node:
+            continue
+        node_floors[node["id"]] = node_floor(node)
+        rect = node_rect(node)
+        if rect is None:
+            unplaced.append(node["id"])
+            continue
+        rects[node["id"]] = rect
+        floors.setdefault(node_floors[node["id"]], []).append(node["id"])
+
+    overlaps = []
+    for floor, ids in sorted(floors.items()):
+        for i, j, area in find_overlaps([rects[n] for n in ids], tol):
+            overlaps.append({"a": ids[i], "b": ids[j], "floor": floor, "area": round(area, 4)})
+
+    outside = []
+    if isinstance(site, dict) and site:
+        for node_id, rect in rects.items():
+            overflow = outside_site(rect, site, tol)
+            if overflow:
+                outside.append({"id": node_id, "floor": node_floors[node_id], "overflow": round(overflow, 4)})
+
+    bad_edges = []
+    for edge in data.get("edges") or []:
+        ends = edge_endpoints(edge)
+        if ends is None:
+            bad_edges.append({"source": None, "target": None, "reason": "malformed", "gap": None})
+            continue
+        a, b = ends
+        if a not in node_floors or b not in node_floors:
+            bad_edges.append({"source": a, "target": b, "reason": "unknown_node", "gap": None})
+            continue
+        if a not in rects or b not in rects:
+            continue  # symbolic rooms can't be checked geometrically
+        kind, gap = contact(rects[a], rects[b], tol)
+        if node_floors[a] != node_floors[b]:
+            # vertical links (stairs) need overlapping footprints
+            if kind != "overlap":
+                bad_edges.append({"source": a, "target": b, "reason": "no_vertical_overlap", "gap": round(gap, 4)})
+        elif kind == "none":
+            bad_edges.append({"source": a, "target": b, "reason": "no_contact", "gap": round(gap, 4)})
+
+    return {
+        "valid": not (overlaps or outside or bad_edges),
+        "overlaps": overlaps,
+        "outside_site": outside,
+        "bad_edges": bad_edges,
+        "unplaced": unplaced,
+    }